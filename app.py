@@ -1,15 +1,17 @@
 import asyncio
 import logging
-from flask import Flask, request
+import time
+from flask import Flask, request, Response, jsonify
 from telegram import Update
 
-from bot.core.config import BOT_TOKEN, WEBHOOK_URL, ADMIN_ID
+from bot.core.config import BOT_TOKEN, WEBHOOK_URL, ADMIN_ID, HEALTH_DEGRADED_STATUS_CODE
+from bot.core.log import setup_logging
 from bot.main import create_application # We will create this file next
+from bot.core.metrics import WEBHOOK_LATENCY, render_metrics
+from bot.core.health import health_report, mark_update_processed, UNHEALTHY
 
-# Enable logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
+# Enable logging (queued, written by a background thread)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize Flask app
@@ -30,6 +32,22 @@ def index():
         return "Bot is running! Visit /setup to initialize."
     return "Bot is NOT initialized. Check logs.", 500
 
+@app.route("/healthz")
+def healthz():
+    """
+    Deep health check: a DB round trip (SELECT 1), event loop lag (where the JobQueue
+    runs), JobQueue size, queue depths and time since the last processed update.
+    Returns 503 when unhealthy so the platform restarts the instance.
+    """
+    if not ptb_app:
+        return jsonify({"status": UNHEALTHY, "problems": ["bot application not initialized"]}), 503
+    status, report = health_report(ptb_app)
+    if status == UNHEALTHY:
+        return jsonify(report), 503
+    if status != "healthy":
+        return jsonify(report), HEALTH_DEGRADED_STATUS_CODE
+    return jsonify(report), 200
+
 @app.route(f"/{BOT_TOKEN}", methods=["POST"])
 def webhook():
     """This is the main webhook endpoint that Telegram will send updates to."""
@@ -37,18 +55,32 @@ def webhook():
         logger.error("Webhook received, but Bot Application is not initialized.")
         return "Error: Bot not configured", 500
         
+    started_at = time.perf_counter()
+    update_type = "unknown"
+
     async def process_update():
+        nonlocal update_type
         try:
             update_json = request.get_json(force=True)
+            # The update type is the one key besides update_id (e.g. 'channel_post', 'callback_query')
+            update_type = next((key for key in update_json if key != "update_id"), "unknown")
             update = Update.de_json(update_json, ptb_app.bot)
             await ptb_app.process_update(update)
+            mark_update_processed()
         except Exception as e:
             logger.error(f"Error processing update: {e}", exc_info=True)
     
     # Run the update processing in an async task
     asyncio.run(process_update())
+    WEBHOOK_LATENCY.labels(update_type).observe(time.perf_counter() - started_at)
     return "ok", 200
 
+@app.route("/metrics")
+def metrics():
+    """Prometheus metrics in text exposition format."""
+    body, content_type = render_metrics(ptb_app)
+    return Response(body, mimetype=content_type)
+
 @app.route("/setup", methods=['GET'])
 def setup_bot():
     """
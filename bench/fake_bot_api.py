@@ -0,0 +1,263 @@
+"""
+A local stand-in for the Telegram Bot API, for offline benchmarks.
+
+Point python-telegram-bot at it with
+    Application.builder().token(BOT_TOKEN).base_url(f"http://127.0.0.1:{port}/bot")
+and every Bot API call is answered locally, with configurable latency,
+429 (Flood Wait) injection and failure rates.
+
+Run standalone:
+    python -m bench.fake_bot_api --port 8081 --latency-ms 40 --rate-429 0.01
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+CONTENT_KINDS = ("text", "photo", "video", "document")
+
+
+class FakeBotAPI:
+    """aiohttp app that answers Bot API methods and counts every call."""
+
+    def __init__(self, latency_ms=30.0, jitter_ms=10.0, rate_429=0.0, retry_after=1,
+                 failure_rate=0.0, not_found_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.failure_rate = failure_rate
+        self.not_found_rate = not_found_rate
+        self.random = random.Random(seed)
+
+        self.calls = Counter()
+        self.errors = Counter()
+        # (monotonic time, method, chat_id, marker) for every content delivered to a chat
+        self.deliveries = []
+        self._message_ids = itertools.count(1_000_000)
+
+        self.app = web.Application()
+        self.app.router.add_post("/{token}/{method}", self.handle)
+        self.app.router.add_get("/_bench/stats", self.handle_stats)
+        self.app.router.add_post("/_bench/reset", self.handle_reset)
+        self._runner = None
+
+    # --- lifecycle ---
+
+    async def start(self, host="127.0.0.1", port=8081):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        return f"http://{host}:{port}/bot"
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    def reset(self):
+        self.calls.clear()
+        self.errors.clear()
+        self.deliveries.clear()
+
+    # --- request handling ---
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        params = await self._read_params(request)
+        self.calls[method] += 1
+
+        delay = max(0.0, self.random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self.rate_429 and self.random.random() < self.rate_429:
+            self.errors["429"] += 1
+            return self._error(429, f"Too Many Requests: retry after {self.retry_after}",
+                               parameters={"retry_after": self.retry_after})
+
+        handler = getattr(self, f"api_{method}", None)
+        if handler is None:
+            return self._ok(True)
+        return handler(params)
+
+    async def _read_params(self, request):
+        if request.content_type == "application/json":
+            return await request.json()
+        params = {}
+        for key, value in (await request.post()).items():
+            if isinstance(value, str):
+                try:
+                    params[key] = json.loads(value)
+                except ValueError:
+                    params[key] = value
+        return params
+
+    def _ok(self, result):
+        return web.json_response({"ok": True, "result": result})
+
+    def _error(self, code, description, parameters=None):
+        body = {"ok": False, "error_code": code, "description": description}
+        if parameters:
+            body["parameters"] = parameters
+        return web.json_response(body, status=code)
+
+    def _maybe_fail(self):
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            self.errors["400"] += 1
+            return self._error(400, "Bad Request: chat not found")
+        return None
+
+    def _chat(self, chat_id):
+        chat_type = "channel" if isinstance(chat_id, int) and chat_id < 0 else "private"
+        return {"id": chat_id, "type": chat_type, "title": f"Chat {chat_id}", "first_name": "Bench"}
+
+    def _message(self, chat_id, kind="text", marker=None, caption=None):
+        message_id = next(self._message_ids)
+        message = {"message_id": message_id, "date": int(time.time()), "chat": self._chat(chat_id)}
+        marker = marker or f"m{message_id}"
+        if kind == "text":
+            message["text"] = caption or marker
+        elif kind == "photo":
+            message["photo"] = [{"file_id": marker, "file_unique_id": f"u-{marker}", "width": 1280, "height": 720}]
+        elif kind == "video":
+            message["video"] = {"file_id": marker, "file_unique_id": f"u-{marker}", "width": 1280, "height": 720, "duration": 10}
+        elif kind == "document":
+            message["document"] = {"file_id": marker, "file_unique_id": f"u-{marker}"}
+        if caption and kind != "text":
+            message["caption"] = caption
+        return message
+
+    def _deliver(self, method, params, marker):
+        self.deliveries.append((time.monotonic(), method, params.get("chat_id"), marker))
+
+    # --- Bot API methods ---
+
+    def api_getMe(self, params):
+        return self._ok({"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot",
+                         "can_join_groups": True, "can_read_all_group_messages": False,
+                         "supports_inline_queries": False})
+
+    def api_getChat(self, params):
+        return self._maybe_fail() or self._ok(self._chat(params.get("chat_id")))
+
+    def api_sendMessage(self, params):
+        failure = self._maybe_fail()
+        if failure:
+            return failure
+        self._deliver("sendMessage", params, params.get("text"))
+        return self._ok(self._message(params.get("chat_id"), "text", caption=params.get("text")))
+
+    def _send_media(self, method, kind, params):
+        failure = self._maybe_fail()
+        if failure:
+            return failure
+        file_id = params.get(kind)
+        self._deliver(method, params, file_id)
+        return self._ok(self._message(params.get("chat_id"), kind, marker=file_id, caption=params.get("caption")))
+
+    def api_sendPhoto(self, params):
+        return self._send_media("sendPhoto", "photo", params)
+
+    def api_sendVideo(self, params):
+        return self._send_media("sendVideo", "video", params)
+
+    def api_sendDocument(self, params):
+        return self._send_media("sendDocument", "document", params)
+
+    def api_forwardMessage(self, params):
+        if self.not_found_rate and self.random.random() < self.not_found_rate:
+            self.errors["not_found"] += 1
+            return self._error(400, "Bad Request: message to forward not found")
+        failure = self._maybe_fail()
+        if failure:
+            return failure
+        source_message_id = int(params.get("message_id", 0))
+        kind = CONTENT_KINDS[source_message_id % len(CONTENT_KINDS)]
+        marker = f"src{params.get('from_chat_id')}-{source_message_id}"
+        return self._ok(self._message(params.get("chat_id"), kind, marker=marker, caption=f"caption {source_message_id}"))
+
+    def api_copyMessage(self, params):
+        failure = self._maybe_fail()
+        if failure:
+            return failure
+        self._deliver("copyMessage", params, f"src{params.get('from_chat_id')}-{params.get('message_id')}")
+        return self._ok({"message_id": next(self._message_ids)})
+
+    def api_copyMessages(self, params):
+        failure = self._maybe_fail()
+        if failure:
+            return failure
+        result = []
+        for message_id in params.get("message_ids") or []:
+            if self.not_found_rate and self.random.random() < self.not_found_rate:
+                continue
+            self._deliver("copyMessages", params, f"src{params.get('from_chat_id')}-{message_id}")
+            result.append({"message_id": next(self._message_ids)})
+        return self._ok(result)
+
+    def api_editMessageText(self, params):
+        return self._ok(self._message(params.get("chat_id") or 0, "text", caption=params.get("text")))
+
+    def api_editMessageCaption(self, params):
+        return self._ok(self._message(params.get("chat_id") or 0, "photo", caption=params.get("caption")))
+
+    # --- bench control endpoints ---
+
+    async def handle_stats(self, request):
+        return web.json_response({
+            "calls": dict(self.calls),
+            "errors": dict(self.errors),
+            "deliveries": len(self.deliveries),
+        })
+
+    async def handle_reset(self, request):
+        self.reset()
+        return web.json_response({"ok": True})
+
+
+def add_fake_api_arguments(parser):
+    """Registers the fake server knobs on an argparse parser (shared by the bench CLIs)."""
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="mean Bot API latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="latency standard deviation")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after sent with injected 429s")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of sends failing with 'chat not found'")
+    parser.add_argument("--not-found-rate", type=float, default=0.0, help="fraction of forwardMessage ids reported missing")
+    parser.add_argument("--seed", type=int, default=None, help="random seed, for repeatable runs")
+
+def fake_api_from_args(args):
+    return FakeBotAPI(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rate_429=args.rate_429,
+        retry_after=args.retry_after, failure_rate=args.failure_rate,
+        not_found_rate=args.not_found_rate, seed=args.seed,
+    )
+
+
+async def _serve(args):
+    api = fake_api_from_args(args)
+    base_url = await api.start(args.host, args.port)
+    print(f"Fake Bot API listening, use base_url={base_url}")
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await api.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake Telegram Bot API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    add_fake_api_arguments(parser)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+In-process stand-in for bot.core.database, so benchmarks run without Postgres.
+
+install() swaps the DB functions used on the forwarding, jobs and broadcast
+paths for in-memory versions in every already-imported bot module. Any
+statement that is not emulated goes to a no-op db_query that returns no rows
+(and is counted), so a bench never hits a real database by accident.
+"""
+import sys
+from collections import Counter
+from datetime import datetime
+
+from bot.core import database
+from bot.core.models import Setting, User
+
+
+class FakeDB:
+    def __init__(self):
+        self.users = {}
+        self.settings = {}
+        self.dedup_keys = set()
+        self.message_map = []
+        self.forward_log_rows = 0
+        self.unhandled = Counter()
+        self._next_setting_id = 1
+
+    # --- seeding ---
+
+    def add_user(self, user_id, is_banned=False):
+        self.users[user_id] = {
+            'user_id': user_id, 'username': f"user{user_id}", 'first_name': "Bench", 'last_name': None,
+            'is_admin': False, 'is_banned': is_banned, 'banned_until': None, 'joined_at': datetime.now(),
+            'send_weight': 1, 'send_cap_per_minute': None,
+        }
+
+    def add_setting(self, **fields):
+        setting_id = self._next_setting_id
+        self._next_setting_id += 1
+        row = {
+            'id': setting_id, 'user_id': 0, 'source_channel_id': 0, 'target_channel_id': 0,
+            'custom_caption': "", 'remove_tags_caption': True, 'is_active': True,
+            'task_type': 'new_messages', 'start_message_id': 0, 'end_message_id': 0,
+            'current_message_id': 0, 'forward_every_n_posts': 1, 'interval_seconds': 10,
+            'last_processed_message_id': 0, 'dedup_enabled': False, 'filter_rules': None, 'caption_rules': None,
+            'catch_up_done': False,
+        }
+        row.update(fields)
+        row['id'] = setting_id
+        self.settings[setting_id] = row
+        return setting_id
+
+    # --- emulated DB functions (same names and signatures as bot.core.database) ---
+
+    def db_query(self, query, params=(), fetch_one=False, commit=False, **kwargs):
+        self.unhandled[query.split()[0].upper()] += 1
+        return None if (fetch_one or commit) else []
+
+    def db_execute_many(self, query, params_seq):
+        self.unhandled["BATCH"] += 1
+
+    def get_user(self, user_id):
+        user = self.users.get(user_id)
+        return User(**user) if user else None
+
+    def get_total_users(self):
+        return len(self.users)
+
+    def update_user_send_policy(self, user_id, send_weight, send_cap_per_minute=None):
+        if user_id in self.users:
+            self.users[user_id].update(send_weight=send_weight, send_cap_per_minute=send_cap_per_minute)
+
+    def get_user_send_policies(self):
+        return [
+            {'user_id': u['user_id'], 'send_weight': u['send_weight'], 'send_cap_per_minute': u['send_cap_per_minute']}
+            for u in self.users.values() if u['send_weight'] != 1 or u['send_cap_per_minute'] is not None
+        ]
+
+    def get_all_users_ids(self):
+        return [u['user_id'] for u in self.users.values() if not u['is_banned']]
+
+    def get_user_forward_settings(self, user_id):
+        return [Setting(**s) for s in self.settings.values() if s['user_id'] == user_id]
+
+    def get_all_active_forward_settings(self):
+        return [Setting(**s) for s in self.settings.values() if s['is_active']]
+
+    def get_setting_by_id(self, setting_id):
+        setting = self.settings.get(setting_id)
+        return Setting(**setting) if setting else None
+
+    def get_task_owner_ids_by_target(self, target_channel_id):
+        return sorted({s['user_id'] for s in self.settings.values() if s['target_channel_id'] == target_channel_id})
+
+    def update_setting_last_processed_id(self, setting_id, message_id):
+        if setting_id in self.settings:
+            self.settings[setting_id]['last_processed_message_id'] = message_id
+
+    def update_setting_current_id(self, setting_id, new_current_id):
+        if setting_id in self.settings:
+            self.settings[setting_id]['current_message_id'] = new_current_id
+
+    def update_setting_active(self, setting_id, is_active):
+        if setting_id in self.settings:
+            self.settings[setting_id]['is_active'] = is_active
+
+    def claim_dedup_key(self, target_channel_id, content_key, ttl_seconds):
+        if (target_channel_id, content_key) in self.dedup_keys:
+            return False
+        self.dedup_keys.add((target_channel_id, content_key))
+        return True
+
+    def release_dedup_key(self, target_channel_id, content_key):
+        self.dedup_keys.discard((target_channel_id, content_key))
+
+    def insert_message_map(self, source_chat_id, source_message_id, target_chat_id, target_message_id, setting_id):
+        self.message_map.append((source_chat_id, source_message_id, target_chat_id, target_message_id, setting_id))
+
+    def get_message_map(self, source_chat_id, source_message_id, retention_days):
+        return [
+            {'setting_id': row[4], 'target_chat_id': row[2], 'target_message_id': row[3]}
+            for row in self.message_map if row[:2] == (source_chat_id, source_message_id)
+        ]
+
+    def copy_forward_log(self, rows):
+        self.forward_log_rows += len(rows)
+
+    def create_forward_log_partition(self, day):
+        pass
+
+    def upsert_task_stats(self, deltas):
+        pass
+
+    def get_task_stats_rows(self, setting_ids):
+        return []
+
+    def get_top_task_stats_rows(self, limit=10):
+        return []
+
+    # --- installation ---
+
+    def install(self):
+        """Replaces the real DB functions with this instance's methods wherever they were imported."""
+        replacements = {}
+        for name, original in vars(database).items():
+            fake = getattr(self, name, None)
+            if callable(original) and fake is not None and not name.startswith('__'):
+                replacements[original] = fake
+
+        for module_name, module in list(sys.modules.items()):
+            if module is None or not (module_name == 'bot' or module_name.startswith('bot.')):
+                continue
+            for attr, value in list(vars(module).items()):
+                try:
+                    fake = replacements.get(value)
+                except TypeError:
+                    continue
+                if fake is not None:
+                    setattr(module, attr, fake)
+        return self
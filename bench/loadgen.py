@@ -0,0 +1,275 @@
+"""
+Synthetic webhook load generator and replay tool.
+
+Generates realistic `channel_post` updates (text, photo, video, document and
+albums) spread over N source channels and POSTs them to the `/{BOT_TOKEN}`
+webhook route of app.py at a target rate, or replays a recorded update log.
+
+Start the web service with BOT_API_BASE_URL pointing at the fake Bot API that
+this tool runs in-process, so forwarded sends land here and end-to-end latency
+can be measured:
+
+    BOT_API_BASE_URL=http://127.0.0.1:8081/bot gunicorn app:app
+    python -m bench.loadgen --url http://127.0.0.1:8000 --rate 50 --duration 30
+    python -m bench.loadgen --url http://127.0.0.1:8000 --ramp 10:200:10 --duration 15
+    python -m bench.loadgen --url http://127.0.0.1:8000 --replay updates.jsonl --rate 100
+    python -m bench.loadgen --record updates.jsonl --count 5000   # only write the generated log
+
+Sources must match the source channels of active 'new_messages' tasks in the
+bot's database (--source-base-id / --sources).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+
+import aiohttp
+
+from bot.core.config import BOT_TOKEN
+
+from .fake_bot_api import add_fake_api_arguments, fake_api_from_args
+from .run_bench import percentile
+
+KINDS = ("text", "photo", "video", "document", "album")
+DEFAULT_MIX = "text=40,photo=30,video=10,document=10,album=10"
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        kind, _, weight = part.partition("=")
+        if kind.strip() not in KINDS:
+            raise ValueError(f"Unknown content kind in --mix: {kind}")
+        weights[kind.strip()] = float(weight or 1)
+    return weights
+
+def generate_updates(sources, source_base_id, mix, seed=None):
+    """
+    Endless stream of channel_post update dicts. Albums yield 2-5 consecutive
+    posts sharing a media_group_id. Media file_ids double as delivery markers.
+    """
+    rng = random.Random(seed)
+    kinds, weights = zip(*parse_mix(mix).items())
+    update_ids = itertools.count(1)
+    message_ids = Counter()
+
+    def post(source_id, kind, media_group_id=None):
+        message_ids[source_id] += 1
+        message_id = message_ids[source_id]
+        marker = f"lg{source_id}-{message_id}"
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": source_id, "type": "channel", "title": f"Load source {source_id}"},
+        }
+        if kind == "text":
+            message["text"] = f"Load test post {marker} " + "lorem ipsum " * rng.randint(1, 40)
+        elif kind == "photo":
+            message["photo"] = [
+                {"file_id": f"{marker}-s", "file_unique_id": f"u{marker}-s", "width": 320, "height": 180},
+                {"file_id": marker, "file_unique_id": f"u{marker}", "width": 1280, "height": 720},
+            ]
+        elif kind == "video":
+            message["video"] = {"file_id": marker, "file_unique_id": f"u{marker}", "width": 1280, "height": 720, "duration": rng.randint(5, 120)}
+        elif kind == "document":
+            message["document"] = {"file_id": marker, "file_unique_id": f"u{marker}", "file_name": f"{marker}.pdf"}
+        if kind != "text" and rng.random() < 0.6:
+            message["caption"] = f"Caption for {marker} #tag @channel https://example.com"
+        if media_group_id:
+            message["media_group_id"] = media_group_id
+        return {"update_id": next(update_ids), "channel_post": message}
+
+    while True:
+        source_id = source_base_id - rng.randrange(sources)
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "album":
+            group_id = str(rng.getrandbits(60))
+            for _ in range(rng.randint(2, 5)):
+                yield post(source_id, rng.choice(("photo", "video")), group_id)
+        else:
+            yield post(source_id, kind)
+
+def read_replay_log(path):
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def delivery_marker(update):
+    """The marker the fake Bot API will see when this post is forwarded (media only, text may be replaced by captions)."""
+    message = update.get("channel_post") or {}
+    if message.get("photo"):
+        return message["photo"][-1]["file_id"]
+    for kind in ("video", "document"):
+        if message.get(kind):
+            return message[kind]["file_id"]
+    return None
+
+
+async def run_step(session, webhook_url, updates, rate, duration, concurrency, record_file=None):
+    """Sends updates open-loop at `rate`/sec for `duration` seconds. Returns per-request results."""
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = Counter()
+    response_times = []
+    sent_at = {}
+    pending = []
+    interval = 1.0 / rate
+    started_at = time.monotonic()
+    total = int(rate * duration)
+
+    async def send(update):
+        async with semaphore:
+            request_started = time.monotonic()
+            marker = delivery_marker(update)
+            if marker:
+                sent_at[marker] = request_started
+            try:
+                async with session.post(webhook_url, json=update) as response:
+                    await response.read()
+                    statuses[response.status] += 1
+            except aiohttp.ClientError as e:
+                statuses[type(e).__name__] += 1
+            response_times.append(time.monotonic() - request_started)
+
+    for i, update in enumerate(itertools.islice(updates, total)):
+        if record_file:
+            record_file.write(json.dumps(update) + "\n")
+        delay = started_at + i * interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        pending.append(asyncio.create_task(send(update)))
+
+    await asyncio.gather(*pending)
+    elapsed = time.monotonic() - started_at
+    return statuses, response_times, sent_at, elapsed
+
+def summarize_step(rate, statuses, response_times, sent_at, elapsed, deliveries):
+    accepted = sum(count for status, count in statuses.items() if isinstance(status, int) and 200 <= status < 300)
+    sent = sum(statuses.values())
+    first_delivery = {}
+    for delivered_at, _method, _chat_id, marker in deliveries:
+        if marker in sent_at and marker not in first_delivery:
+            first_delivery[marker] = delivered_at - sent_at[marker]
+    e2e = list(first_delivery.values())
+    return {
+        "target_rate": rate,
+        "sent": sent,
+        "accepted_rate": round(accepted / elapsed, 1) if elapsed else 0.0,
+        "errors": {str(k): v for k, v in statuses.items() if not (isinstance(k, int) and 200 <= k < 300)},
+        "error_ratio": round((sent - accepted) / sent, 4) if sent else 0.0,
+        "response_p50_ms": round(percentile(response_times, 50) * 1000, 1),
+        "response_p99_ms": round(percentile(response_times, 99) * 1000, 1),
+        "e2e_samples": len(e2e),
+        "e2e_p50_ms": round(percentile(e2e, 50) * 1000, 1),
+        "e2e_p99_ms": round(percentile(e2e, 99) * 1000, 1),
+    }
+
+def is_saturated(step, args):
+    return (
+        step["accepted_rate"] < step["target_rate"] * args.saturation_ratio
+        or step["error_ratio"] > args.max_error_ratio
+        or (args.max_p99_ms and step["response_p99_ms"] > args.max_p99_ms)
+    )
+
+def print_step(step):
+    print(
+        f"rate {step['target_rate']:>7}/s | accepted {step['accepted_rate']:>7}/s | "
+        f"errors {step['error_ratio'] * 100:5.1f}% {step['errors'] or ''} | "
+        f"resp p50/p99 {step['response_p50_ms']}/{step['response_p99_ms']} ms | "
+        f"e2e p50/p99 {step['e2e_p50_ms']}/{step['e2e_p99_ms']} ms (n={step['e2e_samples']})"
+    )
+
+
+async def run(args):
+    if args.replay:
+        updates = read_replay_log(args.replay)
+    else:
+        updates = generate_updates(args.sources, args.source_base_id, args.mix, args.seed)
+
+    if not args.url:
+        # Record-only mode
+        with open(args.record, "w") as f:
+            for update in itertools.islice(updates, args.count):
+                f.write(json.dumps(update) + "\n")
+        print(f"Wrote {args.count} updates to {args.record}")
+        return []
+
+    api = None
+    if args.fake_api_port:
+        api = fake_api_from_args(args)
+        await api.start(port=args.fake_api_port)
+
+    webhook_url = f"{args.url.rstrip('/')}/{BOT_TOKEN}"
+    if args.ramp:
+        start, stop, step = (float(x) for x in args.ramp.split(":"))
+        rates = []
+        rate = start
+        while rate <= stop:
+            rates.append(rate)
+            rate += step
+    else:
+        rates = [args.rate]
+
+    results = []
+    record_file = open(args.record, "w") if args.record else None
+    try:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=args.timeout)) as session:
+            for rate in rates:
+                if api:
+                    api.reset()
+                statuses, response_times, sent_at, elapsed = await run_step(
+                    session, webhook_url, updates, rate, args.duration, args.concurrency, record_file
+                )
+                # Give in-flight forwards a moment to reach the fake Bot API
+                await asyncio.sleep(args.drain)
+                step = summarize_step(rate, statuses, response_times, sent_at, elapsed, api.deliveries if api else [])
+                results.append(step)
+                print_step(step)
+                if args.ramp and is_saturated(step, args):
+                    print(f"Saturation point: ~{step['target_rate']}/s "
+                          f"(last healthy rate: {results[-2]['target_rate'] if len(results) > 1 else 'none'}/s)")
+                    break
+    finally:
+        if record_file:
+            record_file.close()
+        if api:
+            await api.stop()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Webhook load generator and replay tool")
+    parser.add_argument("--url", default=None, help="base URL of the web service (omit with --record to only write a log)")
+    parser.add_argument("--rate", type=float, default=20.0, help="updates per second")
+    parser.add_argument("--ramp", default=None, help="start:stop:step rates to find the saturation point")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per rate step")
+    parser.add_argument("--concurrency", type=int, default=64, help="max in-flight webhook requests")
+    parser.add_argument("--timeout", type=float, default=30.0, help="webhook request timeout")
+    parser.add_argument("--drain", type=float, default=2.0, help="seconds to wait for forwards after each step")
+    parser.add_argument("--sources", type=int, default=10, help="number of source channels")
+    parser.add_argument("--source-base-id", type=int, default=-1001000000000, help="first source channel id (next ones count down)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="content mix, e.g. 'text=40,photo=30,album=10'")
+    parser.add_argument("--replay", default=None, help="JSONL file of recorded updates to send instead of generated ones")
+    parser.add_argument("--record", default=None, help="write every sent update to this JSONL file")
+    parser.add_argument("--count", type=int, default=1000, help="updates to write in record-only mode")
+    parser.add_argument("--fake-api-port", type=int, default=8081, help="run the fake Bot API here (0 to disable)")
+    parser.add_argument("--saturation-ratio", type=float, default=0.95, help="accepted/target ratio below which a step is saturated")
+    parser.add_argument("--max-error-ratio", type=float, default=0.01, help="error ratio above which a step is saturated")
+    parser.add_argument("--max-p99-ms", type=float, default=0, help="response p99 above which a step is saturated (0 = ignore)")
+    parser.add_argument("--json-out", default=None, help="append the step results as JSON lines to this file")
+    add_fake_api_arguments(parser)
+    args = parser.parse_args()
+    if not args.url and not args.record:
+        parser.error("either --url or --record is required")
+
+    results = asyncio.run(run(args))
+    if args.json_out and results:
+        with open(args.json_out, "a") as f:
+            for step in results:
+                f.write(json.dumps(step) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Memory held by cached task rows.
+
+Builds the routing table shape (source_channel_id -> [row, ...]) for --tasks active tasks,
+once with dict rows (what RealDictRow / dict_row hand out) and once with the slotted
+bot.core.models.Setting rows class_row() builds, and reports the bytes each cached setting
+costs, measured with tracemalloc. Column values are created before measuring and shared by
+both runs, so the numbers are the per-row container cost only.
+
+    python -m bench.memory_bench
+    python -m bench.memory_bench --tasks 100000 --tasks-per-source 3 --json-out bench_output.txt
+"""
+import argparse
+import gc
+import json
+import platform
+import tracemalloc
+from datetime import datetime
+
+from bot.core.models import Setting
+
+SOURCE_BASE_ID = -1001000000000
+TARGET_BASE_ID = -1002000000000
+USER_BASE_ID = 10_000
+
+COLUMNS = Setting.__field_names__
+
+
+def make_values(tasks, tasks_per_source):
+    """One tuple per task, in column order, like the rows of the settings query."""
+    values = []
+    for index in range(tasks):
+        task_type = 'catch_up' if index % 10 == 0 else 'new_messages'
+        values.append((
+            index + 1, USER_BASE_ID + index % 5000,
+            SOURCE_BASE_ID - index // tasks_per_source, TARGET_BASE_ID - index,
+            f"Task {index + 1} caption" if index % 3 == 0 else "", True, True,
+            task_type, 0, 0, 1000 + index, 1, 10800, 1000 + index,
+            index % 4 == 0,
+            {'include': ['sale'], 'media': ['photo']} if index % 5 == 0 else None,
+            {'strip_links': True} if index % 7 == 0 else None,
+            task_type != 'catch_up',
+        ))
+    return values
+
+def dict_row(row):
+    return dict(zip(COLUMNS, row))
+
+def setting_row(row):
+    # class_row(Setting) calls the class with the columns as keyword arguments
+    return Setting(**dict(zip(COLUMNS, row)))
+
+def measure(make_row, values):
+    """Bytes allocated for the routing table built from values, and the table itself."""
+    gc.collect()
+    tracemalloc.start()
+    routes = {}
+    for row in values:
+        setting = make_row(row)
+        routes.setdefault(setting['source_channel_id'], []).append(setting)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return allocated, routes
+
+def run(args):
+    values = make_values(args.tasks, args.tasks_per_source)
+    result = {
+        'scenario': 'memory',
+        'at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'tasks': args.tasks,
+    }
+    for name, make_row in (('dict', dict_row), ('setting', setting_row)):
+        allocated, routes = measure(make_row, values)
+        result[f'{name}_bytes'] = allocated
+        result[f'{name}_bytes_per_setting'] = round(allocated / args.tasks, 1)
+        del routes
+    result['saved_pct'] = round(100 * (1 - result['setting_bytes'] / result['dict_bytes']), 1) if result['dict_bytes'] else 0.0
+    result['params'] = {k: v for k, v in vars(args).items() if k != 'json_out'}
+    return result
+
+def print_report(result):
+    print(f"Cached tasks:          {result['tasks']}")
+    print(f"dict rows:             {result['dict_bytes_per_setting']} bytes/setting ({result['dict_bytes'] / 2**20:.1f} MiB)")
+    print(f"Setting rows:          {result['setting_bytes_per_setting']} bytes/setting ({result['setting_bytes'] / 2**20:.1f} MiB)")
+    print(f"Saved:                 {result['saved_pct']}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes per cached task row: dict rows vs slotted Setting rows")
+    parser.add_argument("--tasks", type=int, default=100_000, help="active tasks in the routing table")
+    parser.add_argument("--tasks-per-source", type=int, default=2, help="tasks fed by each source channel")
+    parser.add_argument("--json-out", default=None, help="append the result as one JSON line to this file")
+    args = parser.parse_args()
+
+    result = run(args)
+    print_report(result)
+    if args.json_out:
+        with open(args.json_out, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+if __name__ == "__main__":
+    main()
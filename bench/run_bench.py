@@ -0,0 +1,269 @@
+"""
+Offline forwarding benchmarks.
+
+Drives handle_new_post, jobs.process_task and admin.execute_broadcast against the
+fake Bot API (bench/fake_bot_api.py) and either the in-process DB stand-in
+(default) or a disposable Postgres (--database-url), and reports msgs/sec,
+Bot API calls per forward and p50/p99 latency per operation.
+
+    python -m bench.run_bench --posts 2000 --sources 20 --tasks-per-source 3
+    python -m bench.run_bench --scenario process_task --latency-ms 80 --rate-429 0.02
+    python -m bench.run_bench --json-out bench_output.txt   # append results for run-to-run comparison
+"""
+import argparse
+import asyncio
+import json
+import platform
+import time
+from datetime import datetime
+
+from telegram import Update
+from telegram.ext import Application, CallbackContext, Job
+
+from bot.core import config, database
+from bot.core.config import BOT_TOKEN, ADMIN_ID
+from bot.core.rate_limiter import FairRateLimiter
+from bot.handlers import forwarding, admin
+from bot import jobs
+
+from .fake_bot_api import add_fake_api_arguments, fake_api_from_args, CONTENT_KINDS
+from .fake_db import FakeDB
+
+SOURCE_BASE_ID = -1001000000000
+TARGET_BASE_ID = -1002000000000
+USER_BASE_ID = 10_000
+
+
+class BenchJob(Job):
+    """A Job that is never scheduled; schedule_removal() only records the request."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.removal_requested = False
+
+    def schedule_removal(self):
+        self.removal_requested = True
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# --- storage backends ---
+
+class Storage:
+    """Seeds users and tasks either into the FakeDB or into a real (disposable) Postgres."""
+
+    def __init__(self, database_url=None):
+        self.fake = None
+        if database_url:
+            config.DATABASE_URL = database_url
+            database.init_db()
+        else:
+            self.fake = FakeDB().install()
+
+    def add_user(self, user_id):
+        if self.fake:
+            self.fake.add_user(user_id)
+        else:
+            database.add_user(user_id, f"user{user_id}", "Bench", None)
+
+    def add_setting(self, **fields):
+        if self.fake:
+            return self.fake.add_setting(**fields)
+        data = {'custom_caption': "", 'remove_tags_caption': True, 'interval_seconds': 10}
+        data.update(fields)
+        return database.add_forward_setting(data)
+
+
+# --- update builders ---
+
+_update_ids = iter(range(1, 10**9))
+
+def channel_post_json(source_id, message_id, kind):
+    message = {
+        "message_id": message_id,
+        "date": int(time.time()),
+        "chat": {"id": source_id, "type": "channel", "title": f"Source {source_id}"},
+    }
+    marker = f"src{source_id}-{message_id}"
+    if kind == "text":
+        message["text"] = f"Post {marker}"
+    elif kind == "photo":
+        message["photo"] = [{"file_id": marker, "file_unique_id": f"u-{marker}", "width": 1280, "height": 720}]
+        message["caption"] = f"Photo {marker}"
+    elif kind == "video":
+        message["video"] = {"file_id": marker, "file_unique_id": f"u-{marker}", "width": 1280, "height": 720, "duration": 10}
+    else:
+        message["document"] = {"file_id": marker, "file_unique_id": f"u-{marker}"}
+    return {"update_id": next(_update_ids), "channel_post": message}
+
+def broadcast_callback_json():
+    chat = {"id": ADMIN_ID, "type": "private", "first_name": "Admin"}
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_update_ids)),
+            "from": {"id": ADMIN_ID, "is_bot": False, "first_name": "Admin"},
+            "chat_instance": "bench",
+            "data": "confirm_broadcast_yes",
+            "message": {"message_id": 1, "date": int(time.time()), "chat": chat, "text": "confirm"},
+        },
+    }
+
+
+# --- scenarios ---
+
+async def bench_handle_new_post(application, storage, args):
+    for s in range(args.sources):
+        for t in range(args.tasks_per_source):
+            user_id = USER_BASE_ID + t
+            storage.add_user(user_id)
+            storage.add_setting(user_id=user_id, source_channel_id=SOURCE_BASE_ID - s,
+                                target_channel_id=TARGET_BASE_ID - (s * args.tasks_per_source + t))
+
+    updates = [
+        Update.de_json(channel_post_json(SOURCE_BASE_ID - (i % args.sources), i + 1, CONTENT_KINDS[i % len(CONTENT_KINDS)]),
+                       application.bot)
+        for i in range(args.posts)
+    ]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    # --dispatch goes through the per-source lanes like the registered handler does
+    handler = forwarding.dispatch_new_post if args.dispatch else forwarding.handle_new_post
+
+    async def run_one(update):
+        async with semaphore:
+            context = CallbackContext.from_update(update, application)
+            started_at = time.perf_counter()
+            await handler(update, context)
+            latencies.append(time.perf_counter() - started_at)
+
+    await asyncio.gather(*(run_one(u) for u in updates))
+    return latencies, args.posts * args.tasks_per_source
+
+async def bench_process_task(application, storage, args):
+    setting_ids = []
+    for t in range(args.tasks):
+        user_id = USER_BASE_ID + t
+        storage.add_user(user_id)
+        setting_ids.append(storage.add_setting(
+            user_id=user_id, source_channel_id=SOURCE_BASE_ID - t, target_channel_id=TARGET_BASE_ID - t,
+            task_type='id_range', start_message_id=1, current_message_id=1,
+            end_message_id=args.ids_per_task, interval_seconds=1,
+        ))
+
+    latencies = []
+
+    async def run_task(setting_id):
+        job = BenchJob(jobs.process_task, data={'setting_id': setting_id}, name=f"task_{setting_id}")
+        for _ in range(args.ids_per_task):
+            context = CallbackContext.from_job(job, application)
+            started_at = time.perf_counter()
+            await jobs.process_task(context)
+            latencies.append(time.perf_counter() - started_at)
+            if job.removal_requested:
+                break
+
+    await asyncio.gather(*(run_task(sid) for sid in setting_ids))
+    return latencies, len(latencies)
+
+async def bench_execute_broadcast(application, storage, args):
+    for u in range(args.users):
+        storage.add_user(USER_BASE_ID + u)
+
+    update = Update.de_json(broadcast_callback_json(), application.bot)
+    context = CallbackContext.from_update(update, application)
+    context.user_data.update({'broadcast_type': 'text', 'broadcast_text': "Bench broadcast"})
+
+    started_at = time.perf_counter()
+    await admin.execute_broadcast(update, context)
+    elapsed = time.perf_counter() - started_at
+    # One latency sample per recipient (the broadcast is sequential)
+    return [elapsed / max(args.users, 1)] * args.users, args.users
+
+SCENARIOS = {
+    'handle_new_post': bench_handle_new_post,
+    'process_task': bench_process_task,
+    'execute_broadcast': bench_execute_broadcast,
+}
+
+
+async def run(args):
+    api = fake_api_from_args(args)
+    base_url = await api.start(port=args.port)
+    try:
+        storage = Storage(args.database_url)
+        # Same fair send queue as production; the budget is a flag so the bench is not capped at the real rate
+        rate_limiter = FairRateLimiter(rate=args.outbound_rate, burst=args.outbound_rate)
+        application = Application.builder().token(BOT_TOKEN).base_url(base_url).rate_limiter(rate_limiter).build()
+        await application.initialize()
+        api.reset()
+
+        started_at = time.perf_counter()
+        latencies, forwards = await SCENARIOS[args.scenario](application, storage, args)
+        elapsed = time.perf_counter() - started_at
+        await application.shutdown()
+    finally:
+        await api.stop()
+
+    result = {
+        'scenario': args.scenario,
+        'at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'forwards': forwards,
+        'elapsed_s': round(elapsed, 3),
+        'msgs_per_sec': round(forwards / elapsed, 1) if elapsed else 0.0,
+        'api_calls': sum(api.calls.values()),
+        'api_calls_per_forward': round(sum(api.calls.values()) / forwards, 2) if forwards else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'calls': dict(api.calls),
+        'injected_errors': dict(api.errors),
+        'params': {k: v for k, v in vars(args).items() if k not in ('json_out', 'database_url')},
+    }
+    if storage.fake and storage.fake.unhandled:
+        result['unemulated_db_statements'] = dict(storage.fake.unhandled)
+    return result
+
+def print_report(result):
+    print(f"Scenario:              {result['scenario']}")
+    print(f"Forwards:              {result['forwards']} in {result['elapsed_s']}s")
+    print(f"Throughput:            {result['msgs_per_sec']} msgs/sec")
+    print(f"Bot API calls/forward: {result['api_calls_per_forward']} ({result['api_calls']} total)")
+    print(f"Latency p50 / p99:     {result['p50_ms']} ms / {result['p99_ms']} ms")
+    print(f"Calls by method:       {result['calls']}")
+    if result['injected_errors']:
+        print(f"Injected errors:       {result['injected_errors']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline forwarding benchmarks against a fake Bot API")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default='handle_new_post')
+    parser.add_argument("--port", type=int, default=8081, help="port for the fake Bot API")
+    parser.add_argument("--database-url", default=None, help="disposable Postgres to use instead of the in-process stand-in")
+    parser.add_argument("--posts", type=int, default=1000, help="handle_new_post: channel posts to deliver")
+    parser.add_argument("--sources", type=int, default=10, help="handle_new_post: distinct source channels")
+    parser.add_argument("--tasks-per-source", type=int, default=2, help="handle_new_post: tasks fed by each source")
+    parser.add_argument("--concurrency", type=int, default=32, help="handle_new_post: posts processed at once")
+    parser.add_argument("--dispatch", action="store_true", help="handle_new_post: go through the per-source dispatcher")
+    parser.add_argument("--tasks", type=int, default=20, help="process_task: id_range tasks")
+    parser.add_argument("--ids-per-task", type=int, default=50, help="process_task: message ids per task")
+    parser.add_argument("--users", type=int, default=500, help="execute_broadcast: recipients")
+    parser.add_argument("--outbound-rate", type=float, default=100000,
+                        help="send budget (msgs/sec) of the fair rate limiter; use 25 for the production value")
+    parser.add_argument("--json-out", default=None, help="append the result as one JSON line to this file")
+    add_fake_api_arguments(parser)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.json_out:
+        with open(args.json_out, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+if __name__ == "__main__":
+    main()
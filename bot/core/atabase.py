@@ -1,19 +1,29 @@
+import time
+from datetime import timedelta
 import psycopg
-from psycopg.rows import RealDictRow
+from psycopg.rows import RealDictRow, class_row
 from psycopg.types.json import Jsonb
 import logging
 from . import config
+from .metrics import DB_QUERY_LATENCY, statement_label
+from .profiler import profiled
+from .models import Setting, User, SETTING_COLUMNS, USER_COLUMNS
 
 logger = logging.getLogger(__name__)
 
-def db_query(query, params=(), fetch_one=False, commit=False):
-    """General purpose DB helper function using psycopg."""
+@profiled("db_query")
+def db_query(query, params=(), fetch_one=False, commit=False, row_factory=None):
+    """
+    General purpose DB helper function using psycopg.
+    Rows are RealDictRows unless another row_factory (e.g. class_row(Setting)) is given.
+    """
+    started_at = time.perf_counter()
     try:
         # Use a context manager for the connection
         with psycopg.connect(config.DATABASE_URL) as conn:
             # Use a context manager for the cursor
             # RealDictRow makes results behave like dictionaries (e.g., row['user_id'])
-            with conn.cursor(row_factory=RealDictRow) as cursor:
+            with conn.cursor(row_factory=row_factory or RealDictRow) as cursor:
                 cursor.execute(query, params)
                 
                 result = None
@@ -31,6 +41,30 @@ def db_query(query, params=(), fetch_one=False, commit=False):
         logger.error(f"Database error executing query: {query} \nParams: {params} \nError: {e}", exc_info=True)
         # Re-raise the exception to be handled by the caller
         raise
+    finally:
+        DB_QUERY_LATENCY.labels(statement_label(query)).observe(time.perf_counter() - started_at)
+
+def db_execute_many(query, params_seq):
+    """Runs the same statement for every params tuple in one connection and one transaction."""
+    if not params_seq:
+        return
+    started_at = time.perf_counter()
+    try:
+        with psycopg.connect(config.DATABASE_URL) as conn:
+            with conn.cursor() as cursor:
+                cursor.executemany(query, params_seq)
+            conn.commit()
+    except Exception as e:
+        logger.error(f"Database error executing batch: {query} \nRows: {len(params_seq)} \nError: {e}", exc_info=True)
+        raise
+    finally:
+        DB_QUERY_LATENCY.labels(statement_label(query)).observe(time.perf_counter() - started_at)
+
+def ping_db(timeout):
+    """Runs SELECT 1 on a new connection, giving up after timeout seconds. Raises if the DB can't be reached."""
+    with psycopg.connect(config.DATABASE_URL, connect_timeout=max(1, int(timeout)),
+                         options=f"-c statement_timeout={int(timeout * 1000)}") as conn:
+        conn.execute("SELECT 1")
 
 def init_db():
     """Initializes the PostgreSQL database tables."""
@@ -47,6 +81,11 @@ def init_db():
         )
     """
     
+    # Only banned users are indexed: the ban sweep finds expired temporary bans without a scan
+    create_users_banned_until_index = """
+        CREATE INDEX IF NOT EXISTS users_banned_until_idx ON users (banned_until) WHERE is_banned
+    """
+    
     create_settings_table = """
         CREATE TABLE IF NOT EXISTS channels_settings (
             id SERIAL PRIMARY KEY,
@@ -68,9 +107,204 @@ def init_db():
             FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
         )
     """
+
+    create_task_stats_table = """
+        CREATE TABLE IF NOT EXISTS task_stats (
+            setting_id INTEGER PRIMARY KEY,
+            forwarded_count BIGINT DEFAULT 0,
+            skipped_count BIGINT DEFAULT 0,
+            failed_count BIGINT DEFAULT 0,
+            retry_count BIGINT DEFAULT 0,
+            latency_ms_sum BIGINT DEFAULT 0,
+            latency_buckets BIGINT[] DEFAULT '{}',
+            first_recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+            FOREIGN KEY (setting_id) REFERENCES channels_settings(id) ON DELETE CASCADE
+        )
+    """
+
+    # Fair scheduling of outbound sends: share weight and optional sends-per-minute cap per user
+    add_users_send_policy_columns = """
+        ALTER TABLE users
+            ADD COLUMN IF NOT EXISTS send_weight INTEGER DEFAULT 1,
+            ADD COLUMN IF NOT EXISTS send_cap_per_minute INTEGER
+    """
+    # Opt-in per task: drop content already sent to the same target
+    add_settings_dedup_column = """
+        ALTER TABLE channels_settings ADD COLUMN IF NOT EXISTS dedup_enabled BOOLEAN DEFAULT FALSE
+    """
+    # Per-task filter rules, see core/filters.py
+    add_settings_filter_rules_column = """
+        ALTER TABLE channels_settings ADD COLUMN IF NOT EXISTS filter_rules JSONB
+    """
+    # 'catch_up' tasks: set once the backfill has handed over to live delivery
+    add_settings_catch_up_done_column = """
+        ALTER TABLE channels_settings ADD COLUMN IF NOT EXISTS catch_up_done BOOLEAN DEFAULT FALSE
+    """
+    # Per-task caption rewriting rules, see core/captions.py
+    add_settings_caption_rules_column = """
+        ALTER TABLE channels_settings ADD COLUMN IF NOT EXISTS caption_rules JSONB
+    """
+    add_task_stats_dedup_column = """
+        ALTER TABLE task_stats ADD COLUMN IF NOT EXISTS deduplicated_count BIGINT DEFAULT 0
+    """
+
+    # Content already sent per target (file_unique_id or text hash), kept for DEDUP_TTL_SECONDS
+    create_dedup_index_table = """
+        CREATE TABLE IF NOT EXISTS dedup_index (
+            target_channel_id BIGINT NOT NULL,
+            content_key TEXT NOT NULL,
+            seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (target_channel_id, content_key)
+        )
+    """
+    create_dedup_index_seen_at_index = """
+        CREATE INDEX IF NOT EXISTS dedup_index_seen_at_idx ON dedup_index (seen_at)
+    """
+
+    # Append-only log of which target message each forward produced, kept for MESSAGE_MAP_RETENTION_DAYS
+    create_message_map_table = """
+        CREATE TABLE IF NOT EXISTS message_map (
+            source_chat_id BIGINT NOT NULL,
+            source_message_id BIGINT NOT NULL,
+            target_chat_id BIGINT NOT NULL,
+            target_message_id BIGINT NOT NULL,
+            setting_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    create_message_map_source_index = """
+        CREATE INDEX IF NOT EXISTS message_map_source_idx ON message_map (source_chat_id, source_message_id)
+    """
+    create_message_map_created_at_index = """
+        CREATE INDEX IF NOT EXISTS message_map_created_at_idx ON message_map (created_at)
+    """
+
+    # Audit log of every send, partitioned by day (see core/forward_log.py for partition upkeep)
+    create_forward_log_table = """
+        CREATE TABLE IF NOT EXISTS forward_log (
+            logged_at TIMESTAMPTZ NOT NULL,
+            setting_id INTEGER,
+            source_chat_id BIGINT,
+            source_message_id BIGINT,
+            target_chat_id BIGINT,
+            target_message_id BIGINT,
+            outcome TEXT NOT NULL,
+            error TEXT
+        ) PARTITION BY RANGE (logged_at)
+    """
+    create_forward_log_setting_index = """
+        CREATE INDEX IF NOT EXISTS forward_log_setting_idx ON forward_log (setting_id, logged_at)
+    """
+
+    # Aggregate counters for the admin views, kept up to date by the triggers below so reading
+    # them never scans users / channels_settings / forward_log. Names: 'users', 'banned_users',
+    # 'active_tasks:<task_type>', 'forwarded:<YYYY-MM-DD>' (UTC). See core/counters.py.
+    create_app_counters_table = """
+        CREATE TABLE IF NOT EXISTS app_counters (
+            name TEXT PRIMARY KEY,
+            value BIGINT NOT NULL DEFAULT 0
+        )
+    """
+    create_bump_counter_function = """
+        CREATE OR REPLACE FUNCTION bump_app_counter(counter_name TEXT, delta BIGINT) RETURNS void AS $$
+            INSERT INTO app_counters (name, value) VALUES (counter_name, delta)
+            ON CONFLICT (name) DO UPDATE SET value = app_counters.value + EXCLUDED.value
+        $$ LANGUAGE sql
+    """
+    create_users_counter_function = """
+        CREATE OR REPLACE FUNCTION count_users_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM bump_app_counter('users', 1);
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM bump_app_counter('users', -1);
+            END IF;
+            IF TG_OP <> 'INSERT' AND COALESCE(OLD.is_banned, FALSE) THEN
+                PERFORM bump_app_counter('banned_users', -1);
+            END IF;
+            IF TG_OP <> 'DELETE' AND COALESCE(NEW.is_banned, FALSE) THEN
+                PERFORM bump_app_counter('banned_users', 1);
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """
+    create_tasks_counter_function = """
+        CREATE OR REPLACE FUNCTION count_tasks_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' AND COALESCE(OLD.is_active, FALSE) THEN
+                PERFORM bump_app_counter('active_tasks:' || OLD.task_type, -1);
+            END IF;
+            IF TG_OP <> 'DELETE' AND COALESCE(NEW.is_active, FALSE) THEN
+                PERFORM bump_app_counter('active_tasks:' || NEW.task_type, 1);
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """
+    # Statement level: one counter update per COPY of buffered forward_log rows, not per row
+    create_forwards_counter_function = """
+        CREATE OR REPLACE FUNCTION count_forwards_trigger() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO app_counters (name, value)
+            SELECT 'forwarded:' || to_char(logged_at AT TIME ZONE 'UTC', 'YYYY-MM-DD'), COUNT(*)
+            FROM new_rows WHERE outcome = 'forwarded'
+            GROUP BY 1
+            ON CONFLICT (name) DO UPDATE SET value = app_counters.value + EXCLUDED.value;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """
+    # Only the columns the counters depend on fire the UPDATE triggers, so the per-post
+    # last_processed_message_id / current_message_id updates don't touch app_counters
+    create_counter_triggers = (
+        "DROP TRIGGER IF EXISTS users_counters ON users",
+        """
+        CREATE TRIGGER users_counters AFTER INSERT OR DELETE OR UPDATE OF is_banned ON users
+        FOR EACH ROW EXECUTE FUNCTION count_users_trigger()
+        """,
+        "DROP TRIGGER IF EXISTS channels_settings_counters ON channels_settings",
+        """
+        CREATE TRIGGER channels_settings_counters AFTER INSERT OR DELETE OR UPDATE OF is_active, task_type ON channels_settings
+        FOR EACH ROW EXECUTE FUNCTION count_tasks_trigger()
+        """,
+        "DROP TRIGGER IF EXISTS forward_log_counters ON forward_log",
+        """
+        CREATE TRIGGER forward_log_counters AFTER INSERT ON forward_log
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION count_forwards_trigger()
+        """,
+    )
     try:
         db_query(create_users_table, commit=True)
+        db_query(create_users_banned_until_index, commit=True)
         db_query(create_settings_table, commit=True)
+        db_query(create_task_stats_table, commit=True)
+        db_query(add_users_send_policy_columns, commit=True)
+        db_query(add_settings_dedup_column, commit=True)
+        db_query(add_settings_filter_rules_column, commit=True)
+        db_query(add_settings_caption_rules_column, commit=True)
+        db_query(add_settings_catch_up_done_column, commit=True)
+        db_query(add_task_stats_dedup_column, commit=True)
+        db_query(create_dedup_index_table, commit=True)
+        db_query(create_dedup_index_seen_at_index, commit=True)
+        db_query(create_message_map_table, commit=True)
+        db_query(create_message_map_source_index, commit=True)
+        db_query(create_message_map_created_at_index, commit=True)
+        db_query(create_forward_log_table, commit=True)
+        db_query(create_forward_log_setting_index, commit=True)
+        db_query(create_app_counters_table, commit=True)
+        db_query(create_bump_counter_function, commit=True)
+        db_query(create_users_counter_function, commit=True)
+        db_query(create_tasks_counter_function, commit=True)
+        db_query(create_forwards_counter_function, commit=True)
+        for statement in create_counter_triggers:
+            db_query(statement, commit=True)
+        # The triggers only count changes from now on: seed the counters from the tables
+        from .counters import reconcile as reconcile_counters
+        reconcile_counters()
         logger.info("Database tables checked/created successfully.")
     except Exception as e:
         logger.critical(f"Failed to initialize database tables: {e}", exc_info=True)
@@ -79,7 +313,8 @@ def init_db():
 # --- User DB Functions ---
 
 def get_user(user_id):
-    return db_query("SELECT * FROM users WHERE user_id = %s", (user_id,), fetch_one=True)
+    return db_query(f"SELECT {USER_COLUMNS} FROM users WHERE user_id = %s", (user_id,), fetch_one=True,
+                    row_factory=class_row(User))
 
 def add_user(user_id, username, first_name, last_name, is_admin=False):
     # Use PostgreSQL's "ON CONFLICT" to handle "INSERT OR IGNORE"
@@ -94,9 +329,83 @@ def update_user_ban_status(user_id, is_banned, banned_until=None):
     db_query("UPDATE users SET is_banned = %s, banned_until = %s WHERE user_id = %s",
              (is_banned, banned_until, user_id), commit=True)
 
+def update_users_ban_status(user_ids, is_banned, banned_until=None):
+    """Set-based update_user_ban_status for many users in one statement. Returns the ids that exist."""
+    rows = db_query(
+        "UPDATE users SET is_banned = %s, banned_until = %s WHERE user_id = ANY(%s) RETURNING user_id",
+        (is_banned, banned_until, list(user_ids))
+    )
+    return [row['user_id'] for row in rows]
+
+def lift_expired_ban(user_id, now):
+    """Clears one user's temporary ban if banned_until has passed. Returns True if it was lifted."""
+    row = db_query(
+        "UPDATE users SET is_banned = FALSE, banned_until = NULL WHERE user_id = %s AND is_banned AND banned_until <= %s RETURNING user_id",
+        (user_id, now), fetch_one=True
+    )
+    return row is not None
+
+def get_users_bulk_summary(user_ids):
+    """How many of user_ids exist and how many active tasks they own, as {users, tasks}."""
+    user_ids = list(user_ids)
+    return db_query("""
+        SELECT
+            (SELECT COUNT(*) FROM users WHERE user_id = ANY(%s)) AS users,
+            (SELECT COUNT(*) FROM channels_settings WHERE user_id = ANY(%s) AND is_active) AS tasks
+    """, (user_ids, user_ids), fetch_one=True)
+
+def lift_expired_bans(now):
+    """Clears every temporary ban whose banned_until has passed, in one UPDATE. Returns the unbanned user ids."""
+    rows = db_query(
+        "UPDATE users SET is_banned = FALSE, banned_until = NULL WHERE is_banned AND banned_until <= %s RETURNING user_id",
+        (now,)
+    )
+    return [row['user_id'] for row in rows]
+
+def update_user_send_policy(user_id, send_weight, send_cap_per_minute=None):
+    db_query("UPDATE users SET send_weight = %s, send_cap_per_minute = %s WHERE user_id = %s",
+             (send_weight, send_cap_per_minute, user_id), commit=True)
+
+def get_user_send_policies():
+    """Users whose weight or cap differ from the defaults."""
+    return db_query("""
+        SELECT user_id, send_weight, send_cap_per_minute FROM users
+        WHERE send_weight <> 1 OR send_cap_per_minute IS NOT NULL
+    """)
+
 def get_total_users():
     return db_query("SELECT COUNT(*) AS count FROM users", fetch_one=True)['count']
 
+def get_app_counters(forwarded_name):
+    """All user / task counters plus one day's forward counter ('forwarded:<YYYY-MM-DD>') as {name: value}."""
+    rows = db_query(
+        "SELECT name, value FROM app_counters WHERE NOT starts_with(name, 'forwarded:') OR name = %s",
+        (forwarded_name,)
+    )
+    return {row['name']: row['value'] for row in rows}
+
+def reconcile_app_counters(forwarded_name, day_start, oldest_forwarded_name):
+    """
+    Recounts the trigger-maintained counters from the tables (forwards only for the day starting
+    at day_start) and drops day counters older than oldest_forwarded_name.
+    """
+    query = """
+        WITH actual AS (
+            SELECT 'users' AS name, COUNT(*) AS value FROM users
+            UNION ALL SELECT 'banned_users', COUNT(*) FROM users WHERE is_banned
+            UNION ALL SELECT 'active_tasks:' || task_type, COUNT(*) FROM channels_settings WHERE is_active GROUP BY task_type
+            UNION ALL SELECT %s, COUNT(*) FROM forward_log WHERE logged_at >= %s AND outcome = 'forwarded'
+        ), stale AS (
+            UPDATE app_counters SET value = 0
+            WHERE starts_with(name, 'active_tasks:') AND name NOT IN (SELECT name FROM actual)
+        )
+        INSERT INTO app_counters (name, value) SELECT name, value FROM actual
+        ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value
+    """
+    db_query(query, (forwarded_name, day_start), commit=True)
+    db_query("DELETE FROM app_counters WHERE starts_with(name, 'forwarded:') AND name < %s",
+             (oldest_forwarded_name,), commit=True)
+
 def get_all_users_ids():
     users = db_query("SELECT user_id FROM users WHERE is_banned = FALSE")
     return [user['user_id'] for user in users]
@@ -104,13 +413,38 @@ def get_all_users_ids():
 # --- Settings DB Functions ---
 
 def get_user_forward_settings(user_id):
-    return db_query("SELECT * FROM channels_settings WHERE user_id = %s", (user_id,))
+    return db_query(f"SELECT {SETTING_COLUMNS} FROM channels_settings WHERE user_id = %s", (user_id,),
+                    row_factory=class_row(Setting))
+
+def get_user_forward_settings_page(user_id, after_id=0, before_id=None, limit=5):
+    """
+    Keyset-paginated version of get_user_forward_settings.
+    Returns up to limit + 1 rows in ascending id order; the extra row tells the
+    caller that another page exists in the direction of travel.
+    """
+    if before_id is not None:
+        rows = db_query(
+            f"SELECT {SETTING_COLUMNS} FROM channels_settings WHERE user_id = %s AND id < %s ORDER BY id DESC LIMIT %s",
+            (user_id, before_id, limit + 1), row_factory=class_row(Setting)
+        )
+        return list(reversed(rows))
+    return db_query(
+        f"SELECT {SETTING_COLUMNS} FROM channels_settings WHERE user_id = %s AND id > %s ORDER BY id LIMIT %s",
+        (user_id, after_id, limit + 1), row_factory=class_row(Setting)
+    )
 
 def get_all_active_forward_settings():
-    return db_query("SELECT * FROM channels_settings WHERE is_active = TRUE")
+    return db_query(f"SELECT {SETTING_COLUMNS} FROM channels_settings WHERE is_active = TRUE",
+                    row_factory=class_row(Setting))
 
 def get_setting_by_id(setting_id):
-    return db_query("SELECT * FROM channels_settings WHERE id = %s", (setting_id,), fetch_one=True)
+    return db_query(f"SELECT {SETTING_COLUMNS} FROM channels_settings WHERE id = %s", (setting_id,), fetch_one=True,
+                    row_factory=class_row(Setting))
+
+def get_task_owner_ids_by_target(target_channel_id):
+    rows = db_query("SELECT DISTINCT user_id FROM channels_settings WHERE target_channel_id = %s",
+                    (target_channel_id,))
+    return [row['user_id'] for row in rows]
 
 def add_forward_setting(data):
     # We must use "RETURNING id" to get the new ID in PostgreSQL
@@ -138,6 +472,39 @@ def add_forward_setting(data):
     return new_row['id'] if new_row else None
 
 
+# Columns add_forward_settings() writes, in order; everything else keeps its default
+TASK_INSERT_COLUMNS = (
+    'user_id', 'source_channel_id', 'target_channel_id', 'custom_caption', 'remove_tags_caption',
+    'task_type', 'start_message_id', 'end_message_id', 'current_message_id', 'forward_every_n_posts',
+    'interval_seconds', 'is_active', 'dedup_enabled', 'filter_rules', 'caption_rules',
+)
+
+@profiled("add_forward_settings")
+def add_forward_settings(rows):
+    """
+    Inserts several tasks (dicts shaped like add_forward_setting's data) with one multi-row
+    INSERT in one transaction, so either all of them are created or none.
+    Returns the new rows as {id, target_channel_id, task_type, interval_seconds, is_active}.
+    """
+    if not rows:
+        return []
+    placeholders = ", ".join(["(" + ", ".join(["%s"] * len(TASK_INSERT_COLUMNS)) + ")"] * len(rows))
+    query = f"INSERT INTO channels_settings ({', '.join(TASK_INSERT_COLUMNS)}) VALUES {placeholders} RETURNING id, target_channel_id, task_type, interval_seconds, is_active"
+    params = []
+    for data in rows:
+        params.extend((
+            data['user_id'], data['source_channel_id'], data['target_channel_id'],
+            data.get('custom_caption', ""), data.get('remove_tags_caption', True), data['task_type'],
+            data.get('start_message_id', 0), data.get('end_message_id', 0),
+            data.get('start_message_id', 0), # current_id starts at start_id
+            data.get('forward_every_n_posts', 1), data.get('interval_seconds', 0), data.get('is_active', True),
+            data.get('dedup_enabled', False),
+            Jsonb(data['filter_rules']) if data.get('filter_rules') else None,
+            Jsonb(data['caption_rules']) if data.get('caption_rules') else None,
+        ))
+    # db_query commits when the connection closes, so the RETURNING rows come back with commit=False
+    return db_query(query, params)
+
 def update_setting_last_processed_id(setting_id, message_id):
     db_query("UPDATE channels_settings SET last_processed_message_id = %s WHERE id = %s", 
              (message_id, setting_id), commit=True)
@@ -150,6 +517,13 @@ def update_setting_active(setting_id, is_active):
     db_query("UPDATE channels_settings SET is_active = %s WHERE id = %s", 
              (is_active, setting_id), commit=True)
 
+def pause_users_settings(user_ids):
+    """Pauses every active task of the given users in one statement. Returns the paused rows (id, task_type)."""
+    return db_query(
+        "UPDATE channels_settings SET is_active = FALSE WHERE user_id = ANY(%s) AND is_active RETURNING id, task_type",
+        (list(user_ids),)
+    )
+
 def update_setting_caption(setting_id, new_caption):
     db_query("UPDATE channels_settings SET custom_caption = %s WHERE id = %s",
              (new_caption, setting_id), commit=True)
@@ -158,5 +532,173 @@ def update_setting_remove_tags(setting_id, new_status):
     db_query("UPDATE channels_settings SET remove_tags_caption = %s WHERE id = %s",
              (new_status, setting_id), commit=True)
 
+def update_catch_up_progress(setting_id, next_message_id, watermark):
+    """Advances a backfilling 'catch_up' task: next id to copy and the highest source id known to exist."""
+    db_query("UPDATE channels_settings SET current_message_id = %s, last_processed_message_id = %s WHERE id = %s",
+             (next_message_id, watermark, setting_id), commit=True)
+
+def finish_catch_up(setting_id, watermark):
+    """Hands a 'catch_up' task over to live delivery; posts up to watermark were handled by the backfill."""
+    query = """
+        UPDATE channels_settings
+        SET catch_up_done = TRUE, last_processed_message_id = %s, current_message_id = %s
+        WHERE id = %s
+    """
+    db_query(query, (watermark, watermark + 1, setting_id), commit=True)
+
+def update_setting_dedup(setting_id, dedup_enabled):
+    db_query("UPDATE channels_settings SET dedup_enabled = %s WHERE id = %s",
+             (dedup_enabled, setting_id), commit=True)
+
+def update_setting_filter_rules(setting_id, filter_rules):
+    db_query("UPDATE channels_settings SET filter_rules = %s WHERE id = %s",
+             (Jsonb(filter_rules) if filter_rules else None, setting_id), commit=True)
+
+def update_setting_caption_rules(setting_id, caption_rules):
+    db_query("UPDATE channels_settings SET caption_rules = %s WHERE id = %s",
+             (Jsonb(caption_rules) if caption_rules else None, setting_id), commit=True)
+
 def delete_setting_by_id(setting_id):
     db_query("DELETE FROM channels_settings WHERE id = %s", (setting_id,), commit=True)
+
+# --- Task Stats DB Functions ---
+
+def upsert_task_stats(deltas):
+    """
+    Adds the in-memory counter deltas ({setting_id: counters}) to task_stats.
+    Rows for tasks deleted since the deltas were recorded are skipped.
+    """
+    query = """
+        INSERT INTO task_stats
+        (setting_id, forwarded_count, skipped_count, failed_count, retry_count, deduplicated_count,
+         latency_ms_sum, latency_buckets, first_recorded_at)
+        SELECT %s, %s, %s, %s, %s, %s, %s, %s::BIGINT[], %s
+        WHERE EXISTS (SELECT 1 FROM channels_settings WHERE id = %s)
+        ON CONFLICT (setting_id) DO UPDATE SET
+            forwarded_count = task_stats.forwarded_count + EXCLUDED.forwarded_count,
+            skipped_count = task_stats.skipped_count + EXCLUDED.skipped_count,
+            failed_count = task_stats.failed_count + EXCLUDED.failed_count,
+            retry_count = task_stats.retry_count + EXCLUDED.retry_count,
+            deduplicated_count = task_stats.deduplicated_count + EXCLUDED.deduplicated_count,
+            latency_ms_sum = task_stats.latency_ms_sum + EXCLUDED.latency_ms_sum,
+            latency_buckets = CASE
+                WHEN cardinality(task_stats.latency_buckets) = cardinality(EXCLUDED.latency_buckets) THEN
+                    ARRAY(SELECT t.a + t.b
+                          FROM unnest(task_stats.latency_buckets, EXCLUDED.latency_buckets) WITH ORDINALITY AS t(a, b, i)
+                          ORDER BY t.i)
+                ELSE EXCLUDED.latency_buckets
+            END,
+            updated_at = CURRENT_TIMESTAMP
+    """
+    params_seq = [
+        (setting_id, d['forwarded_count'], d['skipped_count'], d['failed_count'], d['retry_count'],
+         d['deduplicated_count'], d['latency_ms_sum'], d['latency_buckets'], d['first_recorded_at'], setting_id)
+        for setting_id, d in deltas.items()
+    ]
+    db_execute_many(query, params_seq)
+
+# --- Dedup Index DB Functions ---
+
+def claim_dedup_key(target_channel_id, content_key, ttl_seconds):
+    """
+    Records content_key as sent to the target. Returns True if it was not seen
+    within ttl_seconds (the caller may send), False if it is a duplicate.
+    """
+    query = """
+        INSERT INTO dedup_index (target_channel_id, content_key) VALUES (%s, %s)
+        ON CONFLICT (target_channel_id, content_key) DO UPDATE SET seen_at = CURRENT_TIMESTAMP
+        WHERE dedup_index.seen_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+        RETURNING seen_at
+    """
+    return db_query(query, (target_channel_id, content_key, ttl_seconds), fetch_one=True) is not None
+
+def release_dedup_key(target_channel_id, content_key):
+    db_query("DELETE FROM dedup_index WHERE target_channel_id = %s AND content_key = %s",
+             (target_channel_id, content_key), commit=True)
+
+def purge_dedup_index(ttl_seconds):
+    db_query("DELETE FROM dedup_index WHERE seen_at < CURRENT_TIMESTAMP - make_interval(secs => %s)",
+             (ttl_seconds,), commit=True)
+
+def insert_message_map(source_chat_id, source_message_id, target_chat_id, target_message_id, setting_id):
+    query = """
+        INSERT INTO message_map (source_chat_id, source_message_id, target_chat_id, target_message_id, setting_id)
+        VALUES (%s, %s, %s, %s, %s)
+    """
+    db_query(query, (source_chat_id, source_message_id, target_chat_id, target_message_id, setting_id), commit=True)
+
+def get_message_map(source_chat_id, source_message_id, retention_days):
+    query = """
+        SELECT setting_id, target_chat_id, target_message_id FROM message_map
+        WHERE source_chat_id = %s AND source_message_id = %s
+          AND created_at >= CURRENT_TIMESTAMP - make_interval(days => %s)
+    """
+    return db_query(query, (source_chat_id, source_message_id, retention_days))
+
+def purge_message_map(retention_days):
+    db_query("DELETE FROM message_map WHERE created_at < CURRENT_TIMESTAMP - make_interval(days => %s)",
+             (retention_days,), commit=True)
+
+FORWARD_LOG_COLUMNS = ('logged_at', 'setting_id', 'source_chat_id', 'source_message_id',
+                       'target_chat_id', 'target_message_id', 'outcome', 'error')
+
+@profiled("copy_forward_log")
+def copy_forward_log(rows):
+    """Bulk-inserts forward log rows (tuples in FORWARD_LOG_COLUMNS order) with one COPY."""
+    query = f"COPY forward_log ({', '.join(FORWARD_LOG_COLUMNS)}) FROM STDIN"
+    started_at = time.perf_counter()
+    try:
+        with psycopg.connect(config.DATABASE_URL) as conn:
+            with conn.cursor() as cursor:
+                with cursor.copy(query) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+    except Exception as e:
+        logger.error(f"Database error copying {len(rows)} rows into forward_log: {e}", exc_info=True)
+        raise
+    finally:
+        DB_QUERY_LATENCY.labels("copy_forward_log").observe(time.perf_counter() - started_at)
+
+def create_forward_log_partition(day):
+    """Creates the forward_log partition holding the rows logged on `day` (UTC) if it does not exist."""
+    next_day = day + timedelta(days=1)
+    db_query(f"""
+        CREATE TABLE IF NOT EXISTS forward_log_{day:%Y%m%d} PARTITION OF forward_log
+        FOR VALUES FROM ('{day:%Y-%m-%d} 00:00+00') TO ('{next_day:%Y-%m-%d} 00:00+00')
+    """, commit=True)
+
+def get_forward_log_partitions():
+    query = """
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'forward_log'
+    """
+    return [row['relname'] for row in db_query(query)]
+
+def drop_forward_log_partition(name):
+    db_query(f"DROP TABLE IF EXISTS {name}", commit=True)
+
+def get_recent_forward_failures(setting_id, lookback_days, limit=20):
+    """Latest failed sends of a task. The logged_at bound lets Postgres scan only the recent partitions."""
+    query = """
+        SELECT logged_at, source_message_id, target_chat_id, error FROM forward_log
+        WHERE setting_id = %s AND outcome = 'failed'
+          AND logged_at >= CURRENT_TIMESTAMP - make_interval(days => %s)
+        ORDER BY logged_at DESC
+        LIMIT %s
+    """
+    return db_query(query, (setting_id, lookback_days, limit))
+
+def get_task_stats_rows(setting_ids):
+    return db_query("SELECT * FROM task_stats WHERE setting_id = ANY(%s)", (setting_ids,))
+
+def get_top_task_stats_rows(limit=10):
+    query = """
+        SELECT ts.*, cs.user_id, cs.task_type
+        FROM task_stats ts
+        JOIN channels_settings cs ON cs.id = ts.setting_id
+        ORDER BY ts.forwarded_count + ts.failed_count DESC
+        LIMIT %s
+    """
+    return db_query(query, (limit,))
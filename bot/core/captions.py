@@ -0,0 +1,246 @@
+import html
+import re
+
+# Per-task caption rules (channels_settings.caption_rules), all optional. They apply to the
+# original text/caption when the task keeps it (remove_tags_caption off):
+#   strip_hashtags  remove #hashtags and $cashtags
+#   strip_mentions  remove @mentions and text mentions
+#   strip_links     remove URLs and turn text links into plain text
+#   replace         [[pattern, replacement], ...] regex rewrites of the remaining text
+CAPTION_RULE_KEYS = ('strip_hashtags', 'strip_mentions', 'strip_links', 'replace')
+MAX_REPLACE_RULES = 10
+
+# Placeholders a custom caption can use, filled in per message
+TEMPLATE_FIELDS = ('source_title', 'source_id', 'message_id', 'date', 'time')
+TEMPLATE_RE = re.compile(r"\{(" + "|".join(TEMPLATE_FIELDS) + r")\}")
+
+_SIMPLE_TAGS = {
+    'bold': 'b', 'italic': 'i', 'underline': 'u', 'strikethrough': 's',
+    'spoiler': 'tg-spoiler', 'code': 'code', 'blockquote': 'blockquote',
+}
+FORMATTING_TYPES = frozenset(_SIMPLE_TAGS) | {'pre', 'text_link', 'text_mention', 'custom_emoji', 'expandable_blockquote'}
+
+_EXTRA_SPACES_RE = re.compile(r"[ \t]{2,}")
+_TRAILING_SPACES_RE = re.compile(r"[ \t]+\n")
+_EXTRA_NEWLINES_RE = re.compile(r"\n{3,}")
+
+_TRUE_VALUES = ('yes', 'true', '1', 'on', 'បាទ', 'ចាស')
+
+
+def normalize_caption_rules(rules):
+    """Drops empty / unknown entries so a task without rules has rules == {}."""
+    if not rules:
+        return {}
+    result = {}
+    for key in ('strip_hashtags', 'strip_mentions', 'strip_links'):
+        if rules.get(key):
+            result[key] = True
+    replace = [[pattern, replacement or ""] for pattern, replacement in rules.get('replace') or [] if pattern]
+    if replace:
+        result['replace'] = replace[:MAX_REPLACE_RULES]
+    return result
+
+def parse_caption_rules_text(text):
+    """
+    Parses the rules a user typed, one 'key: value' per line, e.g.
+        strip_hashtags: yes
+        strip_links: yes
+        replace: @oldchannel => @newchannel
+    Raises ValueError with the offending line.
+    """
+    rules = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        key, sep, value = line.partition(':')
+        key = key.strip().lower()
+        if not sep or key not in CAPTION_RULE_KEYS:
+            raise ValueError(line)
+        value = value.strip()
+        if key == 'replace':
+            pattern, arrow, replacement = value.partition('=>')
+            pattern = pattern.strip()
+            if not arrow or not pattern:
+                raise ValueError(line)
+            try:
+                re.compile(pattern)
+            except re.error:
+                raise ValueError(line)
+            rules.setdefault('replace', []).append([pattern, replacement.strip()])
+            if len(rules['replace']) > MAX_REPLACE_RULES:
+                raise ValueError(line)
+        else:
+            rules[key] = value.lower() in _TRUE_VALUES
+    return normalize_caption_rules(rules)
+
+def format_caption_rules(rules):
+    """The rules in the same 'key: value' form parse_caption_rules_text() accepts."""
+    lines = [f"{key}: yes" for key in ('strip_hashtags', 'strip_mentions', 'strip_links') if rules.get(key)]
+    lines.extend(f"replace: {pattern} => {replacement}" for pattern, replacement in rules.get('replace', ()))
+    return "\n".join(lines)
+
+
+def _open_tag(entity):
+    if entity.type == 'text_link':
+        return f'<a href="{html.escape(entity.url)}">'
+    if entity.type == 'text_mention':
+        return f'<a href="tg://user?id={entity.user.id}">'
+    if entity.type == 'pre':
+        return f'<pre><code class="language-{html.escape(entity.language)}">' if entity.language else "<pre>"
+    if entity.type == 'custom_emoji':
+        return f'<tg-emoji emoji-id="{entity.custom_emoji_id}">'
+    if entity.type == 'expandable_blockquote':
+        return "<blockquote expandable>"
+    return f"<{_SIMPLE_TAGS[entity.type]}>"
+
+def _close_tag(entity):
+    if entity.type in ('text_link', 'text_mention'):
+        return "</a>"
+    if entity.type == 'pre':
+        return "</code></pre>" if entity.language else "</pre>"
+    if entity.type == 'custom_emoji':
+        return "</tg-emoji>"
+    if entity.type == 'expandable_blockquote':
+        return "</blockquote>"
+    return f"</{_SIMPLE_TAGS[entity.type]}>"
+
+def render_entities(text, entities, drop_types=frozenset(), unlink=False, rewrite=None):
+    """
+    Renders text and its entities as Telegram HTML in one pass, without parsing HTML.
+    The spans of entities whose type is in drop_types are removed, text links become plain
+    text if unlink is set, and rewrite() is applied to the plain text between tags.
+    Entity offsets and lengths are in UTF-16 code units.
+    """
+    data = text.encode('utf-16-le')
+    size = len(data) // 2
+    dropped = [(e.offset, e.offset + e.length) for e in entities or () if e.type in drop_types]
+    kept = [
+        e for e in entities or ()
+        if e.type in FORMATTING_TYPES and not (unlink and e.type == 'text_link')
+        and not any(start <= e.offset and e.offset + e.length <= stop for start, stop in dropped)
+    ]
+    kept.sort(key=lambda e: (e.offset, -e.length))
+
+    bounds = {0, size}
+    for start, stop in dropped:
+        bounds.update((start, stop))
+    for e in kept:
+        bounds.update((e.offset, e.offset + e.length))
+    points = sorted(b for b in bounds if 0 <= b <= size)
+
+    parts = []
+    stack = []
+    next_entity = 0
+    for index, position in enumerate(points):
+        # Close the entities ending here; ones closed early to keep the tags nested are reopened
+        if any(e.offset + e.length <= position for e in stack):
+            reopen = []
+            while any(e.offset + e.length <= position for e in stack):
+                entity = stack.pop()
+                parts.append(_close_tag(entity))
+                if entity.offset + entity.length > position:
+                    reopen.append(entity)
+            for entity in reversed(reopen):
+                parts.append(_open_tag(entity))
+                stack.append(entity)
+        while next_entity < len(kept) and kept[next_entity].offset <= position:
+            entity = kept[next_entity]
+            next_entity += 1
+            parts.append(_open_tag(entity))
+            stack.append(entity)
+
+        if index + 1 < len(points):
+            stop = points[index + 1]
+            if not any(start <= position and stop <= end for start, end in dropped):
+                segment = data[position * 2:stop * 2].decode('utf-16-le')
+                parts.append(html.escape(rewrite(segment) if rewrite else segment, quote=False))
+
+    result = "".join(parts)
+    if dropped:
+        result = _EXTRA_SPACES_RE.sub(" ", result)
+        result = _TRAILING_SPACES_RE.sub("\n", result)
+        result = _EXTRA_NEWLINES_RE.sub("\n\n", result).strip()
+    return result
+
+
+class CaptionPipeline:
+    """
+    The caption transformation of one task, compiled once: entity types to drop, regex
+    rewrites and the custom caption template split into literals and placeholders.
+    render() then only walks the message's entities and fills in the placeholders.
+    """
+
+    def __init__(self, custom_caption="", remove_original=True, rules=None):
+        rules = normalize_caption_rules(rules)
+        self.keep_original = not remove_original
+        drop = set()
+        if rules.get('strip_hashtags'):
+            drop.update(('hashtag', 'cashtag'))
+        if rules.get('strip_mentions'):
+            drop.update(('mention', 'text_mention'))
+        if rules.get('strip_links'):
+            drop.add('url')
+        self._drop = frozenset(drop)
+        self._unlink = bool(rules.get('strip_links'))
+        self._replace = [(re.compile(pattern), replacement) for pattern, replacement in rules.get('replace', ())]
+        # Even indexes are literal (HTML) text, odd indexes placeholder names
+        self._template = TEMPLATE_RE.split(custom_caption) if custom_caption else []
+
+    def _rewrite(self, text):
+        for pattern, replacement in self._replace:
+            text = pattern.sub(replacement, text)
+        return text
+
+    def _render_original(self, message):
+        if message.text:
+            text, entities = message.text, message.entities
+        elif message.caption:
+            text, entities = message.caption, message.caption_entities
+        else:
+            return ""
+        return render_entities(text, entities, self._drop, self._unlink, self._rewrite if self._replace else None)
+
+    def _render_template(self, message):
+        if len(self._template) < 2:
+            return self._template[0] if self._template else ""
+        # Messages fetched for id_range tasks are forwards: the placeholders describe the original post
+        origin = getattr(message, 'forward_origin', None)
+        chat = getattr(origin, 'chat', None) or message.chat
+        date = getattr(origin, 'date', None) or message.date
+        values = {
+            'source_title': html.escape(chat.title or ""),
+            'source_id': str(chat.id),
+            'message_id': str(getattr(origin, 'message_id', None) or message.message_id),
+            'date': date.strftime('%Y-%m-%d'),
+            'time': date.strftime('%H:%M'),
+        }
+        return "".join(part if index % 2 == 0 else values[part] for index, part in enumerate(self._template))
+
+    def render(self, message):
+        """The caption (or text) to send for message as Telegram HTML, or None if there is nothing to send."""
+        parts = []
+        if self.keep_original:
+            original = self._render_original(message)
+            if original:
+                parts.append(original)
+        custom = self._render_template(message)
+        if custom:
+            parts.append(custom)
+        return "\n".join(parts) or None
+
+
+# setting_id -> ((custom_caption, remove_tags_caption, caption_rules), CaptionPipeline)
+_pipelines = {}
+
+
+def get_caption_pipeline(setting):
+    """Returns the compiled pipeline of a task, rebuilding it only when its caption settings changed."""
+    source = (setting['custom_caption'] or "", bool(setting['remove_tags_caption']), setting.get('caption_rules') or {})
+    cached = _pipelines.get(setting['id'])
+    if cached is None or cached[0] != source:
+        cached = _pipelines[setting['id']] = (source, CaptionPipeline(*source))
+    return cached[1]
+
+def invalidate_caption_pipeline(setting_id):
+    """Call after the caption, remove_tags_caption or caption_rules of a task change, or it is deleted."""
+    _pipelines.pop(setting_id, None)
@@ -0,0 +1,65 @@
+from .config import CATCH_UP_MAX_DEFERRED
+from .health import register_queue_depth
+
+# State of 'catch_up' tasks that are still backfilling, per process.
+#
+# While a task backfills, live posts of its source are not sent by the channel post
+# handler; they are deferred here and the first deferred id becomes the upper bound of
+# the backfill. Once the backfill reaches it, the job hands over: it marks the task
+# done, sets last_processed_message_id (the watermark) and sends the deferred posts,
+# all inside the source's dispatcher lane, so live posts queue behind the handover.
+
+# setting_id -> {message_id: Message}, at most CATCH_UP_MAX_DEFERRED posts per task
+_deferred = {}
+# setting_id -> highest id of the live posts seen after the cap was reached (not held)
+_overflow = {}
+# setting_id -> consecutive backfill batches that copied nothing
+_idle_batches = {}
+
+
+def defer(setting_id, message):
+    """Holds a live post of a backfilling task for the handover."""
+    deferred = _deferred.setdefault(setting_id, {})
+    if len(deferred) < CATCH_UP_MAX_DEFERRED:
+        deferred[message.message_id] = message
+    else:
+        # Beyond the cap only the highest id is kept; the handover re-reads the ids it did not hold
+        _overflow[setting_id] = max(_overflow.get(setting_id, 0), message.message_id)
+
+def first_deferred_id(setting_id):
+    """The oldest live post seen while backfilling (the backfill stops below it), or None."""
+    deferred = _deferred.get(setting_id)
+    return min(deferred) if deferred else None
+
+def take_deferred(setting_id):
+    """
+    Returns the deferred posts as [(message_id, Message or None)] in id order and forgets them.
+    None marks an id above the first deferred post that was not held (cap reached); the
+    handover fetches those by id.
+    """
+    deferred = _deferred.pop(setting_id, {})
+    overflow = _overflow.pop(setting_id, None)
+    if deferred and overflow is not None:
+        for message_id in range(min(deferred), overflow + 1):
+            deferred.setdefault(message_id, None)
+    return sorted(deferred.items(), key=lambda item: item[0])
+
+def note_batch(setting_id, copied):
+    """Counts consecutive empty batches; returns the current count."""
+    if copied:
+        _idle_batches.pop(setting_id, None)
+        return 0
+    _idle_batches[setting_id] = _idle_batches.get(setting_id, 0) + 1
+    return _idle_batches[setting_id]
+
+def reset(setting_id):
+    """Forgets all state of a task (handed over, paused or deleted)."""
+    _deferred.pop(setting_id, None)
+    _overflow.pop(setting_id, None)
+    _idle_batches.pop(setting_id, None)
+
+def deferred_count():
+    return sum(len(deferred) for deferred in _deferred.values())
+
+
+register_queue_depth('catch_up_deferred', deferred_count)
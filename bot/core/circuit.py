@@ -0,0 +1,110 @@
+import logging
+import time
+
+from telegram.error import BadRequest, Forbidden
+
+from .config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS
+from .metrics import CIRCUIT_SHORT_CIRCUITS
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# Errors that will not go away by retrying: the bot was removed from the target,
+# lost its rights, or the chat does not exist any more.
+PERMANENT_ERROR_MARKERS = (
+    "chat not found",
+    "bot was kicked",
+    "bot is not a member",
+    "not enough rights",
+    "need administrator rights",
+    "chat_write_forbidden",
+    "have no rights to send",
+)
+
+# chat_id -> {'state', 'failures', 'opened_at', 'probing'}
+# Only targets that have failed at least once get an entry.
+_circuits = {}
+
+
+def is_permanent_error(error) -> bool:
+    if isinstance(error, Forbidden):
+        return True
+    if isinstance(error, BadRequest):
+        message = str(error).lower()
+        return any(marker in message for marker in PERMANENT_ERROR_MARKERS)
+    return False
+
+def get_state(chat_id):
+    circuit = _circuits.get(chat_id)
+    return circuit['state'] if circuit else CLOSED
+
+def allow_send(chat_id) -> bool:
+    """
+    Returns False while the target's circuit is open (the send is short-circuited without an API call).
+    After CIRCUIT_RESET_SECONDS the circuit half-opens and lets exactly one probe through.
+    """
+    circuit = _circuits.get(chat_id)
+    if circuit is None or circuit['state'] == CLOSED:
+        return True
+
+    if circuit['state'] == OPEN and time.monotonic() - circuit['opened_at'] >= CIRCUIT_RESET_SECONDS:
+        circuit['state'] = HALF_OPEN
+        circuit['probing'] = False
+        logger.info("Circuit for target %s is half-open, probing", chat_id, extra={'target': chat_id})
+
+    if circuit['state'] == HALF_OPEN and not circuit['probing']:
+        circuit['probing'] = True
+        return True
+
+    CIRCUIT_SHORT_CIRCUITS.inc()
+    return False
+
+def record_success(chat_id):
+    """Closes the circuit after a successful send. Returns CLOSED if this changed the state, else None."""
+    circuit = _circuits.pop(chat_id, None)
+    if circuit and circuit['state'] != CLOSED:
+        logger.info("Circuit for target %s closed, target recovered", chat_id, extra={'target': chat_id})
+        return CLOSED
+    return None
+
+def record_failure(chat_id, error):
+    """
+    Counts a failed send. Permanent errors open the circuit after CIRCUIT_FAILURE_THRESHOLD
+    consecutive failures, or immediately when a half-open probe fails.
+    Returns OPEN if the circuit just opened from closed, else None.
+    """
+    if not is_permanent_error(error):
+        release_probe(chat_id)
+        return None
+
+    circuit = _circuits.get(chat_id)
+
+    if circuit is None:
+        circuit = _circuits[chat_id] = {'state': CLOSED, 'failures': 0, 'opened_at': 0.0, 'probing': False}
+    circuit['failures'] += 1
+
+    if circuit['state'] == HALF_OPEN:
+        circuit['state'] = OPEN
+        circuit['opened_at'] = time.monotonic()
+        circuit['probing'] = False
+        logger.warning("Circuit for target %s re-opened, probe failed: %s", chat_id, error, extra={'target': chat_id})
+        return None
+
+    if circuit['state'] == CLOSED and circuit['failures'] >= CIRCUIT_FAILURE_THRESHOLD:
+        circuit['state'] = OPEN
+        circuit['opened_at'] = time.monotonic()
+        logger.warning("Circuit for target %s opened after %d permanent failures: %s",
+                       chat_id, circuit['failures'], error, extra={'target': chat_id})
+        return OPEN
+    return None
+
+def release_probe(chat_id):
+    """The half-open probe ended without a verdict (flood wait, network error...); allow another one."""
+    circuit = _circuits.get(chat_id)
+    if circuit and circuit['state'] == HALF_OPEN:
+        circuit['probing'] = False
+
+def open_circuits():
+    """Targets whose circuit is currently not closed, as {chat_id: state}."""
+    return {chat_id: c['state'] for chat_id, c in _circuits.items() if c['state'] != CLOSED}
@@ -0,0 +1,38 @@
+from datetime import datetime, time, timedelta, timezone
+
+from .config import FORWARD_LOG_RETENTION_DAYS
+from .database import get_app_counters, reconcile_app_counters
+
+# Aggregate counters for the admin views. They live in the app_counters table and are
+# maintained by DB triggers on users, channels_settings and forward_log, so every write path
+# (including other worker processes and manual SQL) keeps them current and reading them is one
+# small indexed query. reconcile() recounts from the tables to repair any drift.
+
+
+def _forwarded_name(day):
+    return f"forwarded:{day:%Y-%m-%d}"
+
+def get_counters():
+    """
+    Returns {'users', 'banned_users', 'active_tasks': {task_type: count}, 'forwarded_today'}.
+    Forwards are counted when the forward log is flushed (every FORWARD_LOG_FLUSH_INTERVAL seconds), per UTC day.
+    """
+    today = datetime.now(timezone.utc).date()
+    rows = get_app_counters(_forwarded_name(today))
+    active_tasks = {
+        name.split(':', 1)[1]: value for name, value in rows.items()
+        if name.startswith('active_tasks:') and value
+    }
+    return {
+        'users': rows.get('users', 0),
+        'banned_users': rows.get('banned_users', 0),
+        'active_tasks': active_tasks,
+        'forwarded_today': rows.get(_forwarded_name(today), 0),
+    }
+
+def reconcile():
+    """Recounts all counters (today's forwards from today's forward_log partition) and drops expired day counters."""
+    today = datetime.now(timezone.utc).date()
+    day_start = datetime.combine(today, time.min, tzinfo=timezone.utc)
+    oldest = today - timedelta(days=FORWARD_LOG_RETENTION_DAYS)
+    reconcile_app_counters(_forwarded_name(today), day_start, _forwarded_name(oldest))
@@ -0,0 +1,74 @@
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+
+from .config import DEDUP_TTL_SECONDS, DEDUP_LRU_SIZE, DEDUP_PURGE_INTERVAL
+from .database import claim_dedup_key, release_dedup_key, purge_dedup_index
+
+logger = logging.getLogger(__name__)
+
+# (target_channel_id, content_key) -> time.monotonic() when it was sent or found to be a duplicate.
+# Bounded LRU in front of the dedup_index table: a hit here drops a duplicate without a DB round trip.
+_seen = OrderedDict()
+# time.monotonic() of the last purge of dedup_index. claim() purges once DEDUP_PURGE_INTERVAL
+# has passed, since the webhook app never runs the purge job.
+_purged_at = time.monotonic()
+
+
+def content_key(message):
+    """Identifies the content of a message: the file_unique_id of its media, or a hash of its text."""
+    if message.photo:
+        return message.photo[-1].file_unique_id
+    if message.video:
+        return message.video.file_unique_id
+    if message.document:
+        return message.document.file_unique_id
+    if message.text:
+        return "t:" + hashlib.sha1(message.text.encode()).hexdigest()
+    return None
+
+def _remember(cache_key, now):
+    _seen[cache_key] = now
+    _seen.move_to_end(cache_key)
+    if len(_seen) > DEDUP_LRU_SIZE:
+        _seen.popitem(last=False)
+
+def claim(target_id, key):
+    """
+    Returns False if the content was already sent to the target within DEDUP_TTL_SECONDS.
+    Otherwise records it as sent and returns True. Fails open if the DB is unavailable.
+    """
+    now = time.monotonic()
+    cache_key = (target_id, key)
+    seen_at = _seen.get(cache_key)
+    if seen_at is not None and now - seen_at < DEDUP_TTL_SECONDS:
+        _seen.move_to_end(cache_key)
+        return False
+
+    try:
+        claimed = claim_dedup_key(target_id, key, DEDUP_TTL_SECONDS)
+    except Exception as e:
+        logger.error("Dedup lookup failed for target %s, sending anyway: %s", target_id, e, extra={'target': target_id})
+        return True
+    _remember(cache_key, now)
+    if now - _purged_at >= DEDUP_PURGE_INTERVAL:
+        try:
+            purge_expired()
+        except Exception as e:
+            logger.error("Failed to purge the dedup index: %s", e)
+    return claimed
+
+def release(target_id, key):
+    """Forgets a claim whose send failed, so the content can be sent again."""
+    _seen.pop((target_id, key), None)
+    try:
+        release_dedup_key(target_id, key)
+    except Exception as e:
+        logger.error("Could not release dedup key for target %s: %s", target_id, e, extra={'target': target_id})
+
+def purge_expired():
+    """Deletes expired keys from the dedup_index table (the LRU expires entries on lookup)."""
+    global _purged_at
+    _purged_at = time.monotonic()
+    purge_dedup_index(DEDUP_TTL_SECONDS)
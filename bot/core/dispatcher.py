@@ -0,0 +1,61 @@
+import asyncio
+import weakref
+
+from .config import DISPATCH_MAX_CONCURRENCY
+from .health import register_queue_depth
+
+# One lane per key (e.g. source channel id). A lane is only the future of the last
+# call queued on it, so calls with the same key run one after another in arrival
+# order while different keys run in parallel, limited by a shared semaphore.
+# A lane is dropped as soon as its last call finishes, so idle keys cost nothing.
+# State is kept per event loop, since futures and semaphores belong to the loop
+# they were created on (app.py runs each webhook request on a new loop).
+_lanes = weakref.WeakKeyDictionary()       # loop -> {key: future of the lane's last call}
+_semaphores = weakref.WeakKeyDictionary()  # loop -> asyncio.Semaphore
+_in_flight = 0
+
+
+def pending_count():
+    """Calls dispatched and not yet finished, waiting or running."""
+    return _in_flight
+
+def lane_count():
+    return sum(len(lanes) for lanes in list(_lanes.values()))
+
+async def dispatch(key, func, *args):
+    """
+    Awaits func(*args) once every earlier call dispatched with the same key has finished.
+    Must be called before the caller's first await so lanes keep arrival order.
+    """
+    global _in_flight
+    loop = asyncio.get_running_loop()
+    lanes = _lanes.get(loop)
+    if lanes is None:
+        lanes = _lanes[loop] = {}
+        _semaphores[loop] = asyncio.Semaphore(DISPATCH_MAX_CONCURRENCY)
+
+    previous = lanes.get(key)
+    done = loop.create_future()
+    lanes[key] = done
+    _in_flight += 1
+    try:
+        if previous is not None:
+            await asyncio.shield(previous)
+        async with _semaphores[loop]:
+            return await func(*args)
+    finally:
+        _in_flight -= 1
+        if previous is not None and not previous.done():
+            # Cancelled while waiting: the next call must still wait for the earlier one
+            previous.add_done_callback(lambda _: _finish_lane(lanes, key, done))
+        else:
+            _finish_lane(lanes, key, done)
+
+def _finish_lane(lanes, key, done):
+    if not done.done():
+        done.set_result(None)
+    if lanes.get(key) is done:
+        del lanes[key]
+
+
+register_queue_depth('dispatch', pending_count)
@@ -0,0 +1,172 @@
+from .metrics import message_type
+
+# Per-task filter rules (channels_settings.filter_rules), all optional:
+#   include     keywords, at least one must appear in the text/caption (case-insensitive)
+#   exclude     keywords, none may appear
+#   media       allowed content types: text, photo, video, document
+#   min_length  minimum length of the text/caption
+# (Link stripping is a caption rule, see captions.py.)
+RULE_KEYS = ('include', 'exclude', 'media', 'min_length')
+MEDIA_TYPES = ('text', 'photo', 'video', 'document')
+
+
+def normalize_rules(rules):
+    """Drops empty / unknown entries so an unfiltered task has rules == {}."""
+    if not rules:
+        return {}
+    result = {}
+    for key in ('include', 'exclude'):
+        words = [w.strip().lower() for w in rules.get(key) or [] if w and w.strip()]
+        if words:
+            result[key] = sorted(set(words))
+    media = [m for m in rules.get('media') or [] if m in MEDIA_TYPES]
+    if media:
+        result['media'] = sorted(set(media))
+    if rules.get('min_length'):
+        result['min_length'] = int(rules['min_length'])
+    return result
+
+def parse_rules_text(text):
+    """
+    Parses the rules a user typed, one 'key: value' per line, e.g.
+        include: sale, promo
+        media: photo, video
+        min_length: 20
+    Raises ValueError with the offending line.
+    """
+    rules = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        key, sep, value = line.partition(':')
+        key = key.strip().lower()
+        if not sep or key not in RULE_KEYS:
+            raise ValueError(line)
+        value = value.strip()
+        if key in ('include', 'exclude', 'media'):
+            rules[key] = [item.strip() for item in value.split(',') if item.strip()]
+            if key == 'media':
+                rules[key] = [m.lower() for m in rules[key]]
+                if any(m not in MEDIA_TYPES for m in rules[key]):
+                    raise ValueError(line)
+        else:
+            if not value.isdigit():
+                raise ValueError(line)
+            rules[key] = int(value)
+    return normalize_rules(rules)
+
+def format_rules(rules):
+    """The rules in the same 'key: value' form parse_rules_text() accepts."""
+    lines = []
+    for key in RULE_KEYS:
+        if key not in rules:
+            continue
+        value = rules[key]
+        if isinstance(value, list):
+            value = ", ".join(value)
+        lines.append(f"{key}: {value}")
+    return "\n".join(lines)
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton: finds every keyword occurring in a text in one pass over it."""
+
+    def __init__(self, keywords):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+        for index, keyword in enumerate(keywords):
+            state = 0
+            for char in keyword:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                state = next_state
+            self.output[state] += (index,)
+
+        # Breadth-first: failure links point to the longest proper suffix that is also a prefix
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] += self.output[self.fail[next_state]]
+
+    def search(self, text):
+        """Returns the set of indexes of the keywords found in text."""
+        found = set()
+        state = 0
+        goto, fail, output = self.goto, self.fail, self.output
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class SourceMatcher:
+    """
+    All filter rules of the tasks of one source channel compiled together.
+    match() scans the post's text once for every keyword of every task, then
+    applies the cheap per-task checks.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        keywords = {}
+        self._rules = []
+        for setting in settings:
+            rules = normalize_rules(setting.get('filter_rules'))
+            self._rules.append((
+                frozenset(keywords.setdefault(w, len(keywords)) for w in rules.get('include', ())),
+                frozenset(keywords.setdefault(w, len(keywords)) for w in rules.get('exclude', ())),
+                frozenset(rules.get('media', ())),
+                rules.get('min_length', 0),
+            ))
+        self._automaton = KeywordAutomaton(list(keywords)) if keywords else None
+
+    def match(self, message):
+        """Returns the settings whose rules accept the message, in task order."""
+        text = message.text or message.caption or ""
+        found = self._automaton.search(text.lower()) if self._automaton else ()
+        kind = message_type(message)
+
+        matched = []
+        for setting, (include, exclude, media, min_length) in zip(self.settings, self._rules):
+            if media and kind not in media:
+                continue
+            if min_length and len(text) < min_length:
+                continue
+            if include and include.isdisjoint(found):
+                continue
+            if exclude and not exclude.isdisjoint(found):
+                continue
+            matched.append(setting)
+        return matched
+
+
+# setting_id -> (filter_rules, SourceMatcher over that task alone), for the id_range / catch-up
+# sends that check one task's rules per message
+_task_matchers = {}
+
+
+def get_task_matcher(setting):
+    """Returns the compiled matcher of one task, rebuilding it only when its filter_rules changed."""
+    rules = setting.get('filter_rules') or {}
+    cached = _task_matchers.get(setting['id'])
+    if cached is None or cached[0] != rules:
+        cached = _task_matchers[setting['id']] = (rules, SourceMatcher([setting]))
+    return cached[1]
+
+def invalidate_task_matcher(setting_id):
+    """Call after the filter_rules of a task change, or it is deleted."""
+    _task_matchers.pop(setting_id, None)
@@ -0,0 +1,107 @@
+import logging
+import re
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from .config import (
+    FORWARD_LOG_MAX_BUFFER,
+    FORWARD_LOG_RETENTION_DAYS,
+    FORWARD_LOG_FLUSH_INTERVAL,
+    FORWARD_LOG_FLUSH_SIZE,
+    FORWARD_LOG_MAINTENANCE_INTERVAL
+)
+from .database import (
+    copy_forward_log,
+    create_forward_log_partition,
+    get_forward_log_partitions,
+    drop_forward_log_partition
+)
+from .health import register_queue_depth
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME_RE = re.compile(r"^forward_log_(\d{8})$")
+
+# Entries waiting for the next flush, as tuples in database.FORWARD_LOG_COLUMNS order.
+# Logging a send only appends here; flush_forward_log() writes the batch with one COPY.
+# log_forward() itself flushes (and maintains the partitions) when one is due, since the
+# webhook app never runs the JobQueue jobs that do it otherwise.
+_buffer = deque(maxlen=FORWARD_LOG_MAX_BUFFER)
+# Days (UTC) whose partition is known to exist
+_partitions = set()
+# time.monotonic() of the last flush / partition maintenance (None: not yet in this process)
+_flushed_at = time.monotonic()
+_maintained_at = None
+
+
+def log_forward(setting_id, source_ref, target_chat_id, outcome, target_message_id=None, error=None):
+    """Buffers one audit entry. source_ref is (source_chat_id, source_message_id) or None."""
+    source_chat_id, source_message_id = source_ref or (None, None)
+    _buffer.append((
+        datetime.now(timezone.utc), setting_id, source_chat_id, source_message_id,
+        target_chat_id, target_message_id, outcome, str(error) if error else None,
+    ))
+    now = time.monotonic()
+    if len(_buffer) >= FORWARD_LOG_FLUSH_SIZE or now - _flushed_at >= FORWARD_LOG_FLUSH_INTERVAL:
+        if _maintained_at is None or now - _maintained_at >= FORWARD_LOG_MAINTENANCE_INTERVAL:
+            try:
+                maintain_partitions()
+            except Exception as e:
+                logger.error(f"Forward log partition maintenance failed: {e}")
+        flush_forward_log()
+
+def pending_count():
+    return len(_buffer)
+
+def _ensure_partition(day):
+    if day not in _partitions:
+        create_forward_log_partition(day)
+        _partitions.add(day)
+
+def flush_forward_log():
+    """
+    Writes the buffered entries with one COPY and returns how many were written.
+    If the write fails the entries go back to the buffer (the oldest are dropped once it is full).
+    """
+    global _flushed_at
+    _flushed_at = time.monotonic()
+    if not _buffer:
+        return 0
+    rows = list(_buffer)
+    _buffer.clear()
+    try:
+        for day in {row[0].date() for row in rows}:
+            _ensure_partition(day)
+        copy_forward_log(rows)
+    except Exception as e:
+        logger.error(f"Failed to flush {len(rows)} forward log entries, will retry: {e}")
+        pending = list(_buffer)
+        _buffer.clear()
+        _buffer.extend(rows + pending)
+        return 0
+    return len(rows)
+
+def maintain_partitions():
+    """Creates the partitions for today and tomorrow and drops those older than FORWARD_LOG_RETENTION_DAYS."""
+    global _maintained_at
+    _maintained_at = time.monotonic()
+    today = datetime.now(timezone.utc).date()
+    _ensure_partition(today)
+    _ensure_partition(today + timedelta(days=1))
+
+    cutoff = today - timedelta(days=FORWARD_LOG_RETENTION_DAYS)
+    dropped = 0
+    for name in get_forward_log_partitions():
+        match = PARTITION_NAME_RE.match(name)
+        if not match:
+            continue
+        day = datetime.strptime(match.group(1), "%Y%m%d").date()
+        if day < cutoff:
+            drop_forward_log_partition(name)
+            _partitions.discard(day)
+            dropped += 1
+    return dropped
+
+
+register_queue_depth('forward_log', pending_count)
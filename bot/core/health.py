@@ -0,0 +1,119 @@
+import time
+
+from .config import (
+    LOOP_LAG_INTERVAL,
+    HEALTH_LOOP_LAG_DEGRADED,
+    HEALTH_LOOP_LAG_UNHEALTHY,
+    HEALTH_QUEUE_DEPTH_DEGRADED,
+    HEALTH_UPDATE_STALE_SECONDS,
+    HEALTH_DB_LATENCY_DEGRADED,
+    HEALTH_DB_TIMEOUT,
+)
+from .database import ping_db
+from .metrics import LOOP_LAG
+
+HEALTHY, DEGRADED, UNHEALTHY = "healthy", "degraded", "unhealthy"
+
+_started_at = time.monotonic()
+_last_update_at = None
+_expected_tick = None
+_last_tick_at = None
+_loop_lag = 0.0
+# name -> zero-argument callable returning the current depth of an outbound queue
+_queue_depth_providers = {}
+
+
+# --- recording (called from the hot paths, must stay cheap) ---
+
+def mark_update_processed():
+    global _last_update_at
+    _last_update_at = time.monotonic()
+
+def register_queue_depth(name, provider):
+    """Lets an outbound queue report its depth in the health check."""
+    _queue_depth_providers[name] = provider
+
+async def check_loop_lag(context):
+    """
+    Repeating job (every LOOP_LAG_INTERVAL seconds). The difference between when
+    the tick was due and when it actually ran is the event loop scheduling lag,
+    e.g. time spent in a blocking db_query.
+    """
+    global _expected_tick, _last_tick_at, _loop_lag
+    now = time.monotonic()
+    if _expected_tick is not None:
+        _loop_lag = max(0.0, now - _expected_tick)
+        LOOP_LAG.set(_loop_lag)
+    _last_tick_at = now
+    _expected_tick = now + LOOP_LAG_INTERVAL
+
+
+# --- evaluation ---
+
+def health_report(application=None):
+    """Returns (status, report dict) with the current checks and any crossed thresholds."""
+    now = time.monotonic()
+    problems = []
+    status = HEALTHY
+
+    def flag(level, message):
+        nonlocal status
+        problems.append(message)
+        if level == UNHEALTHY or status == HEALTHY:
+            status = level
+
+    # Event loop lag. If the monitor has ticked before but stopped, the loop is stuck.
+    # It only ticks where the JobQueue runs (polling / a long-lived loop): under the webhook
+    # app each update gets its own short-lived loop, so the lag is not measured (None).
+    loop_lag = None
+    if _last_tick_at is not None:
+        loop_lag = max(_loop_lag, now - _last_tick_at - LOOP_LAG_INTERVAL)
+        if loop_lag >= HEALTH_LOOP_LAG_UNHEALTHY:
+            flag(UNHEALTHY, f"event loop lag {loop_lag:.2f}s")
+        elif loop_lag >= HEALTH_LOOP_LAG_DEGRADED:
+            flag(DEGRADED, f"event loop lag {loop_lag:.2f}s")
+
+    # Database: one real round trip on a new connection, like every db_query makes
+    db_latency = None
+    probe_started = time.perf_counter()
+    try:
+        ping_db(HEALTH_DB_TIMEOUT)
+    except Exception as e:
+        flag(UNHEALTHY, f"database unreachable: {e}")
+    else:
+        db_latency = time.perf_counter() - probe_started
+        if db_latency >= HEALTH_DB_TIMEOUT:
+            flag(UNHEALTHY, f"database latency {db_latency:.2f}s")
+        elif db_latency >= HEALTH_DB_LATENCY_DEGRADED:
+            flag(DEGRADED, f"database latency {db_latency:.2f}s")
+
+    queues = {}
+    if application is not None:
+        queues['updates'] = application.update_queue.qsize()
+    for name, provider in _queue_depth_providers.items():
+        queues[name] = provider()
+    for name, depth in queues.items():
+        if depth >= HEALTH_QUEUE_DEPTH_DEGRADED:
+            flag(DEGRADED, f"queue '{name}' depth {depth}")
+
+    since_update = now - (_last_update_at or _started_at)
+    if since_update >= HEALTH_UPDATE_STALE_SECONDS:
+        flag(DEGRADED, f"no update processed for {since_update:.0f}s")
+
+    job_count = None
+    if application is not None and application.job_queue:
+        job_count = len(application.job_queue.jobs())
+
+    report = {
+        'status': status,
+        'problems': problems,
+        'checks': {
+            'event_loop_lag_s': round(loop_lag, 3) if loop_lag is not None else None,
+            'db_latency_s': round(db_latency, 3) if db_latency is not None else None,
+            'job_queue_jobs': job_count,
+            'queue_depths': queues,
+            'seconds_since_last_update': round(since_update, 1),
+            'last_update_seen': _last_update_at is not None,
+        },
+    }
+    return status, report
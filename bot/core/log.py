@@ -0,0 +1,109 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from .config import LOG_LEVEL, LOG_JSON, LOG_SAMPLE_RATES
+
+# Structured fields that hot-path log calls pass through `extra=`.
+STRUCTURED_FIELDS = ('task_id', 'source', 'target', 'message_id', 'latency_ms', 'user_id', 'outcome')
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the structured `extra` fields as top-level keys."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a fraction of INFO-and-below records for the loggers listed in
+    LOG_SAMPLE_RATES (matched by logger name prefix). Warnings and errors always pass.
+    Sampling is a counter per logger (every Nth record), so it costs no random calls.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self._every_n = {}
+        self._counters = {}
+
+    def _every_n_for(self, name):
+        every_n = self._every_n.get(name)
+        if every_n is None:
+            rate = 1.0
+            for prefix, prefix_rate in self.rates.items():
+                if name == prefix or name.startswith(prefix + '.'):
+                    rate = prefix_rate
+            every_n = self._every_n[name] = max(1, round(1 / rate)) if rate > 0 else 0
+        return every_n
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        every_n = self._every_n_for(record.name)
+        if every_n == 1:
+            return True
+        if every_n == 0:
+            return False
+        count = self._counters.get(record.name, 0) + 1
+        self._counters[record.name] = count
+        return count % every_n == 1
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler that enqueues the record untouched. The stock prepare() formats
+    the message on the calling thread; here formatting happens on the listener thread.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging():
+    """
+    Routes all logging through a queue so the event loop thread only enqueues
+    records; a background QueueListener thread formats and writes them.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if LOG_JSON:
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATES))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    # httpx logs every Bot API request at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
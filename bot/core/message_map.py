@@ -0,0 +1,65 @@
+import logging
+import time
+from collections import OrderedDict
+
+from .config import MESSAGE_MAP_LRU_SIZE, MESSAGE_MAP_RETENTION_DAYS, MESSAGE_MAP_PURGE_INTERVAL
+from .database import insert_message_map, get_message_map, purge_message_map
+
+logger = logging.getLogger(__name__)
+
+# (source_chat_id, source_message_id) -> [(setting_id, target_chat_id, target_message_id), ...]
+# Bounded LRU in front of the message_map table: edits to recent posts resolve without a DB round trip.
+_recent = OrderedDict()
+# time.monotonic() of the last purge of message_map. record() purges once MESSAGE_MAP_PURGE_INTERVAL
+# has passed, since the webhook app never runs the purge job.
+_purged_at = time.monotonic()
+
+
+def _remember(key, targets):
+    _recent[key] = targets
+    _recent.move_to_end(key)
+    if len(_recent) > MESSAGE_MAP_LRU_SIZE:
+        _recent.popitem(last=False)
+
+def record(source_chat_id, source_message_id, target_chat_id, target_message_id, setting_id):
+    """Remembers which target message a forward produced. Never raises: a lost mapping only means a lost edit."""
+    key = (source_chat_id, source_message_id)
+    targets = _recent.get(key)
+    # On a miss other tasks may already have mappings in the table (restart, eviction):
+    # caching only this one would hide them, so the next lookup() loads the full list
+    if targets is not None:
+        targets.append((setting_id, target_chat_id, target_message_id))
+        _recent.move_to_end(key)
+    try:
+        insert_message_map(source_chat_id, source_message_id, target_chat_id, target_message_id, setting_id)
+    except Exception as e:
+        logger.error("Could not record message map for %s/%s: %s", source_chat_id, source_message_id, e,
+                     extra={'task_id': setting_id, 'source': source_chat_id, 'message_id': source_message_id})
+    if time.monotonic() - _purged_at >= MESSAGE_MAP_PURGE_INTERVAL:
+        try:
+            purge_expired()
+        except Exception as e:
+            logger.error("Failed to purge the message map: %s", e)
+
+def lookup(source_chat_id, source_message_id):
+    """Returns [(setting_id, target_chat_id, target_message_id), ...] for a source message, [] if unknown."""
+    key = (source_chat_id, source_message_id)
+    targets = _recent.get(key)
+    if targets is not None:
+        _recent.move_to_end(key)
+        return targets
+    try:
+        rows = get_message_map(source_chat_id, source_message_id, MESSAGE_MAP_RETENTION_DAYS)
+    except Exception as e:
+        logger.error("Message map lookup failed for %s/%s: %s", source_chat_id, source_message_id, e,
+                     extra={'source': source_chat_id, 'message_id': source_message_id})
+        return []
+    targets = [(row['setting_id'], row['target_chat_id'], row['target_message_id']) for row in rows]
+    _remember(key, targets)
+    return targets
+
+def purge_expired():
+    """Deletes mappings older than MESSAGE_MAP_RETENTION_DAYS (the LRU is bounded by size)."""
+    global _purged_at
+    _purged_at = time.monotonic()
+    purge_message_map(MESSAGE_MAP_RETENTION_DAYS)
@@ -0,0 +1,104 @@
+import re
+from functools import lru_cache
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+# All metrics live in the default prometheus_client registry and are served by /metrics in app.py.
+# Observing a histogram or incrementing a counter is a lock + a few additions, cheap enough to keep on.
+
+WEBHOOK_LATENCY = Histogram(
+    "bot_webhook_handling_seconds",
+    "Time spent handling one webhook update",
+    ["update_type"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+SEND_LATENCY = Histogram(
+    "bot_send_message_content_seconds",
+    "Latency of _send_message_content per message type",
+    ["message_type"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+DB_QUERY_LATENCY = Histogram(
+    "bot_db_query_seconds",
+    "Latency of db_query per statement",
+    ["statement"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+FLOOD_WAITS = Counter(
+    "bot_flood_waits_total",
+    "Telegram 429 Flood Wait responses",
+)
+BOT_API_ERRORS = Counter(
+    "bot_api_errors_total",
+    "Bot API errors while sending, by error class",
+    ["error"],
+)
+FORWARDS = Counter(
+    "bot_forwards_total",
+    "Forward attempts per task type and outcome",
+    ["task_type", "outcome"],
+)
+SEND_QUEUE_DELAY = Histogram(
+    "bot_send_queue_delay_seconds",
+    "Time a send waited in the outbound rate limiter, per priority lane",
+    ["lane"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+CIRCUIT_SHORT_CIRCUITS = Counter(
+    "bot_circuit_short_circuits_total",
+    "Sends skipped without an API call because the target's circuit is open",
+)
+JOB_QUEUE_JOBS = Gauge(
+    "bot_job_queue_jobs",
+    "Jobs currently scheduled in the JobQueue",
+)
+LOOP_LAG = Gauge(
+    "bot_event_loop_lag_seconds",
+    "How late the loop lag monitor job last ran",
+)
+UPDATE_QUEUE_SIZE = Gauge(
+    "bot_update_queue_size",
+    "Updates waiting in the Application update queue",
+)
+
+_STATEMENT_RE = re.compile(
+    r"^\s*(SELECT|INSERT\s+INTO|UPDATE|DELETE\s+FROM|CREATE\s+TABLE\s+IF\s+NOT\s+EXISTS|CREATE\s+INDEX\s+IF\s+NOT\s+EXISTS|ALTER\s+TABLE)\b",
+    re.IGNORECASE,
+)
+_FROM_RE = re.compile(r"\bFROM\s+(\w+)", re.IGNORECASE)
+_TABLE_RE = re.compile(r"^\s*\w+(?:\s+(?:INTO|FROM|TABLE|INDEX|IF|NOT|EXISTS))*\s+(\w+)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=256)
+def statement_label(query: str) -> str:
+    """
+    Turns a SQL string into a low-cardinality label such as 'select_channels_settings'.
+    Queries are module-level constants, so the cache makes this a dict lookup after the first call.
+    """
+    verb_match = _STATEMENT_RE.match(query)
+    if not verb_match:
+        return "other"
+    verb = verb_match.group(1).split()[0].lower()
+    table_match = _FROM_RE.search(query) if verb == "select" else _TABLE_RE.match(query)
+    table = table_match.group(1).lower() if table_match else "unknown"
+    return f"{verb}_{table}"
+
+def message_type(message) -> str:
+    """Label for the kind of content a message carries."""
+    if message.photo:
+        return "photo"
+    if message.video:
+        return "video"
+    if message.document:
+        return "document"
+    if message.text:
+        return "text"
+    return "unsupported"
+
+def render_metrics(application=None):
+    """Returns (body, content_type) for the /metrics endpoint, refreshing gauges that are read on scrape."""
+    if application is not None:
+        if application.job_queue:
+            JOB_QUEUE_JOBS.set(len(application.job_queue.jobs()))
+        UPDATE_QUEUE_SIZE.set(application.update_queue.qsize())
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,80 @@
+from dataclasses import dataclass, fields, replace
+from datetime import datetime
+
+# Rows of the tables read on the hot paths, built by psycopg's class_row() straight from the
+# result tuples. Slotted and frozen: a cached task holds one small object instead of a
+# RealDictRow with its own hash table, and no code path can change a cached row in place
+# (use with_current_id() / dataclasses.replace() for a per-message variant).
+#
+# Item access (row['id'], row.get('filter_rules'), dict(row)) keeps working, so code that
+# treats settings and users as mappings does not change.
+
+
+class _RowMapping:
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return self.__field_names__
+
+    def __contains__(self, key):
+        return key in self.__field_names__
+
+
+@dataclass(frozen=True, slots=True)
+class Setting(_RowMapping):
+    """One channels_settings row (a forwarding task)."""
+    id: int
+    user_id: int
+    source_channel_id: int
+    target_channel_id: int
+    custom_caption: str | None = None
+    remove_tags_caption: bool = True
+    is_active: bool = True
+    task_type: str = 'new_messages'
+    start_message_id: int = 0
+    end_message_id: int = 0
+    current_message_id: int = 0
+    forward_every_n_posts: int = 1
+    interval_seconds: int = 10800
+    last_processed_message_id: int = 0
+    dedup_enabled: bool = False
+    filter_rules: dict | None = None
+    caption_rules: dict | None = None
+    catch_up_done: bool = False
+
+    def with_current_id(self, message_id):
+        """A copy pointing at message_id, for sending one message of an id_range / catch_up task."""
+        return replace(self, current_message_id=message_id)
+
+
+@dataclass(frozen=True, slots=True)
+class User(_RowMapping):
+    """One users row."""
+    user_id: int
+    username: str | None = None
+    first_name: str | None = None
+    last_name: str | None = None
+    is_admin: bool = False
+    is_banned: bool = False
+    banned_until: datetime | None = None
+    joined_at: datetime | None = None
+    send_weight: int = 1
+    send_cap_per_minute: int | None = None
+
+
+for _model in (Setting, User):
+    _model.__field_names__ = tuple(field.name for field in fields(_model))
+
+# Explicit select lists: class_row() needs the columns to match the fields exactly,
+# so a column added to the table later does not break these reads.
+SETTING_COLUMNS = ", ".join(Setting.__field_names__)
+USER_COLUMNS = ", ".join(User.__field_names__)
@@ -0,0 +1,102 @@
+import html
+import logging
+import time
+
+from telegram.constants import ParseMode
+
+from .config import NOTIFY_SAMPLE_IDS, NOTIFY_DIGEST_INTERVAL
+from .health import register_queue_depth
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects messages longer than 4096 characters
+MAX_MESSAGE_LENGTH = 4096
+
+# (recipient, task_id, error_class) -> {'count', 'sample_ids', 'last_error', 'first_seen'}
+# Failures are grouped here and sent as one digest per recipient, at most once per
+# NOTIFY_DIGEST_INTERVAL: by notify_failure() itself once the recipient's window has passed
+# (the webhook app never runs the JobQueue), and by flush_notifications() where it does run.
+_pending = {}
+# recipient -> time.monotonic() of the last digest sent to them
+_last_sent = {}
+
+
+async def notify_failure(bot, recipient, task_id, error, message_id=None):
+    """
+    Queues a failed-forward notice for recipient. Repeats of the same task and error class are
+    counted, not resent. If no digest went to recipient in the last NOTIFY_DIGEST_INTERVAL
+    seconds, their queued notices are sent right away.
+    """
+    key = (recipient, task_id, type(error).__name__)
+    group = _pending.get(key)
+    if group is None:
+        group = _pending[key] = {'count': 0, 'sample_ids': [], 'last_error': '', 'first_seen': time.monotonic()}
+    group['count'] += 1
+    group['last_error'] = str(error)
+    if message_id is not None and len(group['sample_ids']) < NOTIFY_SAMPLE_IDS:
+        group['sample_ids'].append(message_id)
+
+    last_sent = _last_sent.get(recipient)
+    if last_sent is None or time.monotonic() - last_sent >= NOTIFY_DIGEST_INTERVAL:
+        await _send_digest(bot, recipient, _take_groups(recipient))
+
+def pending_count():
+    return len(_pending)
+
+def _format_digest(groups):
+    oldest = min(group['first_seen'] for _, group in groups)
+    minutes = max(1, round((time.monotonic() - oldest) / 60))
+    lines = [f"⚠️ <b>សង្ខេបកំហុស Forward</b> ({minutes} នាទីចុងក្រោយ)", ""]
+    for (task_id, error_class), group in sorted(groups, key=lambda item: item[1]['count'], reverse=True):
+        lines.append(f"• Task #{task_id} — <code>{error_class}</code> ×{group['count']}")
+        if group['sample_ids']:
+            samples = ", ".join(str(message_id) for message_id in group['sample_ids'])
+            more = "…" if group['count'] > len(group['sample_ids']) else ""
+            lines.append(f"  សារ ID: <code>{samples}</code>{more}")
+        lines.append(f"  Error: {html.escape(group['last_error'][:200])}")
+
+    text = "\n".join(lines)
+    if len(text) > MAX_MESSAGE_LENGTH:
+        text = text[:MAX_MESSAGE_LENGTH - 1].rsplit("\n", 1)[0] + "\n…"
+    return text
+
+def _take_groups(recipient):
+    """Removes and returns the queued groups of one recipient as [((task_id, error_class), group)]."""
+    keys = [key for key in _pending if key[0] == recipient]
+    return [((task_id, error_class), _pending.pop((recipient, task_id, error_class))) for _, task_id, error_class in keys]
+
+async def _send_digest(bot, recipient, groups):
+    """Sends one digest; returns True if it was delivered."""
+    if not groups:
+        return False
+    _last_sent[recipient] = time.monotonic()
+    try:
+        await bot.send_message(recipient, _format_digest(groups), parse_mode=ParseMode.HTML)
+        return True
+    except Exception as e:
+        # Dropped rather than re-queued: a recipient that blocked the bot would otherwise grow forever
+        logger.warning("Could not send failure digest to %s: %s", recipient, e, extra={'user_id': recipient})
+        return False
+
+async def flush_notifications(bot):
+    """Sends one digest per recipient for everything queued since the last flush. Returns the number of digests sent."""
+    global _pending
+    now = time.monotonic()
+    for recipient in [r for r, sent_at in _last_sent.items() if now - sent_at >= NOTIFY_DIGEST_INTERVAL]:
+        del _last_sent[recipient]
+    if not _pending:
+        return 0
+    batch, _pending = _pending, {}
+
+    by_recipient = {}
+    for (recipient, task_id, error_class), group in batch.items():
+        by_recipient.setdefault(recipient, []).append(((task_id, error_class), group))
+
+    sent = 0
+    for recipient, groups in by_recipient.items():
+        if await _send_digest(bot, recipient, groups):
+            sent += 1
+    return sent
+
+
+register_queue_depth('notifications', pending_count)
@@ -0,0 +1,145 @@
+import asyncio
+import cProfile
+import functools
+import io
+import logging
+import pstats
+import time
+from datetime import datetime
+
+try:
+    import yappi  # Optional: coroutine-aware wall-clock profiling
+except ImportError:
+    yappi = None
+
+logger = logging.getLogger(__name__)
+
+# Profiling state. Sections check _active before doing anything else,
+# so the cost while the profiler is off is a single global lookup per call.
+_active = False
+_profiler = None
+_started_at = None
+_started_wall = None
+_updates_left = None
+_deadline = None  # perf_counter() value at which a time-limited run ends
+_sections = {}  # name -> [calls, total_seconds, max_seconds]
+
+
+def is_active():
+    return _active
+
+def start_profiling(seconds=None, updates=None):
+    """
+    Starts profiling until stop_profiling() is called. seconds/updates are the limits
+    note_update() checks, so the update hook ends the run even where no timer job runs
+    (the webhook app has no running JobQueue).
+    Returns False if a profiling run is already in progress.
+    """
+    global _active, _profiler, _started_at, _started_wall, _updates_left, _deadline, _sections
+    if _active:
+        return False
+
+    _sections = {}
+    _updates_left = updates
+    _started_at = time.perf_counter()
+    _deadline = _started_at + seconds if seconds else None
+    _started_wall = datetime.now()
+    if yappi is not None:
+        yappi.clear_stats()
+        yappi.set_clock_type("wall")
+        yappi.start()
+        _profiler = yappi
+    else:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    _active = True
+    logger.info(f"Profiler started ({'yappi' if yappi else 'cProfile'}), seconds={seconds}, updates={updates}")
+    return True
+
+def note_update():
+    """Counts one processed update. Returns True when the update limit or the deadline has been reached."""
+    global _updates_left
+    if not _active:
+        return False
+    if _deadline is not None and time.perf_counter() >= _deadline:
+        return True
+    if _updates_left is None:
+        return False
+    _updates_left -= 1
+    return _updates_left <= 0
+
+def stop_profiling():
+    """Stops profiling and returns (summary, report_text), or (None, None) if it was not running."""
+    global _active, _profiler
+    if not _active:
+        return None, None
+    _active = False
+    elapsed = time.perf_counter() - _started_at
+
+    out = io.StringIO()
+    out.write(f"Profile started {_started_wall:%Y-%m-%d %H:%M:%S}, duration {elapsed:.1f}s, "
+              f"engine {'yappi (wall clock)' if _profiler is yappi else 'cProfile'}\n\n")
+
+    out.write("=== Time by handler / coroutine (wall clock, includes awaits) ===\n")
+    out.write(f"{'section':<32}{'calls':>8}{'total s':>12}{'avg ms':>10}{'max ms':>10}{'% of run':>10}\n")
+    for name, (calls, total, max_s) in sorted(_sections.items(), key=lambda item: item[1][1], reverse=True):
+        out.write(f"{name:<32}{calls:>8}{total:>12.3f}{total / calls * 1000:>10.1f}{max_s * 1000:>10.1f}"
+                  f"{total / elapsed * 100 if elapsed else 0:>9.1f}%\n")
+
+    out.write("\n=== Top functions by cumulative time ===\n")
+    if _profiler is yappi:
+        yappi.stop()
+        stats = yappi.get_func_stats()
+        stats.sort("ttot", "desc")
+        stats.print_all(out=out, columns={0: ("name", 80), 1: ("ncall", 8), 2: ("tsub", 8), 3: ("ttot", 8), 4: ("tavg", 8)})
+        out.write("\n=== Coroutines / threads ===\n")
+        yappi.get_thread_stats().print_all(out=out)
+        yappi.clear_stats()
+    else:
+        _profiler.disable()
+        pstats.Stats(_profiler, stream=out).sort_stats("cumulative").print_stats(60)
+    _profiler = None
+
+    busiest = max(_sections.items(), key=lambda item: item[1][1], default=None)
+    summary = f"{elapsed:.1f}s, {sum(s[0] for s in _sections.values())} profiled calls"
+    if busiest:
+        summary += f", most time in {busiest[0]} ({busiest[1][1]:.2f}s)"
+    logger.info(f"Profiler stopped: {summary}")
+    return summary, out.getvalue()
+
+def _record(name, seconds):
+    entry = _sections.get(name)
+    if entry is None:
+        _sections[name] = [1, seconds, seconds]
+    else:
+        entry[0] += 1
+        entry[1] += seconds
+        if seconds > entry[2]:
+            entry[2] = seconds
+
+def profiled(name):
+    """Decorator that adds the wrapped function's wall time to the named section while profiling is on."""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _active:
+                    return await func(*args, **kwargs)
+                started_at = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    _record(name, time.perf_counter() - started_at)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _active:
+                return func(*args, **kwargs)
+            started_at = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _record(name, time.perf_counter() - started_at)
+        return wrapper
+    return decorator
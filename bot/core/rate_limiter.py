@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from telegram.ext import BaseRateLimiter
+
+from .config import OUTBOUND_RATE_PER_SECOND, OUTBOUND_BURST, LANE_RESERVED_SHARES
+from .database import get_user_send_policies
+from .health import register_queue_depth
+from .metrics import SEND_QUEUE_DELAY
+
+logger = logging.getLogger(__name__)
+
+# Bot API methods that deliver (or edit) content in a chat and share the send budget.
+# Anything else (answerCallbackQuery, getChat, deleteMessage, ...) is passed straight through.
+SEND_ENDPOINTS = frozenset({
+    'sendMessage', 'sendPhoto', 'sendVideo', 'sendDocument', 'sendAnimation', 'sendAudio',
+    'sendVoice', 'sendMediaGroup', 'copyMessage', 'copyMessages', 'forwardMessage', 'forwardMessages',
+    'editMessageText', 'editMessageCaption',
+})
+
+# Priority lanes, highest first. Sends pick their lane with rate_limit_args={'lane': ...};
+# without it, sends for a task owner (a 'user_id' arg) are realtime and everything else
+# (replies to users, menus) is interactive.
+INTERACTIVE, REALTIME, BULK = "interactive", "realtime", "bulk"
+LANES = (INTERACTIVE, REALTIME, BULK)
+
+# Same as the users.send_weight column default
+DEFAULT_SEND_WEIGHT = 1
+
+# user_id -> (weight, cap_per_minute or None). Users without an entry get DEFAULT_SEND_WEIGHT and no cap.
+_policies = {}
+
+
+def load_policies():
+    """Reads the non-default per-user weights and caps from the users table."""
+    _policies.clear()
+    for row in get_user_send_policies():
+        _policies[row['user_id']] = (row['send_weight'], row['send_cap_per_minute'])
+    logger.info(f"Loaded send policies for {len(_policies)} users.")
+
+def set_policy(user_id, weight, cap_per_minute=None):
+    """Applies a weight / cap change immediately (the caller persists it)."""
+    if weight == DEFAULT_SEND_WEIGHT and not cap_per_minute:
+        _policies.pop(user_id, None)
+    else:
+        _policies[user_id] = (weight, cap_per_minute or None)
+
+def get_policy(user_id):
+    return _policies.get(user_id, (DEFAULT_SEND_WEIGHT, None))
+
+
+class _Lane:
+    """Waiting sends of one priority level, served by deficit round robin over task owners."""
+
+    def __init__(self, name, reserved_rate, reserve_capacity):
+        self.name = name
+        self.reserved_rate = reserved_rate
+        self.reserve_capacity = reserve_capacity
+        self.reserve = reserve_capacity
+        self.queues = {}     # user_id (None for sends without an owner) -> deque of (future, enqueued_at)
+        self.ring = deque()  # user_ids with waiting sends, in round robin order
+        self.deficit = {}    # user_id -> sends left in the current turn
+
+    def add(self, user_id, waiter, enqueued_at):
+        queue = self.queues.get(user_id)
+        if queue is None:
+            queue = self.queues[user_id] = deque()
+            self.ring.append(user_id)
+        queue.append((waiter, enqueued_at))
+
+    def refill(self, elapsed):
+        self.reserve = min(self.reserve_capacity, self.reserve + elapsed * self.reserved_rate)
+
+    def _drop(self, user_id):
+        self.ring.remove(user_id)
+        del self.queues[user_id]
+        self.deficit.pop(user_id, None)
+
+    def next_waiter(self, allow_user):
+        """
+        Pops the next waiting send in DRR order, skipping owners for which allow_user() is False.
+        Returns (future, enqueued_at, user_id), or None if nothing in this lane can be sent now.
+        """
+        for _ in range(len(self.ring)):
+            user_id = self.ring[0]
+            queue = self.queues[user_id]
+            while queue and (queue[0][0].done() or queue[0][0].get_loop().is_closed()):
+                # Cancelled sends and sends from a closed event loop
+                queue.popleft()
+            if not queue:
+                self._drop(user_id)
+                continue
+            if not allow_user(user_id):
+                # Over its cap: the turn passes on, the queue keeps its place in the ring
+                self.ring.rotate(-1)
+                continue
+
+            if self.deficit.get(user_id, 0) < 1:
+                self.deficit[user_id] = self.deficit.get(user_id, 0) + get_policy(user_id)[0]
+            waiter, enqueued_at = queue.popleft()
+            self.deficit[user_id] -= 1
+            if not queue:
+                self._drop(user_id)
+            elif self.deficit[user_id] < 1:
+                self.ring.rotate(-1)
+            return waiter, enqueued_at, user_id
+        return None
+
+    def waiting(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+
+class FairRateLimiter(BaseRateLimiter):
+    """
+    Priority lanes with fair queueing per task owner in front of the send endpoints.
+
+    The shared OUTBOUND_RATE_PER_SECOND budget is handed out one send at a time.
+    Each lane has a reserved share of the budget (LANE_RESERVED_SHARES) that it gets
+    whenever it has waiting sends, so bulk work is never starved; the rest goes to the
+    highest-priority lane with waiting sends, so interactive replies jump ahead of
+    queued bulk sends. Within a lane, owners are served by deficit round robin: each
+    gets `weight` sends per turn, and an owner with a cap never exceeds
+    cap_per_minute sends.
+    """
+
+    def __init__(self, rate=OUTBOUND_RATE_PER_SECOND, burst=OUTBOUND_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._lanes = {}
+        for name in LANES:
+            share = LANE_RESERVED_SHARES.get(name, 0)
+            self._lanes[name] = _Lane(name, rate * share, max(1.0, burst * share) if share else 0.0)
+        self._user_tokens = {}  # user_id -> [tokens, refilled_at] for capped users
+        self._sent = {}         # user_id -> sends granted since start
+        self._timer = None
+        self._policies_loaded = False
+        register_queue_depth('fair_queue', self.waiting)
+
+    def _ensure_policies(self):
+        # Bot.initialize() (and so initialize()) never runs under the webhook app, so the
+        # persisted weights and caps are loaded by the first request instead
+        if self._policies_loaded:
+            return
+        try:
+            load_policies()
+            self._policies_loaded = True
+        except Exception as e:
+            logger.error(f"Could not load send policies, will retry on the next request: {e}")
+
+    async def initialize(self) -> None:
+        self._ensure_policies()
+
+    async def shutdown(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        self._ensure_policies()
+        if endpoint in SEND_ENDPOINTS:
+            rate_limit_args = rate_limit_args or {}
+            user_id = rate_limit_args.get('user_id')
+            lane = rate_limit_args.get('lane') or (REALTIME if user_id is not None else INTERACTIVE)
+            await self._acquire(lane, user_id)
+        return await callback(*args, **kwargs)
+
+    # --- scheduling ---
+
+    async def _acquire(self, lane, user_id):
+        waiter = asyncio.get_running_loop().create_future()
+        self._lanes[lane].add(user_id, waiter, time.monotonic())
+        self._pump()
+        # A cancelled send leaves a done future behind, which the lane skips
+        await waiter
+
+    def _pump(self):
+        """Hands out send slots while the global budget allows: reserved shares first, then by priority."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        now = time.monotonic()
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        for lane in self._lanes.values():
+            lane.refill(elapsed)
+
+        def allow_user(user_id):
+            return user_id is None or self._take_user_token(user_id, now)
+
+        while self._tokens >= 1:
+            entry = None
+            for lane in self._lanes.values():
+                if lane.reserve >= 1 and lane.ring:
+                    entry = lane.next_waiter(allow_user)
+                    if entry:
+                        lane.reserve -= 1
+                        break
+            if entry is None:
+                for lane in self._lanes.values():
+                    entry = lane.next_waiter(allow_user) if lane.ring else None
+                    if entry:
+                        break
+            if entry is None:
+                break
+
+            waiter, enqueued_at, user_id = entry
+            waiter.set_result(None)
+            self._tokens -= 1
+            if user_id is not None:
+                self._sent[user_id] = self._sent.get(user_id, 0) + 1
+            SEND_QUEUE_DELAY.labels(lane.name).observe(now - enqueued_at)
+
+        if any(lane.ring for lane in self._lanes.values()):
+            self._schedule()
+
+    def _take_user_token(self, user_id, now):
+        cap = get_policy(user_id)[1]
+        if not cap:
+            return True
+        bucket = self._user_tokens.get(user_id)
+        capacity = max(1.0, min(cap, self.burst))
+        if bucket is None:
+            bucket = self._user_tokens[user_id] = [capacity, now]
+        bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * cap / 60)
+        bucket[1] = now
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def _schedule(self):
+        """Wakes _pump up when the next slot can be handed out."""
+        delay = max(0.0, (1 - self._tokens) / self.rate)
+        if self._tokens >= 1:
+            # Every waiting owner is over its cap: wait for the first one to earn a token back
+            delay = min(
+                ((1 - self._user_tokens[user_id][0]) * 60 / get_policy(user_id)[1]
+                 for lane in self._lanes.values()
+                 for user_id in lane.ring
+                 if user_id in self._user_tokens and get_policy(user_id)[1]),
+                default=1.0,
+            )
+        self._timer = asyncio.get_running_loop().call_later(max(delay, 0.001), self._pump)
+
+    # --- introspection (admin view, /healthz) ---
+
+    def waiting(self):
+        return sum(lane.waiting() for lane in self._lanes.values())
+
+    def lane_depths(self):
+        return {name: lane.waiting() for name, lane in self._lanes.items()}
+
+    def snapshot(self):
+        """Per-owner queue state for the admin view: {user_id: {'waiting', 'sent', 'weight', 'cap'}}."""
+        waiting = {}
+        for lane in self._lanes.values():
+            for user_id, queue in lane.queues.items():
+                if user_id is not None:
+                    waiting[user_id] = waiting.get(user_id, 0) + sum(1 for waiter, _ in queue if not waiter.done())
+        result = {}
+        for user_id in set(waiting) | set(self._sent) | set(_policies):
+            weight, cap = get_policy(user_id)
+            result[user_id] = {
+                'waiting': waiting.get(user_id, 0),
+                'sent': self._sent.get(user_id, 0),
+                'weight': weight,
+                'cap': cap,
+            }
+        return result
@@ -0,0 +1,37 @@
+import logging
+import time
+
+from .config import ROUTING_CACHE_TTL
+from .database import get_all_active_forward_settings
+from .filters import SourceMatcher
+
+logger = logging.getLogger(__name__)
+
+# source_channel_id -> SourceMatcher over the active 'new_messages' / 'catch_up' tasks of that source.
+# The tasks are the Setting rows from the query as they are (frozen, so safe to share).
+# Built from one query and reused for every post until a task changes (invalidate_routes)
+# or ROUTING_CACHE_TTL passes (covers changes made by other worker processes).
+_routes = None
+_loaded_at = 0.0
+
+
+def invalidate_routes():
+    """Call after any change to a task's source, activity, caption or rules."""
+    global _routes
+    _routes = None
+
+def _load_routes():
+    global _routes, _loaded_at
+    by_source = {}
+    for setting in get_all_active_forward_settings():
+        if setting['task_type'] in ('new_messages', 'catch_up'):
+            by_source.setdefault(setting['source_channel_id'], []).append(setting)
+    _routes = {source_id: SourceMatcher(settings) for source_id, settings in by_source.items()}
+    _loaded_at = time.monotonic()
+    logger.info(f"Routing table rebuilt: {len(_routes)} sources, {sum(len(s) for s in by_source.values())} tasks.")
+
+def get_source_matcher(source_id):
+    """Returns the compiled matcher for a source channel, or None if no active task reads from it."""
+    if _routes is None or time.monotonic() - _loaded_at >= ROUTING_CACHE_TTL:
+        _load_routes()
+    return _routes.get(source_id)
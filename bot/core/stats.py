@@ -0,0 +1,130 @@
+import logging
+import time
+from datetime import datetime
+
+from .config import STATS_FLUSH_INTERVAL
+from .database import upsert_task_stats, get_task_stats_rows, get_top_task_stats_rows
+from .metrics import FORWARDS
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (milliseconds) of the delivery latency histogram.
+# One extra bucket at the end counts everything slower than the last bound.
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000)
+
+# In-memory deltas per setting id, waiting to be flushed to the task_stats table.
+# Recording only touches this dict; the DB is written by flush_stats(), from the periodic job
+# and from record_forward() once STATS_FLUSH_INTERVAL has passed (the webhook app runs no jobs).
+_pending = {}
+# time.monotonic() of the last flush
+_flushed_at = time.monotonic()
+
+
+def _new_entry():
+    return {
+        'forwarded_count': 0,
+        'skipped_count': 0,
+        'failed_count': 0,
+        'retry_count': 0,
+        'deduplicated_count': 0,
+        'latency_ms_sum': 0,
+        'latency_buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+        'first_recorded_at': datetime.now(),
+    }
+
+def _entry(setting_id):
+    entry = _pending.get(setting_id)
+    if entry is None:
+        entry = _pending[setting_id] = _new_entry()
+    return entry
+
+def record_forward(setting_id, outcome, started_at=None, task_type='new_messages'):
+    """
+    Records the outcome of one delivery attempt for a task.
+    outcome is 'forwarded', 'skipped' (message not found), 'deduplicated' (already sent to the target) or 'failed'.
+    started_at is a time.monotonic() value taken before the send, used for latency.
+    """
+    FORWARDS.labels(task_type, outcome).inc()
+    if setting_id is None:
+        return
+    entry = _entry(setting_id)
+    entry[f'{outcome}_count'] += 1
+
+    if started_at is not None and outcome == 'forwarded':
+        latency_ms = int((time.monotonic() - started_at) * 1000)
+        entry['latency_ms_sum'] += latency_ms
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if latency_ms <= bound:
+                entry['latency_buckets'][i] += 1
+                break
+        else:
+            entry['latency_buckets'][-1] += 1
+
+    if time.monotonic() - _flushed_at >= STATS_FLUSH_INTERVAL:
+        flush_stats()
+
+def record_retry(setting_id):
+    """Records a retried send (e.g. after a Flood Wait) for a task."""
+    if setting_id is None:
+        return
+    _entry(setting_id)['retry_count'] += 1
+
+def flush_stats():
+    """Upserts all pending deltas into task_stats in one batch and resets the in-memory counters."""
+    global _pending, _flushed_at
+    _flushed_at = time.monotonic()
+    if not _pending:
+        return 0
+
+    batch, _pending = _pending, {}
+    try:
+        upsert_task_stats(batch)
+    except Exception as e:
+        logger.error(f"Failed to flush task stats for {len(batch)} tasks, keeping them for the next flush: {e}")
+        for setting_id, delta in batch.items():
+            _merge(_entry(setting_id), delta)
+        return 0
+    return len(batch)
+
+def _merge(target, delta):
+    for key in ('forwarded_count', 'skipped_count', 'failed_count', 'retry_count', 'deduplicated_count', 'latency_ms_sum'):
+        target[key] = (target.get(key) or 0) + delta[key]
+    buckets = target.get('latency_buckets') or []
+    if len(buckets) != len(delta['latency_buckets']):
+        buckets = [0] * len(delta['latency_buckets'])
+    target['latency_buckets'] = [a + b for a, b in zip(buckets, delta['latency_buckets'])]
+    if not target.get('first_recorded_at') or delta['first_recorded_at'] < target['first_recorded_at']:
+        target['first_recorded_at'] = delta['first_recorded_at']
+    return target
+
+def get_task_stats(setting_ids):
+    """Returns {setting_id: stats} for the given tasks, combining flushed and not-yet-flushed counters."""
+    if not setting_ids:
+        return {}
+    result = {row['setting_id']: dict(row) for row in get_task_stats_rows(list(setting_ids))}
+    for setting_id in setting_ids:
+        if setting_id in _pending:
+            result[setting_id] = _merge(result.get(setting_id, {}), _pending[setting_id])
+    return result
+
+def get_top_task_stats(limit=10):
+    """Returns the busiest tasks (by forwarded count) with their stats, most active first."""
+    rows = [dict(row) for row in get_top_task_stats_rows(limit)]
+    for row in rows:
+        if row['setting_id'] in _pending:
+            _merge(row, _pending[row['setting_id']])
+    return rows
+
+def summarize(stats):
+    """Derives throughput (forwards/hour), error rate (%) and average latency (ms) from a stats row."""
+    forwarded = stats.get('forwarded_count') or 0
+    failed = stats.get('failed_count') or 0
+
+    first_recorded_at = stats.get('first_recorded_at')
+    hours = (datetime.now() - first_recorded_at).total_seconds() / 3600 if first_recorded_at else 0
+    throughput = forwarded / hours if hours > 0 else 0.0
+
+    attempts = forwarded + failed
+    error_rate = (failed / attempts * 100) if attempts else 0.0
+    avg_latency_ms = (stats.get('latency_ms_sum') or 0) / forwarded if forwarded else 0.0
+    return throughput, error_rate, avg_latency_ms
@@ -0,0 +1,143 @@
+import csv
+import io
+import json
+
+from .config import TASK_IMPORT_MAX_ROWS
+from .filters import parse_rules_text, format_rules, normalize_rules
+from .captions import parse_caption_rules_text, format_caption_rules, normalize_caption_rules
+
+# Task export / import files, as JSON (a list of objects) or CSV (one row per task).
+# filter_rules and caption_rules are written in the same 'key: value' text the settings
+# menu accepts (lines separated by newlines), so both formats are edited the same way.
+TASK_FIELDS = (
+    'source_channel_id', 'target_channel_id', 'task_type', 'custom_caption', 'remove_tags_caption',
+    'start_message_id', 'end_message_id', 'forward_every_n_posts', 'interval_seconds',
+    'dedup_enabled', 'is_active', 'filter_rules', 'caption_rules',
+)
+TASK_TYPES = ('new_messages', 'id_range', 'catch_up')
+
+_TRUE_VALUES = ('true', 'yes', '1', 'on')
+_FALSE_VALUES = ('false', 'no', '0', 'off', '')
+
+
+def _export_row(setting):
+    row = {field: setting[field] for field in TASK_FIELDS if field not in ('filter_rules', 'caption_rules')}
+    row['custom_caption'] = row['custom_caption'] or ""
+    row['filter_rules'] = format_rules(normalize_rules(setting['filter_rules']))
+    row['caption_rules'] = format_caption_rules(normalize_caption_rules(setting['caption_rules']))
+    return row
+
+def export_tasks(settings, fmt='json'):
+    """Serializes tasks (channels_settings rows) as a JSON or CSV file; returns bytes."""
+    rows = [_export_row(setting) for setting in settings]
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=TASK_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+        # utf-8-sig so spreadsheet apps show the Khmer text of captions correctly
+        return buffer.getvalue().encode('utf-8-sig')
+    return json.dumps(rows, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def _int(row, field, default=0):
+    value = row.get(field)
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        raise ValueError(f"{field} must be a number")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a number")
+
+def _bool(row, field, default):
+    value = row.get(field)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE_VALUES:
+        return True
+    if text in _FALSE_VALUES:
+        return False if text else default
+    raise ValueError(f"{field} must be true or false")
+
+def _parse_row(row):
+    """Validates one imported row and returns it as add_forward_settings() data (without user_id)."""
+    if not isinstance(row, dict):
+        raise ValueError("not an object")
+    task_type = str(row.get('task_type') or 'new_messages').strip()
+    if task_type not in TASK_TYPES:
+        raise ValueError(f"task_type must be one of {', '.join(TASK_TYPES)}")
+
+    data = {
+        'source_channel_id': _int(row, 'source_channel_id', None),
+        'target_channel_id': _int(row, 'target_channel_id', None),
+        'task_type': task_type,
+        'custom_caption': row.get('custom_caption') or "",
+        'remove_tags_caption': _bool(row, 'remove_tags_caption', True),
+        'start_message_id': _int(row, 'start_message_id'),
+        'end_message_id': _int(row, 'end_message_id'),
+        'forward_every_n_posts': _int(row, 'forward_every_n_posts', 1),
+        'interval_seconds': _int(row, 'interval_seconds'),
+        'dedup_enabled': _bool(row, 'dedup_enabled', False),
+        'is_active': _bool(row, 'is_active', True),
+    }
+    if data['source_channel_id'] is None or data['target_channel_id'] is None:
+        raise ValueError("source_channel_id and target_channel_id are required")
+    if not isinstance(data['custom_caption'], str):
+        raise ValueError("custom_caption must be text")
+
+    if task_type == 'id_range':
+        if data['start_message_id'] <= 0 or data['end_message_id'] < data['start_message_id']:
+            raise ValueError("id_range needs 0 < start_message_id <= end_message_id")
+        if data['interval_seconds'] <= 0 or data['forward_every_n_posts'] <= 0:
+            raise ValueError("id_range needs interval_seconds > 0 and forward_every_n_posts > 0")
+    elif task_type == 'catch_up':
+        if data['start_message_id'] <= 0:
+            raise ValueError("catch_up needs start_message_id > 0")
+
+    for field, parse in (('filter_rules', parse_rules_text), ('caption_rules', parse_caption_rules_text)):
+        text = row.get(field) or ""
+        if not isinstance(text, str):
+            raise ValueError(f"{field} must be text")
+        try:
+            data[field] = parse(text)
+        except ValueError as e:
+            raise ValueError(f"{field}: {e}")
+    return data
+
+def parse_tasks_file(filename, content):
+    """
+    Parses an exported (or hand-written) JSON / CSV task file. The format is taken from the
+    file extension, or from the content if there is none. Every row is validated before any is
+    returned; raises ValueError naming the first bad row.
+    """
+    text = content.decode('utf-8-sig')
+    name = (filename or "").lower()
+    if name.endswith('.json') or (not name.endswith('.csv') and text.lstrip()[:1] in ('[', '{')):
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"invalid JSON: {e}")
+        if isinstance(rows, dict):
+            rows = [rows]
+        if not isinstance(rows, list):
+            raise ValueError("expected a list of tasks")
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+
+    if not rows:
+        raise ValueError("the file has no tasks")
+    if len(rows) > TASK_IMPORT_MAX_ROWS:
+        raise ValueError(f"at most {TASK_IMPORT_MAX_ROWS} tasks per file")
+
+    tasks = []
+    for number, row in enumerate(rows, start=1):
+        try:
+            tasks.append(_parse_row(row))
+        except ValueError as e:
+            raise ValueError(f"row {number}: {e}")
+    return tasks
@@ -1,3 +1,4 @@
+import html
 import logging
 import re
 from datetime import datetime, timedelta
@@ -13,13 +14,26 @@ from telegram.ext import (
 from telegram.constants import ParseMode
 
 from ..core.database import (
-    get_total_users,
     get_all_users_ids,
     get_user,
-    update_user_ban_status
+    update_user_ban_status,
+    update_users_ban_status,
+    get_users_bulk_summary,
+    pause_users_settings,
+    update_user_send_policy,
+    get_recent_forward_failures
 )
-from ..core.config import ADMIN_ID
+from ..core.config import ADMIN_ID, FORWARD_LOG_FAILURE_LOOKBACK_DAYS, BULK_USER_MAX_IDS, BULK_USER_MAX_FILE_SIZE, BULK_USER_NOTIFY_MAX
+from ..core.routing import invalidate_routes
+from ..core import catch_up
+from ..core.forward_log import flush_forward_log
+from ..core.stats import get_top_task_stats
+from ..core.counters import get_counters
+from ..core.rate_limiter import FairRateLimiter, BULK, set_policy as set_send_policy
+from ..core.profiler import is_active as profiler_is_active, start_profiling, stop_profiling, note_update
+from .helpers import format_task_stats, TASK_TYPE_LABELS
 from .start import start, back_to_main_menu
+from ..jobs import stop_jobs_for_tasks
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +41,12 @@ logger = logging.getLogger(__name__)
 (ADMIN_PANEL_MENU, BROADCAST_MESSAGE, 
  BROADCAST_CONFIRM, MANAGE_USER_ID, MANAGE_USER_ACTION, MANAGE_USER_TIME, 
  ADMIN_BROADCAST_PHOTO_TEXT, ADMIN_BROADCAST_VIDEO_TEXT, 
- BROADCAST_PROMPT_MESSAGE_ID) = range(9)
+ BROADCAST_PROMPT_MESSAGE_ID, MANAGE_USER_SEND_POLICY, FORWARD_LOG_TASK_ID,
+ BULK_USER_TIME, BULK_USER_IDS, BULK_USER_CONFIRM) = range(14)
+
+# Bulk user lists: one id per line, or per cell of a comma / semicolon / tab separated line
+BULK_ID_SEPARATORS_RE = re.compile(r"[,;\t ]+")
+BULK_ID_RE = re.compile(r"^[0-9]+$")
 
 
 # --- Admin Panel Functions ---
@@ -46,12 +65,28 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         [InlineKeyboardButton("📊 មើលចំនួន User សរុប", callback_data="admin_total_users")],
         [InlineKeyboardButton("📢 ផ្សាយសារទៅ User ទាំងអស់", callback_data="admin_broadcast_menu")],
         [InlineKeyboardButton("🚫 គ្រប់គ្រង User (Ban/Unban/Stop)", callback_data="admin_manage_user")],
+        [InlineKeyboardButton("👥 គ្រប់គ្រង User ច្រើននាក់ (Bulk)", callback_data="admin_bulk_users")],
+        [InlineKeyboardButton("📈 ស្ថិតិ Tasks", callback_data="admin_task_stats")],
+        [InlineKeyboardButton("⚖️ ជួរផ្ញើ (Fair Queue)", callback_data="admin_fair_queue")],
+        [InlineKeyboardButton("📜 Forward Log (បរាជ័យ)", callback_data="admin_forward_log")],
+        [InlineKeyboardButton("🔬 Profiler", callback_data="admin_profiler_menu")],
         [InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_main")]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
 
-    total_users = get_total_users()
-    message_text = f"<b>👑 ផ្ទាំងគ្រប់គ្រង Admin</b>\n\n<b>User សរុប:</b> <code>{total_users}</code> នាក់\n\nសូមជ្រើសរើសមុខងារគ្រប់គ្រង៖"
+    # Trigger-maintained counters (core/counters.py): no COUNT(*) over the tables per panel refresh
+    counters = get_counters()
+    active_tasks = counters['active_tasks']
+    tasks_text = ", ".join(
+        f"{TASK_TYPE_LABELS.get(task_type, task_type)}: <code>{count}</code>" for task_type, count in sorted(active_tasks.items())
+    ) or "<code>0</code>"
+    message_text = f"""<b>👑 ផ្ទាំងគ្រប់គ្រង Admin</b>
+
+<b>User សរុប:</b> <code>{counters['users']}</code> នាក់ (Ban: <code>{counters['banned_users']}</code>)
+<b>Tasks សកម្ម:</b> <code>{sum(active_tasks.values())}</code> ({tasks_text})
+<b>Forward ថ្ងៃនេះ (UTC):</b> <code>{counters['forwarded_today']}</code>
+
+សូមជ្រើសរើសមុខងារគ្រប់គ្រង៖"""
     
     if update.callback_query:
         await update.callback_query.answer()
@@ -69,11 +104,176 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
 
 async def admin_total_users(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Refreshes the admin panel showing total users."""
-    await query.answer()
     # The total users is already shown in the main admin panel
     # This just acts as a refresh
     return await admin_panel(update, context)
 
+async def admin_task_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Shows throughput and error rate for the busiest tasks."""
+    query = update.callback_query
+    await query.answer()
+
+    top_stats = get_top_task_stats(limit=10)
+    message_text = "<b>📈 ស្ថិតិ Tasks (សកម្មបំផុត)</b>\n"
+    if not top_stats:
+        message_text += "\nមិនទាន់មានស្ថិតិនៅឡើយទេ។"
+    for stats in top_stats:
+        message_text += f"\n<b>✨ Task #{stats['setting_id']}</b> ({stats['task_type']}, User <code>{stats['user_id']}</code>)\n"
+        message_text += format_task_stats(stats)
+
+    keyboard = [[InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_admin_panel")]]
+    await query.edit_message_text(message_text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode=ParseMode.HTML)
+    return ADMIN_PANEL_MENU
+
+async def admin_fair_queue(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Shows the per-user outbound send queues with their weights and caps."""
+    query = update.callback_query
+    await query.answer()
+
+    limiter = context.bot.rate_limiter
+    message_text = "<b>⚖️ ជួរផ្ញើ (Fair Queue)</b>\n"
+    if not isinstance(limiter, FairRateLimiter):
+        message_text += "\nFair Queue មិនត្រូវបានបើកទេ។"
+    else:
+        snapshot = limiter.snapshot()
+        rows = sorted(snapshot.items(), key=lambda item: (item[1]['waiting'], item[1]['sent']), reverse=True)[:15]
+        message_text += f"\n<b>កំពុងរង់ចាំសរុប:</b> <code>{limiter.waiting()}</code> សារ\n"
+        lanes = ", ".join(f"{lane}: <code>{depth}</code>" for lane, depth in limiter.lane_depths().items())
+        message_text += f"<b>តាម Lane:</b> {lanes}\n"
+        if not rows:
+            message_text += "\nមិនទាន់មានការផ្ញើនៅឡើយទេ។"
+        for user_id, state in rows:
+            cap_text = f"{state['cap']}/នាទី" if state['cap'] else "គ្មាន"
+            message_text += (f"\n👤 <code>{user_id}</code> — Weight: <code>{state['weight']}</code>, Cap: <code>{cap_text}</code>\n"
+                             f"    រង់ចាំ: <code>{state['waiting']}</code>, បានផ្ញើ: <code>{state['sent']}</code>")
+        message_text += "\n\nដើម្បីកែ Weight / Cap សូមចូល \"គ្រប់គ្រង User\"។"
+
+    keyboard = [[InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_admin_panel")]]
+    await query.edit_message_text(message_text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode=ParseMode.HTML)
+    return ADMIN_PANEL_MENU
+
+async def admin_forward_log_prompt(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Prompts admin for the task whose recent failed forwards to show."""
+    query = update.callback_query
+    await query.answer()
+    await query.edit_message_text(
+        f"""<b>📜 Forward Log (បរាជ័យ)</b>
+
+<b>➡️ សូមផ្ញើ Task ID ដើម្បីមើលការ Forward ដែលបរាជ័យក្នុងរយៈពេល {FORWARD_LOG_FAILURE_LOOKBACK_DAYS} ថ្ងៃចុងក្រោយ។</b>""",
+        parse_mode=ParseMode.HTML
+    )
+    return FORWARD_LOG_TASK_ID
+
+async def admin_show_forward_failures(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Shows the latest failed forwards of a task from the forward log."""
+    try:
+        setting_id = int(update.message.text.strip())
+    except ValueError:
+        await update.message.reply_html("<b>⚠️ Task ID មិនត្រឹមត្រូវទេ។</b> សូមផ្ញើ ID ជាលេខ។")
+        return FORWARD_LOG_TASK_ID
+
+    # Include the entries still waiting in the buffer
+    flush_forward_log()
+    failures = get_recent_forward_failures(setting_id, FORWARD_LOG_FAILURE_LOOKBACK_DAYS)
+    message_text = f"<b>📜 Forward បរាជ័យ — Task #{setting_id}</b>\n"
+    if not failures:
+        message_text += f"\nគ្មានការ Forward បរាជ័យក្នុងរយៈពេល {FORWARD_LOG_FAILURE_LOOKBACK_DAYS} ថ្ងៃចុងក្រោយទេ។"
+    for row in failures:
+        message_text += (f"\n<code>{row['logged_at'].strftime('%Y-%m-%d %H:%M:%S')}</code> "
+                         f"សារ <code>{row['source_message_id']}</code> → <code>{row['target_chat_id']}</code>\n"
+                         f"    {html.escape((row['error'] or '')[:200])}")
+
+    keyboard = [[InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_admin_panel")]]
+    await update.message.reply_html(message_text, reply_markup=InlineKeyboardMarkup(keyboard))
+    return ADMIN_PANEL_MENU
+
+# --- Profiler ---
+
+async def admin_profiler_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Shows the profiler options (run for N seconds or N updates, or stop)."""
+    query = update.callback_query
+    await query.answer()
+    return await _show_profiler_menu(query)
+
+async def _show_profiler_menu(query) -> int:
+    if profiler_is_active():
+        status_text = "🟢 Profiler កំពុងដំណើរការ។"
+    else:
+        status_text = "⚪ Profiler បានបិទ។"
+    keyboard = [
+        [InlineKeyboardButton("⏱️ 30 វិនាទី", callback_data="profile_time_30"),
+         InlineKeyboardButton("⏱️ 120 វិនាទី", callback_data="profile_time_120")],
+        [InlineKeyboardButton("📨 100 Updates", callback_data="profile_updates_100"),
+         InlineKeyboardButton("📨 500 Updates", callback_data="profile_updates_500")],
+        [InlineKeyboardButton("⏹️ បញ្ឈប់ និងផ្ញើលទ្ធផល", callback_data="profile_stop")],
+        [InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_admin_panel")]
+    ]
+    await query.edit_message_text(
+        f"""<b>🔬 Profiler</b>
+
+{status_text}
+Bot នឹងវាស់ពេលវេលាតាម Handler (handle_new_post, process_task, db_query ...) ហើយផ្ញើលទ្ធផលជាឯកសារមកអ្នក។""",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode=ParseMode.HTML
+    )
+    return ADMIN_PANEL_MENU
+
+async def admin_profiler_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """
+    Starts a profiling run limited by time or by number of updates. The update hook ends either
+    kind; the timer job also ends a time-limited run when no update arrives (polling mode only).
+    """
+    query = update.callback_query
+    _, mode, value = query.data.split("_")
+    value = int(value)
+
+    seconds = value if mode == "time" else None
+    updates = value if mode == "updates" else None
+    if not start_profiling(seconds=seconds, updates=updates):
+        await query.answer("⚠️ Profiler កំពុងដំណើរការរួចហើយ។", show_alert=True)
+        return ADMIN_PANEL_MENU
+
+    if seconds:
+        context.job_queue.run_once(finish_profiling_job, seconds, name="profiler_stop")
+        await query.answer(f"✅ Profiler បានចាប់ផ្តើមរយៈពេល {seconds} វិនាទី។", show_alert=True)
+    else:
+        await query.answer(f"✅ Profiler បានចាប់ផ្តើមសម្រាប់ {updates} Updates។", show_alert=True)
+    return await _show_profiler_menu(query)
+
+async def admin_profiler_stop(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Stops the profiler early and sends the report."""
+    query = update.callback_query
+    if not await finish_profiling(context):
+        await query.answer("⚪ Profiler មិនបានដំណើរការទេ។", show_alert=True)
+        return ADMIN_PANEL_MENU
+    await query.answer("✅ លទ្ធផល Profiler ត្រូវបានផ្ញើ។")
+    return await _show_profiler_menu(query)
+
+async def finish_profiling(context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """Stops profiling and sends the report to the admin as a document. Returns False if nothing was running."""
+    for job in context.job_queue.get_jobs_by_name("profiler_stop"):
+        job.schedule_removal()
+
+    summary, report = stop_profiling()
+    if report is None:
+        return False
+    await context.bot.send_document(
+        chat_id=ADMIN_ID,
+        document=report.encode(),
+        filename=f"profile-{datetime.now():%Y%m%d-%H%M%S}.txt",
+        caption=f"🔬 Profiler: {summary}"
+    )
+    return True
+
+async def finish_profiling_job(context: ContextTypes.DEFAULT_TYPE):
+    """JobQueue callback for time-limited profiling runs."""
+    await finish_profiling(context)
+
+async def profiler_update_hook(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Runs before every update (group -1) and ends profiling runs whose update limit or deadline has been reached."""
+    if note_update():
+        await finish_profiling(context)
+
 
 async def admin_broadcast_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Shows broadcast options."""
@@ -234,13 +434,13 @@ async def execute_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE)
     for user_id in users_to_broadcast:
         try:
             if broadcast_type == 'text':
-                await context.bot.send_message(chat_id=user_id, text=context.user_data.get('broadcast_text'), parse_mode=ParseMode.HTML)
+                await context.bot.send_message(chat_id=user_id, text=context.user_data.get('broadcast_text'), parse_mode=ParseMode.HTML, rate_limit_args={'lane': BULK})
             elif broadcast_type == 'photo':
-                await context.bot.send_photo(chat_id=user_id, photo=context.user_data.get('broadcast_file_id'), caption=context.user_data.get('broadcast_caption'), parse_mode=ParseMode.HTML)
+                await context.bot.send_photo(chat_id=user_id, photo=context.user_data.get('broadcast_file_id'), caption=context.user_data.get('broadcast_caption'), parse_mode=ParseMode.HTML, rate_limit_args={'lane': BULK})
             elif broadcast_type == 'video':
-                await context.bot.send_video(chat_id=user_id, video=context.user_data.get('broadcast_file_id'), caption=context.user_data.get('broadcast_caption'), parse_mode=ParseMode.HTML)
+                await context.bot.send_video(chat_id=user_id, video=context.user_data.get('broadcast_file_id'), caption=context.user_data.get('broadcast_caption'), parse_mode=ParseMode.HTML, rate_limit_args={'lane': BULK})
             elif broadcast_type == 'forward':
-                await context.bot.forward_message(chat_id=user_id, from_chat_id=context.user_data.get('forward_from_chat_id'), message_id=context.user_data.get('forward_message_id'))
+                await context.bot.forward_message(chat_id=user_id, from_chat_id=context.user_data.get('forward_from_chat_id'), message_id=context.user_data.get('forward_message_id'), rate_limit_args={'lane': BULK})
             success_count += 1
         except Exception as e:
             logger.error(f"Failed to broadcast to user {user_id}: {e}")
@@ -291,18 +491,21 @@ async def admin_select_user_action(update: Update, context: ContextTypes.DEFAULT
 
         status_text = "<b>ស្ថានភាពបច្ចុប្បន្ន៖</b> "
         if is_banned:
-            if banned_until and banned_until > datetime.now():
+            if banned_until:
                 status_text += f"ត្រូវបានបិទរហូតដល់ <code>{banned_until}</code>"
             else:
                 status_text += "ត្រូវបានបិទជាអចិន្ត្រៃយ៍"
         else:
             status_text += "មិនត្រូវបានបិទទេ"
+        cap_text = f"{user_data['send_cap_per_minute']}/នាទី" if user_data['send_cap_per_minute'] else "គ្មាន"
+        status_text += f"\n<b>Weight ផ្ញើ:</b> <code>{user_data['send_weight']}</code>, <b>Cap:</b> <code>{cap_text}</code>"
 
 
         keyboard = [
             [InlineKeyboardButton("⛔ Ban User", callback_data="manage_ban_user")],
             [InlineKeyboardButton("✅ Unban User", callback_data="manage_unban_user")],
             [InlineKeyboardButton("⏳ Stop User មួយរយៈ", callback_data="manage_stop_time")],
+            [InlineKeyboardButton("⚖️ កំណត់ Weight / Cap", callback_data="manage_send_policy")],
             [InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_admin_panel")]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -419,6 +622,232 @@ async def admin_set_stop_time(update: Update, context: ContextTypes.DEFAULT_TYPE
         await update.message.reply_html("<b>⚠️ រយៈពេលមិនត្រឹមត្រូវទេ។</b> សូមបញ្ចូលចំនួននាទីជាលេខ។")
         return MANAGE_USER_TIME
 
+async def admin_send_policy_prompt(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Prompts admin for the user's send weight and cap."""
+    query = update.callback_query
+    await query.answer()
+    await query.edit_message_text(
+        """<b>⚖️ កំណត់ Weight / Cap</b>
+
+<b>➡️ សូមផ្ញើ Weight និង Cap (ចំនួនសារក្នុងមួយនាទី) ដោយដកឃ្លា។</b>
+Weight ធំជាង = ចំណែកផ្ញើច្រើនជាង ពេល User ច្រើននាក់ផ្ញើក្នុងពេលតែមួយ។
+ឧទាហរណ៍: <code>3 0</code> (Weight 3 គ្មាន Cap), <code>1 20</code> (Weight 1, Cap 20 សារ/នាទី)។""",
+        parse_mode=ParseMode.HTML
+    )
+    return MANAGE_USER_SEND_POLICY
+
+async def admin_set_send_policy(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Saves the user's send weight and cap and applies them to the send queue right away."""
+    try:
+        parts = update.message.text.split()
+        weight = int(parts[0])
+        cap = int(parts[1]) if len(parts) > 1 else 0
+        if len(parts) > 2 or weight < 1 or cap < 0:
+            raise ValueError
+    except (ValueError, IndexError):
+        await update.message.reply_html("<b>⚠️ ទម្រង់មិនត្រឹមត្រូវទេ។</b> ឧទាហរណ៍: <code>3 0</code>")
+        return MANAGE_USER_SEND_POLICY
+
+    user_id_to_manage = context.user_data.get('user_id_to_manage')
+    update_user_send_policy(user_id_to_manage, weight, cap or None)
+    set_send_policy(user_id_to_manage, weight, cap or None)
+    cap_text = f"{cap}/នាទី" if cap else "គ្មាន"
+    await update.message.reply_html(f"✅ User ID <code>{user_id_to_manage}</code>: Weight <code>{weight}</code>, Cap <code>{cap_text}</code>")
+
+    context.user_data.clear()
+    await back_to_admin_panel(update, context)
+    return ConversationHandler.END
+
+
+# --- Bulk User Management ---
+
+async def admin_bulk_users_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Shows the bulk ban / unban / stop actions."""
+    query = update.callback_query
+    await query.answer()
+    keyboard = [
+        [InlineKeyboardButton("⛔ Ban ច្រើននាក់", callback_data="bulk_ban")],
+        [InlineKeyboardButton("✅ Unban ច្រើននាក់", callback_data="bulk_unban")],
+        [InlineKeyboardButton("⏳ Stop ច្រើននាក់មួយរយៈ", callback_data="bulk_stop")],
+        [InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_admin_panel")]
+    ]
+    await query.edit_message_text(
+        """<b>👥 គ្រប់គ្រង User ច្រើននាក់ (Bulk)</b>
+
+Ban និង Stop នឹងផ្អាក Tasks ទាំងអស់របស់ User ទាំងនោះផងដែរ។ Unban មិនបើក Tasks ឡើងវិញដោយស្វ័យប្រវត្តិទេ។""",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode=ParseMode.HTML
+    )
+    return ADMIN_PANEL_MENU
+
+def parse_bulk_user_ids(content):
+    """
+    Parses a pasted or uploaded list of user ids, keeping their order and dropping repeats.
+    Every cell must be a positive integer: anything else (headers, dates, negative chat ids)
+    raises ValueError with the offending line.
+    """
+    user_ids = []
+    for line in content.splitlines():
+        for cell in BULK_ID_SEPARATORS_RE.split(line.strip()):
+            cell = cell.strip('"')
+            if not cell:
+                continue
+            if not BULK_ID_RE.match(cell) or int(cell) <= 0:
+                raise ValueError(line.strip())
+            user_ids.append(int(cell))
+    return list(dict.fromkeys(user_ids))
+
+async def _prompt_bulk_user_ids(message, edit: bool) -> int:
+    text = f"""<b>➡️ សូមផ្ញើបញ្ជី User ID</b> (ដកឃ្លា សញ្ញាក្បៀស ឬមួយបន្ទាត់មួយ) ឬ Upload File <code>.txt</code> / <code>.csv</code>។
+ID នីមួយៗត្រូវតែជាលេខវិជ្ជមាន (គ្មាន Header ឬអត្ថបទផ្សេង)។ អតិបរមា {BULK_USER_MAX_IDS} នាក់។"""
+    if edit:
+        await message.edit_text(text, parse_mode=ParseMode.HTML)
+    else:
+        await message.reply_html(text)
+    return BULK_USER_IDS
+
+async def admin_bulk_users_action(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Remembers the chosen bulk action; 'stop' first asks for the duration."""
+    query = update.callback_query
+    await query.answer()
+    action = query.data.replace("bulk_", "")
+    context.user_data['bulk_action'] = action
+    if action == 'stop':
+        await query.edit_message_text(
+            """<b>⏳ Stop User ច្រើននាក់មួយរយៈ</b>
+
+<b>➡️ សូមបញ្ចូលរយៈពេលដែលអ្នកចង់បិទ User (ជាចំនួននាទី)។</b>
+ឧទាហរណ៍: <code>60</code> សម្រាប់ 1 ម៉ោង, <code>1440</code> សម្រាប់ 1 ថ្ងៃ។""",
+            parse_mode=ParseMode.HTML
+        )
+        return BULK_USER_TIME
+    return await _prompt_bulk_user_ids(query.message, edit=True)
+
+async def admin_bulk_users_time(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Receives the stop duration of a bulk stop."""
+    try:
+        duration_minutes = int(update.message.text.strip())
+        if duration_minutes <= 0:
+            raise ValueError
+    except ValueError:
+        await update.message.reply_html("<b>⚠️ រយៈពេលមិនត្រឹមត្រូវទេ។</b> សូមបញ្ចូលចំនួននាទីជាលេខ។")
+        return BULK_USER_TIME
+    context.user_data['bulk_minutes'] = duration_minutes
+    return await _prompt_bulk_user_ids(update.message, edit=False)
+
+async def _notify_users(bot, user_ids, text):
+    """Tells each affected user, in the bulk send lane so it never delays interactive replies."""
+    for user_id in user_ids:
+        try:
+            await bot.send_message(chat_id=user_id, text=text, parse_mode=ParseMode.HTML, rate_limit_args={'lane': BULK})
+        except Exception as e:
+            logger.warning(f"Could not notify user {user_id} about a bulk action: {e}")
+
+async def admin_bulk_users_receive_ids(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Parses the pasted / uploaded user ids and asks for confirmation, showing how many users and tasks are affected."""
+    message = update.message
+    if message.document:
+        if message.document.file_size and message.document.file_size > BULK_USER_MAX_FILE_SIZE:
+            await message.reply_html(f"<b>⚠️ File ធំពេក។</b> ទំហំអតិបរមា {BULK_USER_MAX_FILE_SIZE // 1024} KB។")
+            return BULK_USER_IDS
+        telegram_file = await message.document.get_file()
+        try:
+            content = bytes(await telegram_file.download_as_bytearray()).decode('utf-8-sig')
+        except UnicodeDecodeError:
+            await message.reply_html("<b>⚠️ File ត្រូវតែជាអត្ថបទ UTF-8 (.txt / .csv)។</b>")
+            return BULK_USER_IDS
+    else:
+        content = message.text or ""
+
+    try:
+        user_ids = [user_id for user_id in parse_bulk_user_ids(content) if user_id != ADMIN_ID]
+    except ValueError as e:
+        await message.reply_html(f"<b>⚠️ បន្ទាត់មិនត្រឹមត្រូវ៖</b> <code>{html.escape(str(e)[:200])}</code>\nសូមផ្ញើតែ User ID (លេខវិជ្ជមាន) ប៉ុណ្ណោះ។")
+        return BULK_USER_IDS
+    if not user_ids or len(user_ids) > BULK_USER_MAX_IDS:
+        await message.reply_html(f"<b>⚠️ សូមផ្ញើ User ID ពី 1 ដល់ {BULK_USER_MAX_IDS} (មិនរាប់បញ្ចូល Admin)។</b>")
+        return BULK_USER_IDS
+
+    action = context.user_data.get('bulk_action')
+    summary = get_users_bulk_summary(user_ids)
+    context.user_data['bulk_user_ids'] = user_ids
+    if action == 'unban':
+        action_text = "Unban"
+        effect = f"User <code>{summary['users']}</code> នាក់នឹងត្រូវបាន Unban។"
+    else:
+        action_text = "Ban" if action == 'ban' else f"Stop {context.user_data.get('bulk_minutes', 0)} នាទី"
+        effect = f"User <code>{summary['users']}</code> នាក់នឹងត្រូវបាន {action_text} ហើយ Tasks <code>{summary['tasks']}</code> នឹងត្រូវបានផ្អាក។"
+    keyboard = [
+        [InlineKeyboardButton(f"✅ បាទ/ចាស {action_text} ឥឡូវនេះ", callback_data="bulk_confirm_yes")],
+        [InlineKeyboardButton("❌ ទេ បោះបង់", callback_data="bulk_confirm_no")]
+    ]
+    await message.reply_html(
+        f"""<b>⚠️ បញ្ជាក់ {action_text}</b>
+
+{effect}
+<b>➡️ រកមិនឃើញ:</b> <code>{len(user_ids) - summary['users']}</code> ID""",
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+    return BULK_USER_CONFIRM
+
+async def admin_bulk_users_execute(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """
+    Applies the confirmed bulk action with one UPDATE over all ids; ban / stop also pause all their
+    tasks with one UPDATE, remove those tasks' jobs in one pass and rebuild the routing table.
+    The first BULK_USER_NOTIFY_MAX affected users are then notified before the handler returns;
+    the admin is told how many were not.
+    """
+    query = update.callback_query
+    await query.answer()
+    user_ids = context.user_data.get('bulk_user_ids')
+
+    if query.data == "bulk_confirm_no" or not user_ids:
+        await query.edit_message_text("❌ សកម្មភាព Bulk ត្រូវបានបោះបង់។")
+        context.user_data.clear()
+        await admin_panel(update, context)
+        return ConversationHandler.END
+
+    action = context.user_data.get('bulk_action')
+    paused = []
+    if action == 'unban':
+        found = update_users_ban_status(user_ids, False, None)
+        notice = "🎉 អ្នកត្រូវបានអនុញ្ញាតឱ្យប្រើ Bot នេះឡើងវិញហើយ!"
+        action_text = "Unban"
+    else:
+        banned_until = None
+        notice = "🚫 អ្នកត្រូវបានបិទមិនឱ្យប្រើ Bot នេះដោយ Admin ។"
+        action_text = "Ban"
+        if action == 'stop':
+            banned_until = datetime.now() + timedelta(minutes=context.user_data.get('bulk_minutes', 0))
+            notice = (f"🚫 អ្នកត្រូវបានបិទមិនឱ្យប្រើ Bot នេះបណ្តោះអាសន្នរហូតដល់៖ "
+                      f"<code>{banned_until.strftime('%Y-%m-%d %H:%M:%S')}</code> ដោយ Admin ។")
+            action_text = f"Stop រហូតដល់ {banned_until.strftime('%Y-%m-%d %H:%M:%S')}"
+        found = update_users_ban_status(user_ids, True, banned_until)
+        if found:
+            paused = pause_users_settings(found)
+        if paused:
+            paused_ids = [row['id'] for row in paused]
+            stop_jobs_for_tasks(context.job_queue, paused_ids)
+            for setting_id in paused_ids:
+                catch_up.reset(setting_id)
+            invalidate_routes()
+
+    notified = found[:BULK_USER_NOTIFY_MAX]
+    logger.info(f"Bulk {action}: {len(found)} of {len(user_ids)} users updated, {len(paused)} tasks paused, {len(notified)} notified.")
+    await query.edit_message_text(
+        f"""✅ <b>{action_text}</b> បានអនុវត្តលើ User <code>{len(found)}</code> នាក់។
+<b>➡️ រកមិនឃើញ:</b> <code>{len(user_ids) - len(found)}</code> ID
+<b>➡️ Tasks ត្រូវបានផ្អាក:</b> <code>{len(paused)}</code>
+<b>➡️ មិនបានជូនដំណឹង:</b> <code>{len(found) - len(notified)}</code> នាក់ (ជូនដំណឹងតែ {BULK_USER_NOTIFY_MAX} នាក់ដំបូងប៉ុណ្ណោះ)""",
+        parse_mode=ParseMode.HTML
+    )
+    # Awaited here: tasks created from a webhook request are cancelled once it returns
+    await _notify_users(context.bot, notified, notice)
+
+    context.user_data.clear()
+    await admin_panel(update, context)
+    return ConversationHandler.END
+
 
 def get_admin_conv_handler() -> ConversationHandler:
     """Returns the ConversationHandler for the admin panel."""
@@ -432,6 +861,15 @@ def get_admin_conv_handler() -> ConversationHandler:
                 CallbackQueryHandler(admin_total_users, pattern="^admin_total_users$"),
                 CallbackQueryHandler(admin_broadcast_menu, pattern="^admin_broadcast_menu$"),
                 CallbackQueryHandler(admin_manage_user, pattern="^admin_manage_user$"),
+                CallbackQueryHandler(admin_bulk_users_menu, pattern="^admin_bulk_users$"),
+                CallbackQueryHandler(admin_bulk_users_action, pattern="^bulk_(ban|unban|stop)$"),
+                CallbackQueryHandler(admin_task_stats, pattern="^admin_task_stats$"),
+                CallbackQueryHandler(admin_fair_queue, pattern="^admin_fair_queue$"),
+                CallbackQueryHandler(admin_forward_log_prompt, pattern="^admin_forward_log$"),
+                CallbackQueryHandler(admin_profiler_menu, pattern="^admin_profiler_menu$"),
+                CallbackQueryHandler(admin_profiler_start, pattern=re.compile(r"^profile_(time|updates)_\d+$")),
+                CallbackQueryHandler(admin_profiler_stop, pattern="^profile_stop$"),
+                CallbackQueryHandler(back_to_admin_panel, pattern="^back_to_admin_panel$"),
                 CallbackQueryHandler(back_to_main_menu, pattern="^back_to_main$"),
             ],
             BROADCAST_MESSAGE: [
@@ -458,11 +896,27 @@ def get_admin_conv_handler() -> ConversationHandler:
                 CallbackQueryHandler(admin_ban_user, pattern="^manage_ban_user$"),
                 CallbackQueryHandler(admin_unban_user, pattern="^manage_unban_user$"),
                 CallbackQueryHandler(admin_stop_user_prompt_time, pattern="^manage_stop_time$"),
+                CallbackQueryHandler(admin_send_policy_prompt, pattern="^manage_send_policy$"),
                 CallbackQueryHandler(back_to_admin_panel, pattern="^back_to_admin_panel$"),
             ],
             MANAGE_USER_TIME: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, admin_set_stop_time),
             ],
+            MANAGE_USER_SEND_POLICY: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, admin_set_send_policy),
+            ],
+            FORWARD_LOG_TASK_ID: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, admin_show_forward_failures),
+            ],
+            BULK_USER_TIME: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, admin_bulk_users_time),
+            ],
+            BULK_USER_IDS: [
+                MessageHandler((filters.TEXT & ~filters.COMMAND) | filters.Document.ALL, admin_bulk_users_receive_ids),
+            ],
+            BULK_USER_CONFIRM: [
+                CallbackQueryHandler(admin_bulk_users_execute, pattern="^bulk_confirm_(yes|no)$"),
+            ],
         },
         fallbacks=[CommandHandler("start", start), MessageHandler(filters.Regex("^ផ្ទាំងគ្រប់គ្រង Admin 👑$"), admin_panel)],
         per_message=False
@@ -1,17 +1,34 @@
 import logging
+import time
 from telegram import Update
 from telegram.ext import ContextTypes
-from telegram.constants import ParseMode
 
-from ..core.database import get_all_active_forward_settings, update_setting_last_processed_id
-from .helpers import _send_message_content
+from ..core.database import update_setting_last_processed_id, get_setting_by_id, finish_catch_up
+from ..core.routing import get_source_matcher, invalidate_routes
+from ..core.captions import get_caption_pipeline
+from ..core.stats import record_forward
+from ..core.notifier import notify_failure
+from ..core.profiler import profiled
+from ..core.dispatcher import dispatch
+from ..core import message_map, catch_up
+from .helpers import _send_message_content, _send_message_content_by_id, _edit_message_content, DUPLICATE, CIRCUIT_OPEN
 
 logger = logging.getLogger(__name__)
 
+async def dispatch_new_post(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Channel post handler. Queues the post on its source channel's lane, so posts
+    from one channel reach the targets in order while other channels run in parallel.
+    """
+    if not update.channel_post:
+        return
+    await dispatch(update.channel_post.chat_id, handle_new_post, update, context)
+
+@profiled("handle_new_post")
 async def handle_new_post(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     This function is triggered by the MessageHandler for new channel posts.
-    It checks all 'new_messages' tasks and forwards the post if it matches.
+    It forwards the post to every 'new_messages' / 'catch_up' task of its source channel whose filter rules accept it.
     """
     if not update.channel_post:
         return
@@ -20,40 +37,140 @@ async def handle_new_post(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     source_id = message.chat_id
     message_id = message.message_id
 
-    # Get all active settings
-    all_settings = get_all_active_forward_settings()
-    
-    # Find settings that match this source channel and are 'new_messages' type
-    matching_settings = [
-        s for s in all_settings 
-        if s['source_channel_id'] == source_id and s['task_type'] == 'new_messages'
-    ]
+    # Tasks of this source with their filters compiled into one matcher (cached, no DB query per post)
+    matcher = get_source_matcher(source_id)
+    if matcher is None:
+        return
 
+    matching_settings = matcher.match(message)
     if not matching_settings:
         return
 
-    logger.info(f"New post {message_id} in {source_id}. Found {len(matching_settings)} matching tasks.")
+    logger.info("New post %s in %s. Found %d matching tasks.", message_id, source_id, len(matching_settings),
+                extra={'source': source_id, 'message_id': message_id})
 
     for setting in matching_settings:
+        if setting['task_type'] == 'catch_up':
+            if not setting['catch_up_done']:
+                # Still backfilling: the backfill job sends this post when it hands over
+                catch_up.defer(setting['id'], message)
+                continue
+            if message_id <= setting['last_processed_message_id']:
+                # At or below the handover watermark: already sent by the backfill
+                continue
+        await _deliver_post(context, setting, message)
+
+async def _deliver_post(context: ContextTypes.DEFAULT_TYPE, setting: dict, message) -> None:
+    """Sends one live post for one task and records the outcome."""
+    source_id = message.chat_id
+    message_id = message.message_id
+    started_at = time.monotonic()
+    try:
+        success = await _send_message_content(
+            context,
+            chat_id=setting['target_channel_id'],
+            message=message,
+            setting_id=setting['id'],
+            user_id=setting['user_id'],
+            dedup_enabled=setting['dedup_enabled'],
+            caption_pipeline=get_caption_pipeline(setting),
+            source_ref=(source_id, message_id)
+        )
+        if success == DUPLICATE:
+            outcome = 'deduplicated'
+        elif success == CIRCUIT_OPEN:
+            outcome = 'failed'
+        else:
+            outcome = 'forwarded' if success else 'failed'
+        record_forward(setting['id'], outcome, started_at)
+        logger.info("Task %s: %s %s from %s to %s", setting['id'], outcome, message_id, source_id, setting['target_channel_id'],
+                    extra={'task_id': setting['id'], 'source': source_id, 'target': setting['target_channel_id'],
+                           'message_id': message_id, 'outcome': outcome,
+                           'latency_ms': round((time.monotonic() - started_at) * 1000)})
+        
+        # Update the last processed ID for this task
+        update_setting_last_processed_id(setting['id'], message_id)
+        
+    except Exception as e:
+        record_forward(setting['id'], 'failed')
+        logger.error("Failed to process task %s for message %s: %s", setting['id'], message_id, e,
+                     extra={'task_id': setting['id'], 'source': source_id, 'message_id': message_id})
+        # Notify the user who set up the task (coalesced into at most one digest per interval)
+        await notify_failure(context.bot, setting['user_id'], setting['id'], e, message_id)
+
+async def dispatch_edited_post(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Edited channel post handler. Uses the same lane as new posts, so an edit
+    waits until the post itself has been forwarded.
+    """
+    if not update.edited_channel_post:
+        return
+    await dispatch(update.edited_channel_post.chat_id, handle_edited_post, update, context)
+
+@profiled("handle_edited_post")
+async def handle_edited_post(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Propagates an edit of a source post to every target message it was forwarded as
+    (found in the message map), re-rendered with each task's caption pipeline.
+    The Bot API does not send channel post deletions to bots, so those cannot be propagated.
+    """
+    message = update.edited_channel_post
+    source_id = message.chat_id
+    message_id = message.message_id
+
+    targets = message_map.lookup(source_id, message_id)
+    if not targets:
+        return
+
+    matcher = get_source_matcher(source_id)
+    settings = {setting['id']: setting for setting in matcher.settings} if matcher else {}
+    for setting_id, target_id, target_message_id in targets:
+        # id_range tasks are not in the routing table
+        setting = settings.get(setting_id) or get_setting_by_id(setting_id)
+        if not setting or not setting['is_active']:
+            continue
         try:
-            logger.info(f"Processing task {setting['id']}: Forwarding {message_id} from {source_id} to {setting['target_channel_id']}")
-            
-            await _send_message_content(
-                context,
-                chat_id=setting['target_channel_id'],
-                message=message,
-                custom_caption=setting['custom_caption'],
-                remove_original_caption=setting['remove_tags_caption']
+            edited = await _edit_message_content(
+                context, target_id, target_message_id, message,
+                get_caption_pipeline(setting),
+                user_id=setting['user_id']
             )
-            
-            # Update the last processed ID for this task
-            update_setting_last_processed_id(setting['id'], message_id)
-            
+            logger.info("Task %s: edit of %s in %s %s to %s/%s", setting_id, message_id, source_id,
+                        "propagated" if edited else "unchanged", target_id, target_message_id,
+                        extra={'task_id': setting_id, 'source': source_id, 'target': target_id, 'message_id': message_id})
         except Exception as e:
-            logger.error(f"Failed to process task {setting['id']} for message {message_id}: {e}")
-            # Notify the user who set up the task
-            await context.bot.send_message(
-                chat_id=setting['user_id'],
-                text=f"⚠️ Task #{setting['id']} បានបរាជ័យក្នុងការ Forward សារ ID <code>{message_id}</code> ពី <code>{source_id}</code>។\nError: {e}",
-                parse_mode=ParseMode.HTML
-            )
+            logger.error("Task %s: failed to propagate edit of %s to %s: %s", setting_id, message_id, target_id, e,
+                         extra={'task_id': setting_id, 'source': source_id, 'target': target_id, 'message_id': message_id})
+
+async def hand_over_catch_up(context: ContextTypes.DEFAULT_TYPE, setting_id: int) -> bool:
+    """
+    Switches a backfilled 'catch_up' task to live delivery. Must run in the source's dispatcher
+    lane: live posts of the source queue behind it, so none is handled while the task flips.
+    The watermark is the id below the first post deferred while backfilling (the backfill
+    stopped there) or, if none was deferred, the highest source id the backfill found (never the
+    scan cursor, which runs past the channel's head). Deferred posts
+    above it are then sent in order. Returns False if the task is gone, paused or already done.
+    """
+    setting = get_setting_by_id(setting_id)
+    if not setting or not setting['is_active'] or setting['catch_up_done']:
+        catch_up.reset(setting_id)
+        return False
+
+    first_deferred = catch_up.first_deferred_id(setting_id)
+    watermark = first_deferred - 1 if first_deferred is not None else setting['last_processed_message_id']
+    finish_catch_up(setting_id, watermark)
+    invalidate_routes()
+    deferred = catch_up.take_deferred(setting_id)
+    catch_up.reset(setting_id)
+    logger.info("Task %s: backfill handed over at %s, sending %d deferred posts", setting_id, watermark, len(deferred),
+                extra={'task_id': setting_id, 'source': setting['source_channel_id']})
+
+    for message_id, message in deferred:
+        if message is not None:
+            await _deliver_post(context, setting, message)
+        else:
+            # Not held (more than CATCH_UP_MAX_DEFERRED posts deferred): fetch it like an id_range task
+            success = await _send_message_content_by_id(context, setting.with_current_id(message_id))
+            if success is True:
+                update_setting_last_processed_id(setting_id, message_id)
+    return True
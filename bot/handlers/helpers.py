@@ -1,111 +1,251 @@
+import asyncio
 import logging
+import time
 from telegram import Update, ForceReply, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
-from telegram.error import BadRequest
+from telegram.error import BadRequest, RetryAfter
 
-from ..core.config import ADMIN_ID
+from ..core.config import ADMIN_ID, TASKS_PAGE_SIZE, SEND_MAX_RETRIES, CHANNEL_CHECK_CONCURRENCY
+from ..core.database import get_user_forward_settings_page, get_task_owner_ids_by_target
+from ..core.rate_limiter import BULK
+from ..core import dedup, message_map, forward_log
+from ..core.filters import get_task_matcher
+from ..core.captions import CaptionPipeline, get_caption_pipeline
+from ..core.circuit import allow_send, record_success, record_failure, release_probe, is_permanent_error, OPEN
+from ..core.stats import record_retry, summarize
+from ..core.notifier import notify_failure
+from ..core.metrics import SEND_LATENCY, FLOOD_WAITS, BOT_API_ERRORS, message_type
+from ..core.profiler import profiled
 
 logger = logging.getLogger(__name__)
 
-async def _send_message_content(context: ContextTypes.DEFAULT_TYPE, chat_id: int, message, custom_caption: str = None, remove_original_caption: bool = True):
+# Returned by _send_message_content when dedup is on and the content was already sent to the target
+DUPLICATE = 'duplicate'
+# Returned by _send_message_content_by_id when the task's filter rules reject the message
+FILTERED = 'filtered'
+# Returned instead of sending when the target's circuit breaker is open; the caller should retry later
+CIRCUIT_OPEN = 'circuit_open'
+# Returned by _send_message_content_by_id when the source can't be read any more (permanent error)
+SOURCE_UNAVAILABLE = 'source_unavailable'
+
+TASK_TYPE_LABELS = {
+    'new_messages': 'សារថ្មីៗ',
+    'id_range': 'តាម ID Range',
+    'catch_up': 'Backfill + សារថ្មីៗ',
+}
+
+@profiled("_send_message_content")
+async def _send_message_content(context: ContextTypes.DEFAULT_TYPE, chat_id: int, message, custom_caption: str = None, remove_original_caption: bool = True, setting_id: int = None, user_id: int = None, lane: str = None, dedup_enabled: bool = False, caption_pipeline: CaptionPipeline = None, source_ref: tuple = None, circuit_checked: bool = False):
     """
     Sends various message types (text, photo, video, document) with custom caption logic.
     Effectively hides sender and original caption by re-sending.
+    The text/caption comes from caption_pipeline (the task's compiled caption rules and
+    template); without one, custom_caption and remove_original_caption are applied as is.
+    source_ref is (source_chat_id, source_message_id); when given, the sent message is recorded
+    in the message map so later edits of the source post can be propagated.
+    Flood Waits (429) are retried up to SEND_MAX_RETRIES times and counted in the task's stats.
+    Sends to a target whose circuit breaker is open return CIRCUIT_OPEN without calling the API
+    (circuit_checked: the caller already did the allow_send() check).
+    user_id is the task owner and lane the rate limiter priority lane (realtime by default for owned sends);
+    sends are queued fairly per owner by the rate limiter.
+    With dedup_enabled, content already sent to the target returns DUPLICATE without calling the API.
+    Every task send (setting_id given) is recorded in the forward log.
     """
-    effective_caption = ""
-    original_caption = message.caption or ""
-    original_text = message.text or ""
+    if caption_pipeline is None:
+        caption_pipeline = CaptionPipeline(custom_caption or "", remove_original_caption)
+    effective_caption = caption_pipeline.render(message)
+    rate_limit_args = {'user_id': user_id, 'lane': lane}
 
-    if not remove_original_caption:
-        effective_caption = original_caption
-    
-    if custom_caption:
-        if effective_caption:
-            effective_caption += "\n" + custom_caption
-        else:
-            effective_caption = custom_caption
+    if not circuit_checked and not allow_send(chat_id):
+        logger.info("Circuit open for %s, skipping send", chat_id, extra={'task_id': setting_id, 'target': chat_id})
+        if setting_id is not None:
+            forward_log.log_forward(setting_id, source_ref, chat_id, 'failed', error="circuit open")
+        return CIRCUIT_OPEN
 
-    effective_caption = effective_caption if effective_caption else None
+    dedup_key = dedup.content_key(message) if dedup_enabled else None
+    if dedup_key and not dedup.claim(chat_id, dedup_key):
+        release_probe(chat_id)
+        if setting_id is not None:
+            forward_log.log_forward(setting_id, source_ref, chat_id, 'deduplicated')
+        return DUPLICATE
 
+    started_at = time.perf_counter()
+    delivered = False
+    sent = None
+    error = None
     try:
-        if message.photo:
-            await context.bot.send_photo(
-                chat_id=chat_id,
-                photo=message.photo[-1].file_id,
-                caption=effective_caption,
-                parse_mode=ParseMode.HTML if effective_caption else None
-            )
-        elif message.video:
-            await context.bot.send_video(
+        for attempt in range(SEND_MAX_RETRIES + 1):
+            try:
+                if message.photo:
+                    sent = await context.bot.send_photo(
+                        chat_id=chat_id,
+                        photo=message.photo[-1].file_id,
+                        caption=effective_caption,
+                        parse_mode=ParseMode.HTML if effective_caption else None,
+                        rate_limit_args=rate_limit_args
+                    )
+                elif message.video:
+                    sent = await context.bot.send_video(
+                        chat_id=chat_id,
+                        video=message.video.file_id,
+                        caption=effective_caption,
+                        parse_mode=ParseMode.HTML if effective_caption else None,
+                        rate_limit_args=rate_limit_args
+                    )
+                elif message.document:
+                    sent = await context.bot.send_document(
+                        chat_id=chat_id,
+                        document=message.document.file_id,
+                        caption=effective_caption,
+                        parse_mode=ParseMode.HTML if effective_caption else None,
+                        rate_limit_args=rate_limit_args
+                    )
+                elif message.text:
+                    if effective_caption:
+                        sent = await context.bot.send_message(
+                            chat_id=chat_id,
+                            text=effective_caption,
+                            parse_mode=ParseMode.HTML,
+                            rate_limit_args=rate_limit_args
+                        )
+                else:
+                    logger.warning("Unsupported message type for forwarding: %s", message.message_id,
+                                   extra={'task_id': setting_id, 'message_id': message.message_id})
+                    release_probe(chat_id)
+                    error = "unsupported message type"
+                    return False
+                delivered = True
+                if sent and source_ref:
+                    message_map.record(source_ref[0], source_ref[1], chat_id, sent.message_id, setting_id)
+                if record_success(chat_id):
+                    await _notify_circuit_change(context, chat_id, recovered=True)
+                return True
+            except RetryAfter as e:
+                FLOOD_WAITS.inc()
+                if attempt >= SEND_MAX_RETRIES:
+                    logger.error("Flood wait while sending to %s, giving up after %d retries: %s", chat_id, attempt, e,
+                                 extra={'task_id': setting_id, 'target': chat_id})
+                    release_probe(chat_id)
+                    error = e
+                    return False
+                logger.warning("Flood wait while sending to %s, retrying in %ss", chat_id, e.retry_after,
+                               extra={'task_id': setting_id, 'target': chat_id})
+                record_retry(setting_id)
+                await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                BOT_API_ERRORS.labels(type(e).__name__).inc()
+                error = e
+                logger.error("Failed to send message content to %s: %s", chat_id, e,
+                             extra={'task_id': setting_id, 'target': chat_id})
+                if record_failure(chat_id, e) == OPEN:
+                    await _notify_circuit_change(context, chat_id, recovered=False, error=e)
+                return False
+        return False
+    finally:
+        if dedup_key and not delivered:
+            dedup.release(chat_id, dedup_key)
+        if setting_id is not None:
+            forward_log.log_forward(setting_id, source_ref, chat_id, 'forwarded' if delivered else 'failed',
+                                    target_message_id=sent.message_id if sent else None, error=error)
+        SEND_LATENCY.labels(message_type(message)).observe(time.perf_counter() - started_at)
+
+async def _edit_message_content(context: ContextTypes.DEFAULT_TYPE, chat_id: int, message_id: int, message, caption_pipeline: CaptionPipeline, user_id: int = None):
+    """
+    Applies an edited source message to the target message it was forwarded as, re-rendered
+    with the task's caption pipeline. Only the text/caption is updated; replaced media is not
+    propagated. Returns True if the target message changed.
+    """
+    text = caption_pipeline.render(message)
+    rate_limit_args = {'user_id': user_id}
+    try:
+        if message.text:
+            if not text:
+                return False
+            await context.bot.edit_message_text(
                 chat_id=chat_id,
-                video=message.video.file_id,
-                caption=effective_caption,
-                parse_mode=ParseMode.HTML if effective_caption else None
+                message_id=message_id,
+                text=text,
+                parse_mode=ParseMode.HTML,
+                rate_limit_args=rate_limit_args
             )
-        elif message.document:
-            await context.bot.send_document(
+        else:
+            await context.bot.edit_message_caption(
                 chat_id=chat_id,
-                document=message.document.file_id,
-                caption=effective_caption,
-                parse_mode=ParseMode.HTML if effective_caption else None
+                message_id=message_id,
+                caption=text,
+                parse_mode=ParseMode.HTML if text else None,
+                rate_limit_args=rate_limit_args
             )
-        elif message.text:
-            text_to_send = ""
-            if not remove_original_caption:
-                text_to_send = original_text
-            
-            if custom_caption:
-                if text_to_send:
-                    text_to_send += "\n" + custom_caption
-                else:
-                    text_to_send = custom_caption
-            
-            if not text_to_send and not custom_caption:
-                 text_to_send = original_text if not remove_original_caption else None
-
-            if text_to_send:
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text=text_to_send,
-                    parse_mode=ParseMode.HTML
-                )
-        else:
-            logger.warning(f"Unsupported message type for forwarding: {message.message_id}")
-            return False
         return True
-    except Exception as e:
-        logger.error(f"Failed to send message content to {chat_id}: {e}")
-        if "chat not found" in str(e):
-             await context.bot.send_message(ADMIN_ID, f"⚠️ Error: Bot មិនអាចផ្ញើសារទៅ Target Channel <code>{chat_id}</code> បានទេ។ សូមប្រាកដថា Bot ជា Admin។", parse_mode=ParseMode.HTML)
-        return False
+    except BadRequest as e:
+        if "message is not modified" in str(e).lower():
+            return False
+        raise
 
-async def _send_message_content_by_id(context: ContextTypes.DEFAULT_TYPE, setting: dict):
+async def _notify_circuit_change(context: ContextTypes.DEFAULT_TYPE, chat_id: int, recovered: bool, error=None):
+    """Tells the owners of every task targeting chat_id (and the admin) that the target stopped or recovered. Sent once per state change."""
+    if recovered:
+        text = f"✅ Target Channel <code>{chat_id}</code> ដំណើរការវិញហើយ។ Bot បានបន្តការ Forward។"
+    else:
+        text = (f"⚠️ Bot មិនអាចផ្ញើសារទៅ Target Channel <code>{chat_id}</code> បានទេ ហើយបានផ្អាកការផ្ញើបណ្តោះអាសន្ន។\n"
+                f"សូមប្រាកដថា Bot ជា Admin។ Bot នឹងសាកល្បងម្តងទៀតដោយស្វ័យប្រវត្តិ។\nError: {error}")
+
+    recipients = set(get_task_owner_ids_by_target(chat_id))
+    recipients.add(ADMIN_ID)
+    for user_id in recipients:
+        try:
+            await context.bot.send_message(user_id, text, parse_mode=ParseMode.HTML)
+        except Exception as e:
+            logger.warning("Could not notify %s about target %s: %s", user_id, chat_id, e, extra={'user_id': user_id, 'target': chat_id})
+
+async def _send_message_content_by_id(context: ContextTypes.DEFAULT_TYPE, setting: dict, lane: str = BULK, dry_run: bool = False):
     """
     Fetches a message by ID and sends it using _send_message_content.
-    This is used for ID Range tasks.
+    This is used for ID Range tasks, which go through the bulk send lane.
+    Messages rejected by the task's filter rules return FILTERED.
+    While the target's circuit breaker is open nothing is fetched or sent and CIRCUIT_OPEN is returned.
+    SOURCE_UNAVAILABLE means the source can't be read (bot removed, chat gone), False any other failure.
+    With dry_run the message is only fetched and filtered: True means it would be sent.
     """
     target_id = setting['target_channel_id']
     source_id = setting['source_channel_id']
     message_id = setting['current_message_id']
-    custom_caption = setting['custom_caption']
-    remove_tags = setting['remove_tags_caption']
-    
+
+    if not dry_run and not allow_send(target_id):
+        logger.info("Circuit open for %s, skipping task %s", target_id, setting['id'], extra={'task_id': setting['id'], 'target': target_id})
+        return CIRCUIT_OPEN
+    # Until the send below runs, a half-open probe granted by allow_send() must be given back
+    probe_pending = not dry_run
+
     try:
         # We must forward the message (e.g., to admin) to get the message object
         temp_forward_message = await context.bot.forward_message(
             chat_id=ADMIN_ID, # Forward to admin
             from_chat_id=source_id,
-            message_id=message_id
+            message_id=message_id,
+            rate_limit_args={'user_id': setting['user_id'], 'lane': lane}
         )
 
-        success = await _send_message_content(
-            context,
-            target_id,
-            temp_forward_message, # Use the forwarded message object
-            custom_caption,
-            remove_tags
-        )
+        filter_rules = setting.get('filter_rules') or {}
+        if filter_rules and not get_task_matcher(setting).match(temp_forward_message):
+            success = FILTERED
+        elif dry_run:
+            success = True
+        else:
+            probe_pending = False
+            success = await _send_message_content(
+                context,
+                target_id,
+                temp_forward_message, # Use the forwarded message object
+                setting_id=setting['id'],
+                user_id=setting['user_id'],
+                lane=lane,
+                dedup_enabled=setting['dedup_enabled'],
+                caption_pipeline=get_caption_pipeline(setting),
+                source_ref=(source_id, message_id),
+                circuit_checked=True
+            )
 
         # Delete the temporary message from admin's chat
         try:
@@ -126,8 +266,8 @@ async def _send_message_content_by_id(context: ContextTypes.DEFAULT_TYPE, settin
         
         logger.error(f"Critical BadRequest in _send_message_content_by_id (Task {setting['id']}): {e}")
         if "chat not found" in error_message:
-             await context.bot.send_message(ADMIN_ID, f"⚠️ Task {setting['id']} Error: Bot មិនអាចអានពី Source Channel <code>{source_id}</code> បានទេ។ សូមប្រាកដថា Bot ជា Admin។", parse_mode=ParseMode.HTML)
-        return False
+            await notify_failure(context.bot, ADMIN_ID, setting['id'], e, message_id)
+        return SOURCE_UNAVAILABLE if is_permanent_error(e) else False
 
     except Exception as e:
         logger.error(f"Error in _send_message_content_by_id (Task {setting['id']}): {e}")
@@ -135,8 +275,59 @@ async def _send_message_content_by_id(context: ContextTypes.DEFAULT_TYPE, settin
             logger.warning(f"Task {setting['id']}: Message {message_id} in {source_id} not found. Skipping.")
             return 'not_found'
         if "chat not found" in str(e):
-             await context.bot.send_message(ADMIN_ID, f"⚠️ Task {setting['id']} Error: Bot មិនអាចអានពី Source Channel <code>{source_id}</code> បានទេ។ សូមប្រាកដថា Bot ជា Admin។", parse_mode=ParseMode.HTML)
-        return False
+            await notify_failure(context.bot, ADMIN_ID, setting['id'], e, message_id)
+        return SOURCE_UNAVAILABLE if is_permanent_error(e) else False
+
+    finally:
+        if probe_pending:
+            release_probe(target_id)
+
+def needs_per_message_copy(setting: dict) -> bool:
+    """True if the task's caption, filter or dedup rules need each message's content, so batched copies can't be used."""
+    return bool(setting['custom_caption'] or setting.get('caption_rules') or setting.get('filter_rules') or setting['dedup_enabled'])
+
+async def _copy_message_batch(context: ContextTypes.DEFAULT_TYPE, setting: dict, message_ids: list, lane: str = BULK):
+    """
+    Copies source message ids (increasing, at most 100) to the task's target with one copyMessages call.
+    Ids that don't exist or can't be copied are skipped by Telegram. Only for tasks where
+    needs_per_message_copy() is False: the original caption is kept or dropped as a whole.
+    Returns the number of messages copied, or None if the target's circuit breaker is open.
+    API errors are raised to the caller.
+    """
+    target_id = setting['target_channel_id']
+    source_id = setting['source_channel_id']
+    if not allow_send(target_id):
+        logger.info("Circuit open for %s, skipping batch copy", target_id, extra={'task_id': setting['id'], 'target': target_id})
+        return None
+
+    started_at = time.perf_counter()
+    try:
+        copied = await context.bot.copy_messages(
+            chat_id=target_id,
+            from_chat_id=source_id,
+            message_ids=message_ids,
+            remove_caption=bool(setting['remove_tags_caption']),
+            rate_limit_args={'user_id': setting['user_id'], 'lane': lane}
+        )
+    except RetryAfter:
+        FLOOD_WAITS.inc()
+        release_probe(target_id)
+        raise
+    except Exception as e:
+        BOT_API_ERRORS.labels(type(e).__name__).inc()
+        forward_log.log_forward(setting['id'], (source_id, message_ids[0]), target_id, 'failed', error=e)
+        if record_failure(target_id, e) == OPEN:
+            await _notify_circuit_change(context, target_id, recovered=False, error=e)
+        raise
+    finally:
+        SEND_LATENCY.labels("batch").observe(time.perf_counter() - started_at)
+
+    if record_success(target_id):
+        await _notify_circuit_change(context, target_id, recovered=True)
+    # Telegram does not say which source ids were copied, only the new target ids
+    for message_id in copied:
+        forward_log.log_forward(setting['id'], (source_id, None), target_id, 'forwarded', target_message_id=message_id.message_id)
+    return len(copied)
 
 async def validate_channel_id(update: Update, context: ContextTypes.DEFAULT_TYPE, next_state: int):
     """Helper to validate channel ID and move to next state."""
@@ -167,3 +358,86 @@ async def validate_channel_id(update: Update, context: ContextTypes.DEFAULT_TYPE
         logger.error(f"Error in validate_channel_id: {e}")
         await update.message.reply_html(f"<b>⚠️ មានបញ្ហា៖</b> {e}")
         return None, None
+
+async def check_channels(context: ContextTypes.DEFAULT_TYPE, channel_ids) -> dict:
+    """
+    Checks several channel ids concurrently (at most CHANNEL_CHECK_CONCURRENCY getChat calls at once),
+    each id once. Returns {channel_id: None if usable, else the reason it isn't}.
+    """
+    semaphore = asyncio.Semaphore(CHANNEL_CHECK_CONCURRENCY)
+
+    async def check(channel_id):
+        if channel_id >= 0:
+            return "ID ត្រូវតែជាលេខអវិជ្ជមាន"
+        async with semaphore:
+            try:
+                chat = await context.bot.get_chat(channel_id)
+            except Exception as e:
+                return f"មិនអាចផ្ទៀងផ្ទាត់បានទេ ({e})"
+        if chat.type not in ['channel', 'supergroup']:
+            return "មិនមែនជា Channel ឬ Group ទេ"
+        return None
+
+    unique_ids = list(dict.fromkeys(channel_ids))
+    results = await asyncio.gather(*(check(channel_id) for channel_id in unique_ids))
+    return dict(zip(unique_ids, results))
+
+# --- Task list pagination ---
+# Cursors are encoded in callback data as "n<id>" (tasks after id) or "p<id>" (tasks before id),
+# so every page is fetched with a keyset query instead of loading all of the user's tasks.
+
+def cursor_from_callback(data: str, prefix: str) -> str:
+    """Extracts the page cursor from callback data like 'manage_page_n42'. Defaults to the first page."""
+    if data and data.startswith(prefix):
+        cursor = data[len(prefix):]
+        if cursor[:1] in ('n', 'p') and cursor[1:].isdigit():
+            return cursor
+    return "n0"
+
+def get_settings_page(user_id: int, cursor: str = "n0"):
+    """
+    Fetches one page of the user's tasks for the given cursor.
+    Returns (settings, has_prev, has_next).
+    """
+    direction, cursor_id = cursor[0], int(cursor[1:])
+    limit = TASKS_PAGE_SIZE
+
+    if direction == 'p':
+        rows = get_user_forward_settings_page(user_id, before_id=cursor_id, limit=limit)
+        has_prev = len(rows) > limit
+        page = rows[1:] if has_prev else rows
+        if not page:
+            return get_settings_page(user_id, "n0")
+        return page, has_prev, True
+
+    rows = get_user_forward_settings_page(user_id, after_id=cursor_id, limit=limit)
+    page = rows[:limit]
+    if not page and cursor_id > 0:
+        # The tail of the list was deleted, show the last remaining page instead
+        return get_settings_page(user_id, f"p{cursor_id + 1}")
+    return page, cursor_id > 0, len(rows) > limit
+
+def build_page_nav_row(prefix: str, settings, has_prev: bool, has_next: bool):
+    """Builds the Previous/Next buttons for a page of tasks (empty list if there is only one page)."""
+    row = []
+    if has_prev:
+        row.append(InlineKeyboardButton("⬅️ មុន", callback_data=f"{prefix}p{settings[0]['id']}"))
+    if has_next:
+        row.append(InlineKeyboardButton("បន្ទាប់ ➡️", callback_data=f"{prefix}n{settings[-1]['id']}"))
+    return row
+
+def format_task_stats(stats) -> str:
+    """Formats a task's delivery counters as status lines (empty string if nothing was recorded yet)."""
+    if not stats:
+        return ""
+    throughput, error_rate, avg_latency_ms = summarize(stats)
+    text = (
+        f"  <b>- ស្ថិតិ:</b> ✅ {stats.get('forwarded_count') or 0} | ⏭️ {stats.get('skipped_count') or 0} "
+        f"| ❌ {stats.get('failed_count') or 0} | 🔁 {stats.get('retry_count') or 0}\n"
+        f"  <b>- Throughput:</b> {throughput:.1f} សារ/ម៉ោង | Error: {error_rate:.1f}% | Latency: {avg_latency_ms:.0f} ms\n"
+    )
+    deduplicated = stats.get('deduplicated_count') or 0
+    if deduplicated:
+        hit_rate = deduplicated / (deduplicated + (stats.get('forwarded_count') or 0)) * 100
+        text += f"  <b>- សារស្ទួនបានរំលង:</b> ♻️ {deduplicated} ({hit_rate:.1f}%)\n"
+    return text
@@ -1,3 +1,4 @@
+import html
 import logging
 import re
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
@@ -12,17 +13,31 @@ from telegram.ext import (
 from telegram.constants import ParseMode
 
 from ..core.database import (
-    get_user_forward_settings,
     get_setting_by_id,
-    add_forward_setting,
+    get_user_forward_settings,
+    add_forward_settings,
     update_setting_active,
     update_setting_caption,
     update_setting_remove_tags,
+    update_setting_dedup,
+    update_setting_filter_rules,
+    update_setting_caption_rules,
     delete_setting_by_id
 )
-from .helpers import validate_channel_id
+from ..core.routing import invalidate_routes
+from ..core.filters import parse_rules_text, format_rules, normalize_rules, invalidate_task_matcher
+from ..core.captions import (
+    parse_caption_rules_text,
+    format_caption_rules,
+    normalize_caption_rules,
+    invalidate_caption_pipeline
+)
+from ..core.config import TASK_MAX_TARGETS, TASK_IMPORT_MAX_FILE_SIZE
+from ..core.task_io import export_tasks, parse_tasks_file
+from .helpers import validate_channel_id, check_channels, cursor_from_callback, get_settings_page, build_page_nav_row, TASK_TYPE_LABELS
 from .start import start, back_to_main_menu
-from ..jobs import stop_job_for_task, schedule_id_range_task
+from ..core import catch_up
+from ..jobs import stop_job_for_task, schedule_id_range_task, schedule_catch_up_task, schedule_tasks
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +45,11 @@ logger = logging.getLogger(__name__)
 (SELECT_FORWARD_OPTION, SELECT_TASK_TYPE, ADD_SOURCE_CHANNEL, ADD_TARGET_CHANNEL, 
  SET_CUSTOM_CAPTION, CONFIRM_REMOVE_CAPTION, PROMPT_START_ID, PROMPT_END_ID, 
  PROMPT_EVERY_N, PROMPT_INTERVAL, MANAGE_TASKS_MENU,
- EDIT_CAPTION_PROMPT, TOGGLE_REMOVE_CAPTION_MENU) = range(13)
+ EDIT_CAPTION_PROMPT, TOGGLE_REMOVE_CAPTION_MENU, TOGGLE_DEDUP_MENU,
+ FILTER_MENU, EDIT_FILTER_PROMPT, EDIT_CAPTION_TEXT,
+ CAPTION_RULES_MENU, EDIT_CAPTION_RULES_PROMPT, IMPORT_TASKS_PROMPT) = range(20)
+
+CAPTION_PLACEHOLDERS_HELP = """Caption អាចប្រើ Placeholder៖ <code>{source_title}</code> (ឈ្មោះ Channel ប្រភព), <code>{source_id}</code>, <code>{message_id}</code>, <code>{date}</code>, <code>{time}</code> (UTC)។"""
 
 # --- Settings Conversation ---
 
@@ -41,7 +60,13 @@ async def settings_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         [InlineKeyboardButton("🔧 គ្រប់គ្រង Tasks (Pause/Resume/Delete)", callback_data="manage_tasks_menu")],
         [InlineKeyboardButton("📝 កែ Caption", callback_data="edit_caption_menu")],
         [InlineKeyboardButton("🗑️ បើក/បិទ លុប Caption ដើម", callback_data="toggle_remove_caption_menu")],
+        [InlineKeyboardButton("✂️ កែច្នៃ Caption ដើម", callback_data="caption_rules_menu")],
+        [InlineKeyboardButton("♻️ បើក/បិទ ការពារសារស្ទួន", callback_data="toggle_dedup_menu")],
+        [InlineKeyboardButton("🔎 Filter សារ", callback_data="filter_menu")],
         [InlineKeyboardButton("👁️ មើល Tasks បច្ចុប្បន្ន", callback_data="view_current_settings")],
+        [InlineKeyboardButton("📤 Export (JSON)", callback_data="export_tasks_json"),
+         InlineKeyboardButton("📤 Export (CSV)", callback_data="export_tasks_csv")],
+        [InlineKeyboardButton("📥 Import Tasks", callback_data="import_tasks")],
         [InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_main")]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -61,6 +86,7 @@ async def prompt_task_type(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     keyboard = [
         [InlineKeyboardButton("Auto Forward សារថ្មីៗ", callback_data="task_new_messages")],
         [InlineKeyboardButton("Forward តាម ID Range", callback_data="task_id_range")],
+        [InlineKeyboardButton("Backfill + Auto Forward", callback_data="task_catch_up")],
         [InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_settings")]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -70,7 +96,8 @@ async def prompt_task_type(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 សូមជ្រើសរើសប្រភេទ Task ដែលអ្នកចង់បង្កើត៖
 
 1.  <b>Auto Forward សារថ្មីៗ:</b> Bot នឹងពិនិត្យ និង Forward សារថ្មីៗដោយស្វ័យប្រវត្តិ (តាមរយៈ Webhook)។
-2.  <b>Forward តាម ID Range:</b> Bot នឹង Forward សារចាស់ៗ ដោយផ្អែកលើ ID ចាប់ផ្តើម និង ID បញ្ចប់ ដែលអ្នកកំណត់ (តាមរយៈ Job)។""",
+2.  <b>Forward តាម ID Range:</b> Bot នឹង Forward សារចាស់ៗ ដោយផ្អែកលើ ID ចាប់ផ្តើម និង ID បញ្ចប់ ដែលអ្នកកំណត់ (តាមរយៈ Job)។
+3.  <b>Backfill + Auto Forward:</b> Bot នឹងចម្លងសារចាស់ៗចាប់ពី ID ដែលអ្នកកំណត់ រហូតដល់សារចុងក្រោយ រួចបន្ត Forward សារថ្មីៗដោយស្វ័យប្រវត្តិ (គ្មានសារបាត់ ឬស្ទួន)។""",
         reply_markup=reply_markup,
         parse_mode=ParseMode.HTML
     )
@@ -80,7 +107,7 @@ async def receive_task_type(update: Update, context: ContextTypes.DEFAULT_TYPE)
     """Receives task type and prompts for source channel."""
     query = update.callback_query
     await query.answer()
-    context.user_data['task_type'] = query.data.replace("task_", "") # 'new_messages' or 'id_range'
+    context.user_data['task_type'] = query.data.replace("task_", "") # 'new_messages', 'id_range' or 'catch_up'
     
     await query.edit_message_text(
         """<b>➕ បន្ថែម Channel ប្រភព</b>
@@ -103,22 +130,42 @@ async def receive_source_channel(update: Update, context: ContextTypes.DEFAULT_T
         f"""✅ បានទទួល Source Channel ID: <code>{source_id}</code>។
 
 <b>➡️ ឥឡូវសូមផ្ញើ ID របស់ Channel គោលដៅ (Target Channel ID)។</b>
-<b>សំខាន់:</b> Bot ត្រូវតែជា Admin នៅក្នុង Channel នោះ។"""
+អាចផ្ញើ ID ច្រើន (រហូតដល់ {TASK_MAX_TARGETS}) ដោយដាក់ដកឃ្លា ឬសញ្ញាក្បៀស ដើម្បីបង្កើត Task មួយសម្រាប់ Channel គោលដៅនីមួយៗ។
+<b>សំខាន់:</b> Bot ត្រូវតែជា Admin នៅក្នុង Channel ទាំងនោះ។"""
     )
     return ADD_TARGET_CHANNEL
 
 async def receive_target_channel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Receives target channel ID."""
-    target_id, next_state = await validate_channel_id(update, context, SET_CUSTOM_CAPTION)
-    if not target_id:
+    """Receives one or more target channel IDs; one task is created per target."""
+    try:
+        target_ids = list(dict.fromkeys(int(part) for part in re.split(r"[\s,]+", update.message.text.strip()) if part))
+    except ValueError:
+        await update.message.reply_html("<b>⚠️ ID Channel មិនត្រឹមត្រូវទេ។</b> សូមផ្ញើ ID ជាលេខ។")
         return ADD_TARGET_CHANNEL
-    
-    context.user_data['target_channel_id'] = target_id
+    if not target_ids or len(target_ids) > TASK_MAX_TARGETS:
+        await update.message.reply_html(f"<b>⚠️ សូមផ្ញើ ID Channel គោលដៅពី 1 ដល់ {TASK_MAX_TARGETS}។</b>")
+        return ADD_TARGET_CHANNEL
+
+    # All targets are checked at once instead of one getChat round trip after another
+    errors = {channel_id: error for channel_id, error in (await check_channels(context, target_ids)).items() if error}
+    if errors:
+        lines = "\n".join(f"• <code>{channel_id}</code>: {html.escape(error)}" for channel_id, error in errors.items())
+        await update.message.reply_html(
+            f"""<b>⚠️ Channel ខាងក្រោមមិនអាចប្រើបានទេ៖</b>
+{lines}
+
+សូមប្រាកដថា ID ត្រឹមត្រូវ ហើយ Bot ជា Admin រួចផ្ញើ ID ម្តងទៀត។"""
+        )
+        return ADD_TARGET_CHANNEL
+
+    context.user_data['target_channel_ids'] = target_ids
+    targets_text = ", ".join(f"<code>{target_id}</code>" for target_id in target_ids)
     await update.message.reply_html(
-        f"""✅ បានទទួល Target Channel ID: <code>{target_id}</code>។
+        f"""✅ បានទទួល Target Channel ID: {targets_text}។
 
 <b>📝 ឥឡូវនេះ សូមផ្ញើ Caption ផ្ទាល់ខ្លួន។</b>
 អ្នកអាចប្រើ HTML tags (<b>Bold</b>, <i>Italic</i>, <a href='URL'>Link</a>)។
+{CAPTION_PLACEHOLDERS_HELP}
 ប្រសិនបើមិនចង់បាន Caption ផ្ទាល់ខ្លួនទេ សូមវាយ <code>none</code> ។"""
     )
     return SET_CUSTOM_CAPTION
@@ -148,7 +195,17 @@ async def confirm_remove_caption(update: Update, context: ContextTypes.DEFAULT_T
     
     task_type = context.user_data['task_type']
     
-    if task_type == 'id_range':
+    if task_type == 'catch_up':
+        await query.edit_message_text(
+            """<b>🗓️ កំណត់ Backfill</b>
+
+<b>➡️ សូមផ្ញើ ID របស់សារចាស់ដែលត្រូវចាប់ផ្តើមចម្លង (Start Message ID)។</b>
+Bot នឹងចម្លងពី ID នេះរហូតដល់សារចុងក្រោយ រួចបន្តទៅ Forward សារថ្មីៗ។
+(ឧទាហរណ៍: <code>1</code>)""",
+            parse_mode=ParseMode.HTML
+        )
+        return PROMPT_START_ID
+    elif task_type == 'id_range':
         await query.edit_message_text(
             """<b>🗓️ កំណត់ ID Range</b>
 
@@ -171,6 +228,11 @@ async def receive_start_id(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             return PROMPT_START_ID
         
         context.user_data['start_message_id'] = start_id
+        if context.user_data.get('task_type') == 'catch_up':
+            # No end id or interval: the backfill runs up to the live head, then follows new posts
+            context.user_data['interval_seconds'] = 0
+            return await save_new_task(update, context)
+
         await update.message.reply_html(
             f"""✅ ID ចាប់ផ្តើម: <code>{start_id}</code>
 
@@ -246,7 +308,7 @@ async def receive_interval_and_save(update: Update, context: ContextTypes.DEFAUL
         return PROMPT_INTERVAL
 
 async def save_new_task(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Saves the new task (both types) to the DB and schedules if needed."""
+    """Saves the new task (all types, one per target channel) to the DB and schedules if needed."""
     try:
         # Determine the user ID from callback or message
         user_id = update.effective_user.id
@@ -255,7 +317,6 @@ async def save_new_task(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         data = {
             'user_id': user_id,
             'source_channel_id': context.user_data['source_channel_id'],
-            'target_channel_id': context.user_data['target_channel_id'],
             'custom_caption': context.user_data['custom_caption'],
             'remove_tags_caption': context.user_data['remove_tags_caption'],
             'task_type': context.user_data['task_type'],
@@ -265,15 +326,21 @@ async def save_new_task(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
             'forward_every_n_posts': context.user_data.get('forward_every_n_posts', 1)
         }
         
-        # Save to DB
-        setting_id = add_forward_setting(data)
+        # Save to DB: one row per target, in one INSERT
+        created = add_forward_settings([
+            {**data, 'target_channel_id': target_id} for target_id in context.user_data['target_channel_ids']
+        ])
+        invalidate_routes()
         
-        reply_message = f"<b>✅ Task #{setting_id} ត្រូវបានបង្កើត!</b>"
+        task_ids = ", ".join(f"#{row['id']}" for row in created)
+        reply_message = f"<b>✅ Task {task_ids} ត្រូវបានបង្កើត!</b>"
         
-        # Schedule the job ONLY if it's an 'id_range' task
+        # Schedule a job for 'id_range' tasks and for the backfill of 'catch_up' tasks
+        schedule_tasks(context.job_queue, created)
         if data['task_type'] == 'id_range':
-            schedule_id_range_task(context.job_queue, setting_id, data['interval_seconds'])
             reply_message += "\nJob សម្រាប់ ID Range បានចាប់ផ្តើមដំណើរការ។"
+        elif data['task_type'] == 'catch_up':
+            reply_message += "\nBot កំពុងចម្លងសារចាស់ៗ ហើយនឹងប្រាប់អ្នកនៅពេលវាចាប់ផ្តើម Forward សារថ្មីៗ។"
         else:
             reply_message += "\nBot នឹងចាប់ផ្តើមស្តាប់សារថ្មីៗពី Channel នេះ។"
 
@@ -303,6 +370,88 @@ async def save_new_task(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         return ConversationHandler.END
 
 
+# --- Export / Import Tasks ---
+
+async def export_user_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Sends the user's tasks as a JSON or CSV file (menu buttons, or /export_tasks [csv])."""
+    query = update.callback_query
+    if query:
+        await query.answer()
+        fmt = query.data.replace("export_tasks_", "")
+    else:
+        fmt = 'csv' if context.args and context.args[0].lower() == 'csv' else 'json'
+
+    user_id = update.effective_user.id
+    settings = sorted(get_user_forward_settings(user_id), key=lambda setting: setting['id'])
+    if not settings:
+        await update.effective_message.reply_html("អ្នកមិនទាន់មាន Task ណាមួយទេ។")
+        return SELECT_FORWARD_OPTION
+
+    await context.bot.send_document(
+        chat_id=user_id,
+        document=export_tasks(settings, fmt),
+        filename=f"tasks-{user_id}.{fmt}",
+        caption=f"📤 Tasks ចំនួន {len(settings)}។ អាចកែ File នេះ ហើយ Import វាវិញតាម '📥 Import Tasks'។"
+    )
+    return SELECT_FORWARD_OPTION
+
+async def prompt_import_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Asks for a JSON / CSV task file (menu button, or /import_tasks)."""
+    message_text = """<b>📥 Import Tasks</b>
+
+សូមផ្ញើ File <code>.json</code> ឬ <code>.csv</code> (ទម្រង់ដូច File ដែល Export ពី Bot)។
+Task ទាំងអស់ក្នុង File នឹងត្រូវបង្កើតក្នុងពេលតែមួយ ឬមិនបង្កើតទាល់តែសោះ ប្រសិនបើមានបញ្ហា។"""
+    if update.callback_query:
+        await update.callback_query.answer()
+        await update.callback_query.edit_message_text(message_text, parse_mode=ParseMode.HTML)
+    else:
+        await update.message.reply_html(message_text)
+    return IMPORT_TASKS_PROMPT
+
+async def import_tasks_file(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Validates every row of the uploaded file (channels checked concurrently), then creates all tasks with one INSERT."""
+    document = update.message.document
+    if document.file_size and document.file_size > TASK_IMPORT_MAX_FILE_SIZE:
+        await update.message.reply_html(f"<b>⚠️ File ធំពេក។</b> ទំហំអតិបរមា {TASK_IMPORT_MAX_FILE_SIZE // 1024} KB។")
+        return IMPORT_TASKS_PROMPT
+
+    telegram_file = await document.get_file()
+    content = bytes(await telegram_file.download_as_bytearray())
+    try:
+        rows = parse_tasks_file(document.file_name, content)
+    except ValueError as e:
+        await update.message.reply_html(f"<b>⚠️ File មិនត្រឹមត្រូវ៖</b> <code>{html.escape(str(e))}</code>\nសូមកែ ហើយផ្ញើម្តងទៀត។")
+        return IMPORT_TASKS_PROMPT
+
+    channel_ids = [row['source_channel_id'] for row in rows] + [row['target_channel_id'] for row in rows]
+    errors = {channel_id: error for channel_id, error in (await check_channels(context, channel_ids)).items() if error}
+    if errors:
+        lines = "\n".join(f"• <code>{channel_id}</code>: {html.escape(error)}" for channel_id, error in list(errors.items())[:10])
+        await update.message.reply_html(
+            f"""<b>⚠️ Channel {len(errors)} មិនអាចប្រើបានទេ៖</b>
+{lines}
+
+គ្មាន Task ណាមួយត្រូវបានបង្កើតទេ។ សូមកែ File ហើយផ្ញើម្តងទៀត។"""
+        )
+        return IMPORT_TASKS_PROMPT
+
+    user_id = update.effective_user.id
+    try:
+        created = add_forward_settings([{**row, 'user_id': user_id} for row in rows])
+    except Exception as e:
+        logger.error(f"Error importing {len(rows)} tasks for user {user_id}: {e}", exc_info=True)
+        await update.message.reply_html(f"<b>⚠️ មានបញ្ហាក្នុងការរក្សាទុក:</b> {html.escape(str(e))}")
+        return ConversationHandler.END
+    invalidate_routes()
+    scheduled = schedule_tasks(context.job_queue, [row for row in created if row['is_active']])
+    logger.info(f"User {user_id} imported {len(created)} tasks ({scheduled} jobs scheduled).")
+
+    await update.message.reply_html(
+        f"<b>✅ បាន Import Task ចំនួន {len(created)}</b> (#{created[0]['id']} ដល់ #{created[-1]['id']})។"
+    )
+    return ConversationHandler.END
+
+
 # --- Manage Other Settings (Edit Caption, Toggle Remove, View) ---
 
 async def view_current_settings(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -310,31 +459,45 @@ async def view_current_settings(update: Update, context: ContextTypes.DEFAULT_TY
     query = update.callback_query
     await query.answer()
     user_id = update.effective_user.id
-    settings = get_user_forward_settings(user_id)
+    cursor = cursor_from_callback(query.data, "view_page_")
+    settings, has_prev, has_next = get_settings_page(user_id, cursor)
 
     status_message = "<b>👁️ Tasks បច្ចុប្បន្នរបស់អ្នក:</b>\n"
     if not settings:
         status_message += "អ្នកមិនទាន់បានកំណត់ Task ណាមួយនៅឡើយទេ។"
     else:
-        for i, setting in enumerate(settings):
+        for setting in settings:
             task_type = setting.get('task_type', 'new_messages') 
             
             status_message += f"\n<b>✨ Task #{setting['id']}</b> ({'សកម្ម ✅' if setting['is_active'] else 'ផ្អាក ⏸️'})\n"
-            status_message += f"  <b>- ប្រភេទ:</b> {'សារថ្មីៗ' if task_type == 'new_messages' else 'តាម ID Range'}\n"
+            status_message += f"  <b>- ប្រភេទ:</b> {TASK_TYPE_LABELS.get(task_type, task_type)}\n"
             status_message += f"  <b>- Source:</b> <code>{setting['source_channel_id']}</code>\n"
             status_message += f"  <b>- Target:</b> <code>{setting['target_channel_id']}</code>\n"
             status_message += f"  <b>- Caption:</b> {setting['custom_caption'] or 'គ្មាន'}\n"
             status_message += f"  <b>- លុប Caption ដើម:</b> {'បាទ/ចាស' if setting['remove_tags_caption'] else 'ទេ'}\n"
+            status_message += f"  <b>- ការពារសារស្ទួន:</b> {'បើក' if setting['dedup_enabled'] else 'បិទ'}\n"
+            filter_rules = normalize_rules(setting['filter_rules'])
+            if filter_rules:
+                status_message += f"  <b>- Filter:</b> {html.escape(', '.join(filter_rules))}\n"
+            caption_rules = normalize_caption_rules(setting['caption_rules'])
+            if caption_rules:
+                status_message += f"  <b>- កែច្នៃ Caption:</b> {html.escape(', '.join(caption_rules))}\n"
             
             if task_type == 'id_range':
                 status_message += f"  <b>- Interval:</b> {setting.get('interval_seconds', 'N/A')} វិនាទី\n"
                 status_message += f"  <b>- ID Range:</b> <code>{setting.get('start_message_id', 0)}</code> ដល់ <code>{setting.get('end_message_id', 0)}</code>\n"
                 status_message += f"  <b>- ID បច្ចុប្បន្ន:</b> <code>{setting.get('current_message_id', 0)}</code>\n"
                 status_message += f"  <b>- ដំណើរការរាល់:</b> {setting.get('forward_every_n_posts', 1)} post\n"
+            elif task_type == 'catch_up' and not setting['catch_up_done']:
+                status_message += f"  <b>- Backfill:</b> ពី <code>{setting.get('start_message_id', 0)}</code>, ID បច្ចុប្បន្ន <code>{setting.get('current_message_id', 0)}</code>\n"
             else:
                 status_message += f"  <b>- សារចុងក្រោយ:</b> <code>{setting.get('last_processed_message_id', 0)}</code>\n"
 
-    keyboard = [[InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_settings")]]
+    keyboard = []
+    nav_row = build_page_nav_row("view_page_", settings, has_prev, has_next)
+    if nav_row:
+        keyboard.append(nav_row)
+    keyboard.append([InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_settings")])
     reply_markup = InlineKeyboardMarkup(keyboard)
     await query.edit_message_text(status_message, reply_markup=reply_markup, parse_mode=ParseMode.HTML)
     return SELECT_FORWARD_OPTION
@@ -343,7 +506,8 @@ async def set_custom_caption_menu(update: Update, context: ContextTypes.DEFAULT_
     """Prompts user to select a task to edit its caption."""
     query = update.callback_query
     await query.answer()
-    settings = get_user_forward_settings(update.effective_user.id)
+    cursor = cursor_from_callback(query.data, "caption_page_")
+    settings, has_prev, has_next = get_settings_page(update.effective_user.id, cursor)
     if not settings:
         await query.edit_message_text("អ្នកមិនទាន់មាន Task ណាមួយទេ។", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_settings")]]))
         return SELECT_FORWARD_OPTION
@@ -354,6 +518,9 @@ async def set_custom_caption_menu(update: Update, context: ContextTypes.DEFAULT_
         if len(caption_preview) > 20:
              caption_preview = caption_preview[:20] + "..."
         keyboard.append([InlineKeyboardButton(f"📝 Task #{setting['id']} (Caption: {caption_preview})", callback_data=f"edit_caption_{setting['id']}")])
+    nav_row = build_page_nav_row("caption_page_", settings, has_prev, has_next)
+    if nav_row:
+        keyboard.append(nav_row)
     keyboard.append([InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_settings")])
     reply_markup = InlineKeyboardMarkup(keyboard)
     await query.edit_message_text("<b>📝 កំណត់ Caption ផ្ទាល់ខ្លួន</b>\n\nសូមជ្រើសរើស Task ដែលអ្នកចង់កែ Caption៖", reply_markup=reply_markup, parse_mode=ParseMode.HTML)
@@ -371,12 +538,14 @@ async def prompt_edit_custom_caption(update: Update, context: ContextTypes.DEFAU
 
     await query.edit_message_text(
         f"""<b>📝 កំណត់ Caption ផ្ទាល់ខ្លួន (Task #{setting_id})</b>
-Caption បច្ចុប្បន្ន៖ <code>{current_caption}</code>
+Caption បច្ចុប្បន្ន៖ <code>{html.escape(current_caption)}</code>
+
+{CAPTION_PLACEHOLDERS_HELP}
 
 <b>➡️ សូមផ្ញើ Caption ថ្មី។</b> (វាយ <code>none</code> ដើម្បីលុប Caption)""",
         parse_mode=ParseMode.HTML
     )
-    return SET_CUSTOM_CAPTION # Re-use this state
+    return EDIT_CAPTION_TEXT
 
 async def save_edited_caption(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Saves the edited custom caption."""
@@ -389,6 +558,8 @@ async def save_edited_caption(update: Update, context: ContextTypes.DEFAULT_TYPE
         new_caption = ""
     
     update_setting_caption(setting_id, new_caption)
+    invalidate_routes()
+    invalidate_caption_pipeline(setting_id)
     
     await update.message.reply_html(f"✅ Caption សម្រាប់ Task #{setting_id} ត្រូវបានអាប់ដេត។")
     
@@ -400,7 +571,11 @@ async def toggle_remove_caption_menu(update: Update, context: ContextTypes.DEFAU
     """Shows menu to toggle remove_tags_caption for tasks."""
     query = update.callback_query
     await query.answer()
-    settings = get_user_forward_settings(update.effective_user.id)
+    # Stay on the same page when refreshing after a toggle
+    if query.data.startswith("toggle_page_") or query.data == "toggle_remove_caption_menu":
+        context.user_data['toggle_menu_cursor'] = cursor_from_callback(query.data, "toggle_page_")
+    cursor = context.user_data.get('toggle_menu_cursor', "n0")
+    settings, has_prev, has_next = get_settings_page(update.effective_user.id, cursor)
     if not settings:
         await query.edit_message_text("អ្នកមិនទាន់មាន Task ណាមួយទេ។", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_settings")]]))
         return SELECT_FORWARD_OPTION
@@ -409,6 +584,9 @@ async def toggle_remove_caption_menu(update: Update, context: ContextTypes.DEFAU
     for setting in settings:
         status_text = "បើក (កំពុងលុប)" if setting['remove_tags_caption'] else "បិទ (កំពុងរក្សាទុក)"
         keyboard.append([InlineKeyboardButton(f"⚙️ Task #{setting['id']} ({status_text})", callback_data=f"toggle_remove_{setting['id']}")])
+    nav_row = build_page_nav_row("toggle_page_", settings, has_prev, has_next)
+    if nav_row:
+        keyboard.append(nav_row)
     keyboard.append([InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_settings")])
     reply_markup = InlineKeyboardMarkup(keyboard)
     await query.edit_message_text("<b>🗑️ បើក/បិទ លុប Caption ដើម</b>\n\nសូមជ្រើសរើស Task ដើម្បីប្តូរការកំណត់៖", reply_markup=reply_markup, parse_mode=ParseMode.HTML)
@@ -424,6 +602,8 @@ async def execute_toggle_remove_caption(update: Update, context: ContextTypes.DE
     if setting:
         new_state = not setting['remove_tags_caption']
         update_setting_remove_tags(setting_id, new_state)
+        invalidate_routes()
+        invalidate_caption_pipeline(setting_id)
         await query.answer(
             f"✅ ការកំណត់សម្រាប់ Task #{setting_id} ត្រូវបានប្តូរទៅ {'បើក' if new_state else 'បិទ'}។",
             show_alert=True
@@ -435,6 +615,223 @@ async def execute_toggle_remove_caption(update: Update, context: ContextTypes.DE
     await toggle_remove_caption_menu(update, context)
     return TOGGLE_REMOVE_CAPTION_MENU
 
+async def toggle_dedup_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Shows menu to toggle duplicate content filtering for tasks."""
+    query = update.callback_query
+    await query.answer()
+    # Stay on the same page when refreshing after a toggle
+    if query.data.startswith("dedup_page_") or query.data == "toggle_dedup_menu":
+        context.user_data['dedup_menu_cursor'] = cursor_from_callback(query.data, "dedup_page_")
+    cursor = context.user_data.get('dedup_menu_cursor', "n0")
+    settings, has_prev, has_next = get_settings_page(update.effective_user.id, cursor)
+    if not settings:
+        await query.edit_message_text("អ្នកមិនទាន់មាន Task ណាមួយទេ។", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_settings")]]))
+        return SELECT_FORWARD_OPTION
+
+    keyboard = []
+    for setting in settings:
+        status_text = "បើក" if setting['dedup_enabled'] else "បិទ"
+        keyboard.append([InlineKeyboardButton(f"♻️ Task #{setting['id']} ({status_text})", callback_data=f"toggle_dedup_{setting['id']}")])
+    nav_row = build_page_nav_row("dedup_page_", settings, has_prev, has_next)
+    if nav_row:
+        keyboard.append(nav_row)
+    keyboard.append([InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_settings")])
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    await query.edit_message_text(
+        "<b>♻️ បើក/បិទ ការពារសារស្ទួន</b>\n\nពេលបើក Bot នឹងមិនផ្ញើរូបភាព/វីដេអូ/ឯកសារ ឬអត្ថបទដដែល "
+        "ទៅ Target ដដែលម្តងទៀតទេ។\n\nសូមជ្រើសរើស Task ដើម្បីប្តូរការកំណត់៖",
+        reply_markup=reply_markup, parse_mode=ParseMode.HTML
+    )
+    return TOGGLE_DEDUP_MENU
+
+async def execute_toggle_dedup(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Executes the toggle for dedup_enabled."""
+    query = update.callback_query
+    setting_id = int(query.data.replace("toggle_dedup_", ""))
+
+    setting = get_setting_by_id(setting_id)
+    if setting and setting['user_id'] == update.effective_user.id:
+        new_state = not setting['dedup_enabled']
+        update_setting_dedup(setting_id, new_state)
+        invalidate_routes()
+        await query.answer(
+            f"✅ ការពារសារស្ទួនសម្រាប់ Task #{setting_id} ត្រូវបាន{'បើក' if new_state else 'បិទ'}។",
+            show_alert=True
+        )
+    else:
+        await query.answer("⚠️ រកមិនឃើញ Task នេះទេ។", show_alert=True)
+
+    # Refresh the menu
+    await toggle_dedup_menu(update, context)
+    return TOGGLE_DEDUP_MENU
+
+
+# --- Filter Rules ---
+
+FILTER_RULES_HELP = """<b>ទម្រង់ Filter</b> (មួយបន្ទាត់មួយ Rule, មិនចាំបាច់ដាក់គ្រប់ Rule ទេ)៖
+<code>include: sale, promo</code> — ត្រូវមានពាក្យណាមួយ
+<code>exclude: spam, ads</code> — មិនត្រូវមានពាក្យទាំងនេះ
+<code>media: text, photo, video, document</code> — ប្រភេទសារដែលអនុញ្ញាត
+<code>min_length: 20</code> — ប្រវែងអត្ថបទ/Caption អប្បបរមា"""
+
+async def filter_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Shows the tasks with a summary of their filter rules."""
+    query = update.callback_query
+    await query.answer()
+    cursor = cursor_from_callback(query.data, "filter_page_")
+    settings, has_prev, has_next = get_settings_page(update.effective_user.id, cursor)
+    if not settings:
+        await query.edit_message_text("អ្នកមិនទាន់មាន Task ណាមួយទេ។", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_settings")]]))
+        return SELECT_FORWARD_OPTION
+
+    keyboard = []
+    for setting in settings:
+        rules = normalize_rules(setting['filter_rules'])
+        summary = ", ".join(rules) if rules else "គ្មាន"
+        keyboard.append([InlineKeyboardButton(f"🔎 Task #{setting['id']} (Filter: {summary})", callback_data=f"edit_filter_{setting['id']}")])
+    nav_row = build_page_nav_row("filter_page_", settings, has_prev, has_next)
+    if nav_row:
+        keyboard.append(nav_row)
+    keyboard.append([InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_settings")])
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    await query.edit_message_text("<b>🔎 Filter សារ</b>\n\nសូមជ្រើសរើស Task ដែលអ្នកចង់កំណត់ Filter៖", reply_markup=reply_markup, parse_mode=ParseMode.HTML)
+    return FILTER_MENU
+
+async def prompt_edit_filter(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Prompts for the new filter rules of a task."""
+    query = update.callback_query
+    await query.answer()
+    setting_id = int(query.data.replace("edit_filter_", ""))
+    setting = get_setting_by_id(setting_id)
+    if not setting or setting['user_id'] != update.effective_user.id:
+        await query.answer("⚠️ រកមិនឃើញ Task នេះទេ។", show_alert=True)
+        return FILTER_MENU
+    context.user_data['setting_to_edit_filter'] = setting_id
+
+    current_rules = format_rules(normalize_rules(setting['filter_rules'])) or "គ្មាន"
+    await query.edit_message_text(
+        f"""<b>🔎 Filter សារ (Task #{setting_id})</b>
+Filter បច្ចុប្បន្ន៖
+<pre>{html.escape(current_rules)}</pre>
+
+{FILTER_RULES_HELP}
+
+<b>➡️ សូមផ្ញើ Filter ថ្មី។</b> (វាយ <code>none</code> ដើម្បីលុប Filter ទាំងអស់)""",
+        parse_mode=ParseMode.HTML
+    )
+    return EDIT_FILTER_PROMPT
+
+async def save_filter_rules(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Parses and saves the filter rules typed by the user."""
+    setting_id = context.user_data.get('setting_to_edit_filter')
+    if not setting_id:
+        return ConversationHandler.END
+
+    text = update.message.text.strip()
+    if text.lower() == 'none':
+        rules = {}
+    else:
+        try:
+            rules = parse_rules_text(text)
+        except ValueError as e:
+            await update.message.reply_html(
+                f"<b>⚠️ Rule មិនត្រឹមត្រូវ៖</b> <code>{html.escape(str(e))}</code>\n\n{FILTER_RULES_HELP}"
+            )
+            return EDIT_FILTER_PROMPT
+
+    update_setting_filter_rules(setting_id, rules)
+    invalidate_routes()
+    invalidate_task_matcher(setting_id)
+    await update.message.reply_html(
+        f"✅ Filter សម្រាប់ Task #{setting_id} ត្រូវបានអាប់ដេត។\n<pre>{html.escape(format_rules(rules) or 'គ្មាន')}</pre>"
+    )
+    context.user_data.pop('setting_to_edit_filter', None)
+    return ConversationHandler.END
+
+
+# --- Caption Rules ---
+
+CAPTION_RULES_HELP = """<b>ទម្រង់ Rule</b> (មួយបន្ទាត់មួយ Rule) សម្រាប់ Task ដែលរក្សាទុក Caption ដើម៖
+<code>strip_hashtags: yes</code> — លុប #hashtag
+<code>strip_mentions: yes</code> — លុប @mention
+<code>strip_links: yes</code> — លុប Link
+<code>replace: pattern =&gt; អត្ថបទថ្មី</code> — ប្តូរអត្ថបទ (Regex, អតិបរមា 10 បន្ទាត់)"""
+
+async def caption_rules_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Shows the tasks with a summary of their caption rules."""
+    query = update.callback_query
+    await query.answer()
+    cursor = cursor_from_callback(query.data, "crules_page_")
+    settings, has_prev, has_next = get_settings_page(update.effective_user.id, cursor)
+    if not settings:
+        await query.edit_message_text("អ្នកមិនទាន់មាន Task ណាមួយទេ។", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_settings")]]))
+        return SELECT_FORWARD_OPTION
+
+    keyboard = []
+    for setting in settings:
+        rules = normalize_caption_rules(setting['caption_rules'])
+        summary = ", ".join(rules) if rules else "គ្មាន"
+        keyboard.append([InlineKeyboardButton(f"✂️ Task #{setting['id']} (Rule: {summary})", callback_data=f"edit_crules_{setting['id']}")])
+    nav_row = build_page_nav_row("crules_page_", settings, has_prev, has_next)
+    if nav_row:
+        keyboard.append(nav_row)
+    keyboard.append([InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_settings")])
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    await query.edit_message_text("<b>✂️ កែច្នៃ Caption ដើម</b>\n\nសូមជ្រើសរើស Task ដែលអ្នកចង់កំណត់៖", reply_markup=reply_markup, parse_mode=ParseMode.HTML)
+    return CAPTION_RULES_MENU
+
+async def prompt_edit_caption_rules(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Prompts for the new caption rules of a task."""
+    query = update.callback_query
+    await query.answer()
+    setting_id = int(query.data.replace("edit_crules_", ""))
+    setting = get_setting_by_id(setting_id)
+    if not setting or setting['user_id'] != update.effective_user.id:
+        await query.answer("⚠️ រកមិនឃើញ Task នេះទេ។", show_alert=True)
+        return CAPTION_RULES_MENU
+    context.user_data['setting_to_edit_caption_rules'] = setting_id
+
+    current_rules = format_caption_rules(normalize_caption_rules(setting['caption_rules'])) or "គ្មាន"
+    note = "" if not setting['remove_tags_caption'] else "\n⚠️ Task នេះកំពុងលុប Caption ដើម ដូច្នេះ Rule នឹងមិនមានប្រសិទ្ធភាពទេ រហូតដល់អ្នកបិទការលុប Caption ដើម។\n"
+    await query.edit_message_text(
+        f"""<b>✂️ កែច្នៃ Caption ដើម (Task #{setting_id})</b>
+Rule បច្ចុប្បន្ន៖
+<pre>{html.escape(current_rules)}</pre>
+{note}
+{CAPTION_RULES_HELP}
+
+<b>➡️ សូមផ្ញើ Rule ថ្មី។</b> (វាយ <code>none</code> ដើម្បីលុប Rule ទាំងអស់)""",
+        parse_mode=ParseMode.HTML
+    )
+    return EDIT_CAPTION_RULES_PROMPT
+
+async def save_caption_rules(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Parses and saves the caption rules typed by the user."""
+    setting_id = context.user_data.get('setting_to_edit_caption_rules')
+    if not setting_id:
+        return ConversationHandler.END
+
+    text = update.message.text.strip()
+    if text.lower() == 'none':
+        rules = {}
+    else:
+        try:
+            rules = parse_caption_rules_text(text)
+        except ValueError as e:
+            await update.message.reply_html(
+                f"<b>⚠️ Rule មិនត្រឹមត្រូវ៖</b> <code>{html.escape(str(e))}</code>\n\n{CAPTION_RULES_HELP}"
+            )
+            return EDIT_CAPTION_RULES_PROMPT
+
+    update_setting_caption_rules(setting_id, rules)
+    invalidate_routes()
+    invalidate_caption_pipeline(setting_id)
+    await update.message.reply_html(
+        f"✅ Rule Caption សម្រាប់ Task #{setting_id} ត្រូវបានអាប់ដេត។\n<pre>{html.escape(format_caption_rules(rules) or 'គ្មាន')}</pre>"
+    )
+    context.user_data.pop('setting_to_edit_caption_rules', None)
+    return ConversationHandler.END
+
 
 # --- Manage Tasks (Pause, Resume, Delete) ---
 
@@ -443,7 +840,11 @@ async def manage_tasks_menu(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     await query.answer()
     user_id = update.effective_user.id
-    settings = get_user_forward_settings(user_id)
+    # Stay on the same page when refreshing after Pause/Resume/Delete
+    if query.data.startswith("manage_page_") or query.data == "manage_tasks_menu":
+        context.user_data['manage_tasks_cursor'] = cursor_from_callback(query.data, "manage_page_")
+    cursor = context.user_data.get('manage_tasks_cursor', "n0")
+    settings, has_prev, has_next = get_settings_page(user_id, cursor)
 
     if not settings:
         await query.edit_message_text("អ្នកមិនទាន់មាន Task ណាមួយទេ។", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_settings")]]))
@@ -458,6 +859,9 @@ async def manage_tasks_menu(update: Update, context: ContextTypes.DEFAULT_TYPE)
             InlineKeyboardButton(f"{status_icon} {status_text}", callback_data=f"task_toggle_{setting['id']}"),
             InlineKeyboardButton("❌ Delete", callback_data=f"task_delete_{setting['id']}")
         ])
+    nav_row = build_page_nav_row("manage_page_", settings, has_prev, has_next)
+    if nav_row:
+        keyboard.append(nav_row)
     keyboard.append([InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_settings")])
     reply_markup = InlineKeyboardMarkup(keyboard)
     
@@ -497,23 +901,32 @@ async def manage_task_action(update: Update, context: ContextTypes.DEFAULT_TYPE)
         if setting['is_active']:
             # Pause the task
             update_setting_active(setting_id, False)
-            if setting['task_type'] == 'id_range':
+            invalidate_routes()
+            if setting['task_type'] in ('id_range', 'catch_up'):
                 stop_job_for_task(context, setting_id)
+            catch_up.reset(setting_id)
             await query.answer(f"✅ Task #{setting_id} ត្រូវបានផ្អាក (Paused)។", show_alert=True)
         else:
             # Resume the task
             update_setting_active(setting_id, True)
+            invalidate_routes()
             if setting['task_type'] == 'id_range':
                 schedule_id_range_task(context.job_queue, setting_id, setting['interval_seconds'])
+            elif setting['task_type'] == 'catch_up' and not setting['catch_up_done']:
+                schedule_catch_up_task(context.job_queue, setting_id)
             await query.answer(f"✅ Task #{setting_id} ត្រូវបានបន្ត (Resumed)។", show_alert=True)
             
     elif action == "task_delete":
         # Delete the task
         setting = get_setting_by_id(setting_id)
-        if setting and setting['task_type'] == 'id_range':
+        if setting and setting['task_type'] in ('id_range', 'catch_up'):
             stop_job_for_task(context, setting_id)
+        catch_up.reset(setting_id)
         
         delete_setting_by_id(setting_id)
+        invalidate_routes()
+        invalidate_caption_pipeline(setting_id)
+        invalidate_task_matcher(setting_id)
         await query.answer(f"✅ Task #{setting_id} ត្រូវបានលុប។", show_alert=True)
         
     elif action == "task_info":
@@ -530,7 +943,9 @@ def get_settings_conv_handler() -> ConversationHandler:
     return ConversationHandler(
         entry_points=[
             MessageHandler(filters.Regex("^ការកំណត់ Bot ⚙️$"), settings_menu),
-            CallbackQueryHandler(settings_menu, pattern="^back_to_settings$")
+            CallbackQueryHandler(settings_menu, pattern="^back_to_settings$"),
+            CommandHandler("export_tasks", export_user_tasks),
+            CommandHandler("import_tasks", prompt_import_tasks),
         ],
         states={
             SELECT_FORWARD_OPTION: [
@@ -538,23 +953,28 @@ def get_settings_conv_handler() -> ConversationHandler:
                 CallbackQueryHandler(manage_tasks_menu, pattern="^manage_tasks_menu$"),
                 CallbackQueryHandler(set_custom_caption_menu, pattern="^edit_caption_menu$"),
                 CallbackQueryHandler(toggle_remove_caption_menu, pattern="^toggle_remove_caption_menu$"),
+                CallbackQueryHandler(toggle_dedup_menu, pattern="^toggle_dedup_menu$"),
+                CallbackQueryHandler(filter_menu, pattern="^filter_menu$"),
+                CallbackQueryHandler(caption_rules_menu, pattern="^caption_rules_menu$"),
                 CallbackQueryHandler(view_current_settings, pattern="^view_current_settings$"),
+                CallbackQueryHandler(view_current_settings, pattern="^view_page_"),
+                CallbackQueryHandler(export_user_tasks, pattern="^export_tasks_(json|csv)$"),
+                CallbackQueryHandler(prompt_import_tasks, pattern="^import_tasks$"),
                 CallbackQueryHandler(back_to_main_menu, pattern="^back_to_main$"),
             ],
             MANAGE_TASKS_MENU: [
                 CallbackQueryHandler(manage_task_action, pattern=re.compile("^(task_toggle_|task_delete_|task_info_)")),
+                CallbackQueryHandler(manage_tasks_menu, pattern="^manage_page_"),
                 CallbackQueryHandler(settings_menu, pattern="^back_to_settings$"),
             ],
             SELECT_TASK_TYPE: [
-                CallbackQueryHandler(receive_task_type, pattern=re.compile("^(task_new_messages|task_id_range)$")),
+                CallbackQueryHandler(receive_task_type, pattern=re.compile("^(task_new_messages|task_id_range|task_catch_up)$")),
                 CallbackQueryHandler(settings_menu, pattern="^back_to_settings$"),
             ],
             ADD_SOURCE_CHANNEL: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_source_channel)],
             ADD_TARGET_CHANNEL: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_target_channel)],
-            SET_CUSTOM_CAPTION: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, set_custom_caption),
-                MessageHandler(filters.TEXT & ~filters.COMMAND, save_edited_caption, block=False) # Handle save edit
-            ],
+            SET_CUSTOM_CAPTION: [MessageHandler(filters.TEXT & ~filters.COMMAND, set_custom_caption)],
+            EDIT_CAPTION_TEXT: [MessageHandler(filters.TEXT & ~filters.COMMAND, save_edited_caption)],
             CONFIRM_REMOVE_CAPTION: [CallbackQueryHandler(confirm_remove_caption, pattern="^remove_caption_(yes|no)$")],
             PROMPT_START_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_start_id)],
             PROMPT_END_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_end_id)],
@@ -562,10 +982,30 @@ def get_settings_conv_handler() -> ConversationHandler:
             PROMPT_INTERVAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_interval_and_save)],
             EDIT_CAPTION_PROMPT: [
                 CallbackQueryHandler(prompt_edit_custom_caption, pattern=re.compile("^edit_caption_")),
+                CallbackQueryHandler(set_custom_caption_menu, pattern="^caption_page_"),
                 CallbackQueryHandler(settings_menu, pattern="^back_to_settings$"),
             ],
             TOGGLE_REMOVE_CAPTION_MENU: [
                 CallbackQueryHandler(execute_toggle_remove_caption, pattern=re.compile("^toggle_remove_")),
+                CallbackQueryHandler(toggle_remove_caption_menu, pattern="^toggle_page_"),
+                CallbackQueryHandler(settings_menu, pattern="^back_to_settings$"),
+            ],
+            FILTER_MENU: [
+                CallbackQueryHandler(prompt_edit_filter, pattern=re.compile(r"^edit_filter_\d+$")),
+                CallbackQueryHandler(filter_menu, pattern="^filter_page_"),
+                CallbackQueryHandler(settings_menu, pattern="^back_to_settings$"),
+            ],
+            EDIT_FILTER_PROMPT: [MessageHandler(filters.TEXT & ~filters.COMMAND, save_filter_rules)],
+            CAPTION_RULES_MENU: [
+                CallbackQueryHandler(prompt_edit_caption_rules, pattern=re.compile(r"^edit_crules_\d+$")),
+                CallbackQueryHandler(caption_rules_menu, pattern="^crules_page_"),
+                CallbackQueryHandler(settings_menu, pattern="^back_to_settings$"),
+            ],
+            EDIT_CAPTION_RULES_PROMPT: [MessageHandler(filters.TEXT & ~filters.COMMAND, save_caption_rules)],
+            IMPORT_TASKS_PROMPT: [MessageHandler(filters.Document.ALL, import_tasks_file)],
+            TOGGLE_DEDUP_MENU: [
+                CallbackQueryHandler(execute_toggle_dedup, pattern=re.compile(r"^toggle_dedup_\d+$")),
+                CallbackQueryHandler(toggle_dedup_menu, pattern="^dedup_page_"),
                 CallbackQueryHandler(settings_menu, pattern="^back_to_settings$"),
             ],
         },
@@ -1,10 +1,13 @@
 import logging
-from telegram import Update, ReplyKeyboardMarkup, KeyboardButton
+from datetime import datetime
+from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from telegram.constants import ParseMode
 
-from ..core.database import get_user, add_user, get_user_forward_settings
+from ..core.database import get_user, add_user, lift_expired_ban
 from ..core.config import ADMIN_ID
+from ..core.stats import get_task_stats
+from .helpers import cursor_from_callback, get_settings_page, build_page_nav_row, format_task_stats, TASK_TYPE_LABELS
 
 logger = logging.getLogger(__name__)
 
@@ -35,10 +38,18 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
     elif existing_user['is_banned']:
         banned_until = existing_user['banned_until']
-        if banned_until and banned_until > datetime.now():
+        now = datetime.now()
+        if banned_until and banned_until <= now:
+            # The temporary ban has passed: lift it here, lift_expired_bans_job only runs where the JobQueue does
+            if lift_expired_ban(user.id, now):
+                logger.info(f"Lifted the expired temporary ban of user {user.id}.")
+        elif banned_until:
             await update.message.reply_html(f"<b>🚫 សូមអភ័យទោស!</b> អ្នកត្រូវបានបិទមិនឱ្យប្រើ Bot នេះបណ្តោះអាសន្នរហូតដល់៖ "
                                             f"<code>{banned_until}</code>។")
             return ConversationHandler.END
+        else:
+            await update.message.reply_html("<b>🚫 សូមអភ័យទោស!</b> អ្នកត្រូវបានបិទមិនឱ្យប្រើ Bot នេះដោយ Admin ។")
+            return ConversationHandler.END
 
     keyboard = [
         [KeyboardButton("ការកំណត់ Bot ⚙️"), KeyboardButton("ស្ថានភាព Bot 📊")],
@@ -106,9 +117,11 @@ async def show_profile(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         await update.message.reply_text("🔎 រកមិនឃើញព័ត៌មាន Profile របស់អ្នកទេ។ សូមសាកល្បង /start ម្តងទៀត។")
 
 async def show_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Shows bot status and user's active forward settings."""
+    """Shows bot status and user's active forward settings, one page at a time."""
     user = update.effective_user
-    settings = get_user_forward_settings(user.id)
+    query = update.callback_query
+    cursor = cursor_from_callback(query.data, "status_page_") if query else "n0"
+    settings, has_prev, has_next = get_settings_page(user.id, cursor)
 
     status_message = "<b>📊 ស្ថានភាព Bot</b>\n\n"
     if not settings:
@@ -116,11 +129,12 @@ async def show_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         status_message += "សូមចូលទៅកាន់ 'ការកំណត់ Bot ⚙️' ដើម្បីចាប់ផ្តើម។"
     else:
         status_message += "<b>➡️ Tasks របស់អ្នក:</b>\n"
-        for i, setting in enumerate(settings):
+        task_stats = get_task_stats([s['id'] for s in settings])
+        for setting in settings:
             task_type = setting.get('task_type', 'new_messages')
             
             status_message += f"\n<b>✨ Task #{setting['id']}</b> ({'សកម្ម ✅' if setting['is_active'] else 'ផ្អាក ⏸️'})\n"
-            status_message += f"  <b>- ប្រភេទ:</b> {'សារថ្មីៗ' if task_type == 'new_messages' else 'តាម ID Range'}\n"
+            status_message += f"  <b>- ប្រភេទ:</b> {TASK_TYPE_LABELS.get(task_type, task_type)}\n"
             status_message += f"  <b>- Source:</b> <code>{setting['source_channel_id']}</code>\n"
             status_message += f"  <b>- Target:</b> <code>{setting['target_channel_id']}</code>\n"
             status_message += f"  <b>- Interval:</b> {setting.get('interval_seconds', 'N/A')} វិនាទី\n"
@@ -131,7 +145,17 @@ async def show_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
                 status_message += f"  <b>- ID Range:</b> <code>{setting.get('start_message_id', 0)}</code> ដល់ <code>{setting.get('end_message_id', 0)}</code>\n"
                 status_message += f"  <b>- ID បច្ចុប្បន្ន:</b> <code>{setting.get('current_message_id', 0)}</code>\n"
                 status_message += f"  <b>- ដំណើរការរាល់:</b> {setting.get('forward_every_n_posts', 1)} post\n"
+            elif task_type == 'catch_up' and not setting['catch_up_done']:
+                status_message += f"  <b>- Backfill:</b> ពី <code>{setting.get('start_message_id', 0)}</code>, ID បច្ចុប្បន្ន <code>{setting.get('current_message_id', 0)}</code>\n"
             else:
                 status_message += f"  <b>- សារចុងក្រោយ:</b> <code>{setting.get('last_processed_message_id', 0)}</code>\n"
+            status_message += format_task_stats(task_stats.get(setting['id']))
+
+    nav_row = build_page_nav_row("status_page_", settings, has_prev, has_next)
+    reply_markup = InlineKeyboardMarkup([nav_row]) if nav_row else None
 
-    await update.message.reply_html(status_message)
+    if query:
+        await query.answer()
+        await query.edit_message_text(status_message, reply_markup=reply_markup, parse_mode=ParseMode.HTML)
+    else:
+        await update.message.reply_html(status_message, reply_markup=reply_markup)
@@ -1,5 +1,7 @@
+import asyncio
 import logging
 import re
+import time
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     ConversationHandler,
@@ -11,8 +13,10 @@ from telegram.ext import (
 )
 from telegram.constants import ParseMode
 
-from ..core.database import get_user_forward_settings, get_setting_by_id
-from .helpers import _send_message_content_by_id
+from ..core.database import get_setting_by_id
+from ..core.config import TEST_FORWARD_MAX_IDS, TEST_FORWARD_MAX_SEND_IDS, TEST_FORWARD_CONCURRENCY
+from ..core.rate_limiter import INTERACTIVE, BULK
+from .helpers import _send_message_content_by_id, DUPLICATE, FILTERED, CIRCUIT_OPEN, cursor_from_callback, get_settings_page, build_page_nav_row
 from .start import start, back_to_main_menu
 
 logger = logging.getLogger(__name__)
@@ -20,28 +24,119 @@ logger = logging.getLogger(__name__)
 # Conversation states
 TEST_FORWARD_PROMPT_ID, BROADCAST_PROMPT_MESSAGE_ID = range(2)
 
+# How many ids of each outcome a batch report lists
+REPORT_SAMPLE_IDS = 10
+
+
+def parse_message_ids(text):
+    """
+    Parses '1500', '1500-1600', '1500, 1502, 1510-1520' (optionally with the word 'dry') into
+    (sorted unique ids, dry_run). Raises ValueError if a part is not an id or range, or there are too many
+    ids: TEST_FORWARD_MAX_IDS for a dry run, TEST_FORWARD_MAX_SEND_IDS when the messages are really sent.
+    """
+    ids = set()
+    dry_run = False
+    for part in re.split(r"[\s,]+", text.strip().lower()):
+        if not part:
+            continue
+        if part == 'dry':
+            dry_run = True
+            continue
+        first, sep, last = part.partition('-')
+        start, stop = int(first), int(last if sep else first)
+        if start <= 0 or stop < start or stop - start >= TEST_FORWARD_MAX_IDS:
+            raise ValueError(part)
+        ids.update(range(start, stop + 1))
+        if len(ids) > TEST_FORWARD_MAX_IDS:
+            raise ValueError(part)
+    if not ids or (not dry_run and len(ids) > TEST_FORWARD_MAX_SEND_IDS):
+        raise ValueError(text)
+    return sorted(ids), dry_run
+
+async def run_batch_test(context: ContextTypes.DEFAULT_TYPE, setting, message_ids: list, dry_run: bool):
+    """
+    Tests many ids of a task concurrently (TEST_FORWARD_CONCURRENCY at a time). Every call still goes
+    through the rate limiter, in the bulk lane so menus stay responsive. Returns [(message_id, result, seconds)].
+    """
+    semaphore = asyncio.Semaphore(TEST_FORWARD_CONCURRENCY)
+
+    async def test_one(message_id):
+        async with semaphore:
+            started_at = time.monotonic()
+            result = await _send_message_content_by_id(
+                context, setting.with_current_id(message_id), lane=BULK, dry_run=dry_run
+            )
+            return message_id, result, time.monotonic() - started_at
+
+    return await asyncio.gather(*(test_one(message_id) for message_id in message_ids))
+
+def format_batch_report(setting: dict, results: list, elapsed: float, dry_run: bool) -> str:
+    """One summary message: counts per outcome, sample ids of the problems and timings."""
+    groups = {'ok': [], FILTERED: [], DUPLICATE: [], 'not_found': [], CIRCUIT_OPEN: [], 'failed': []}
+    for message_id, result, _ in results:
+        key = 'ok' if result is True else result if result in (FILTERED, DUPLICATE, 'not_found', CIRCUIT_OPEN) else 'failed'
+        groups[key].append(message_id)
+    durations = sorted(seconds for _, _, seconds in results)
+
+    def sample(ids):
+        shown = ", ".join(str(message_id) for message_id in ids[:REPORT_SAMPLE_IDS])
+        return shown + (" …" if len(ids) > REPORT_SAMPLE_IDS else "")
+
+    mode = "🔍 Dry run (មិនបានផ្ញើទៅ Target)" if dry_run else "📤 បាន Forward ទៅ Target"
+    lines = [
+        f"<b>🧪 លទ្ធផលសាកល្បង Task #{setting['id']}</b> ({len(results)} សារ)",
+        mode,
+        "",
+        f"✅ ត្រឹមត្រូវ: <b>{len(groups['ok'])}</b>",
+        f"🔎 មិនត្រូវនឹង Filter: <b>{len(groups[FILTERED])}</b>",
+    ]
+    if not dry_run:
+        lines.append(f"♻️ សារស្ទួន: <b>{len(groups[DUPLICATE])}</b>")
+    lines.append(f"❓ រកមិនឃើញ: <b>{len(groups['not_found'])}</b>")
+    if groups[CIRCUIT_OPEN]:
+        lines.append(f"⏸️ Target ត្រូវបានផ្អាកបណ្ដោះអាសន្ន (មិនបានផ្ញើ): <b>{len(groups[CIRCUIT_OPEN])}</b>")
+    lines.append(f"⚠️ បរាជ័យ: <b>{len(groups['failed'])}</b>")
+    if groups['not_found']:
+        lines.append(f"\n<b>ID រកមិនឃើញ:</b> <code>{sample(groups['not_found'])}</code>")
+    if groups['failed']:
+        lines.append(f"<b>ID បរាជ័យ:</b> <code>{sample(groups['failed'])}</code>")
+    lines.append(
+        f"\n⏱️ សរុប {elapsed:.1f}s, មធ្យម {sum(durations) / len(durations):.2f}s/សារ, "
+        f"p95 {durations[min(len(durations) - 1, int(len(durations) * 0.95))]:.2f}s, យឺតបំផុត {durations[-1]:.2f}s"
+    )
+    return "\n".join(lines)
+
+
 
 async def test_forward_prompt_id(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Prompts the user to select a setting for test forward."""
     user_id = update.effective_user.id
-    settings = get_user_forward_settings(user_id)
+    query = update.callback_query
+    cursor = cursor_from_callback(query.data, "test_page_") if query else "n0"
+    settings, has_prev, has_next = get_settings_page(user_id, cursor)
 
     if not settings:
-        await update.message.reply_html("អ្នកមិនទាន់មាន Task ណាមួយទេ។ សូមកំណត់វានៅក្នុង 'ការកំណត់ Bot ⚙️'។")
+        await update.effective_message.reply_html("អ្នកមិនទាន់មាន Task ណាមួយទេ។ សូមកំណត់វានៅក្នុង 'ការកំណត់ Bot ⚙️'។")
         return ConversationHandler.END
 
     keyboard = []
     for setting in settings:
         keyboard.append([InlineKeyboardButton(f"➡️ Task #{setting['id']}: From {setting['source_channel_id']} to {setting['target_channel_id']}", callback_data=f"select_test_setting_{setting['id']}")])
+    nav_row = build_page_nav_row("test_page_", settings, has_prev, has_next)
+    if nav_row:
+        keyboard.append(nav_row)
     keyboard.append([InlineKeyboardButton("⬅️ ត្រលប់ក្រោយ", callback_data="back_to_main")])
     reply_markup = InlineKeyboardMarkup(keyboard)
 
-    await update.message.reply_html(
-        """<b>🧪 សាកល្បង Forward សារ</b>
+    message_text = """<b>🧪 សាកល្បង Forward សារ</b>
 
-សូមជ្រើសរើស Task ដែលអ្នកចង់សាកល្បង (Bot នឹងប្រើ Caption និងការកំណត់លុប Tags របស់ Task នោះ)៖""",
-        reply_markup=reply_markup
-    )
+សូមជ្រើសរើស Task ដែលអ្នកចង់សាកល្បង (Bot នឹងប្រើ Caption និងការកំណត់លុប Tags របស់ Task នោះ)៖"""
+
+    if query:
+        await query.answer()
+        await query.edit_message_text(message_text, reply_markup=reply_markup, parse_mode=ParseMode.HTML)
+    else:
+        await update.message.reply_html(message_text, reply_markup=reply_markup)
     return TEST_FORWARD_PROMPT_ID
 
 async def test_forward(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -55,38 +150,62 @@ async def test_forward(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
         await query.edit_message_text("⚠️ រកមិនឃើញ Task នេះទេ។")
         return ConversationHandler.END
 
-    context.user_data['test_forward_setting'] = dict(setting) # Store as dict
+    context.user_data['test_forward_setting'] = setting
 
     await query.edit_message_text(
         f"""<b>🧪 សាកល្បង Forward សារ (Task #{setting_id})</b>
 From <code>{setting['source_channel_id']}</code> to <code>{setting['target_channel_id']}</code>
 
-<b>➡️ សូមផ្ញើ ID របស់សារដែលអ្នកចង់ Forward ពី Channel ប្រភព។</b>""",
+<b>➡️ សូមផ្ញើ ID របស់សារដែលអ្នកចង់ Forward ពី Channel ប្រភព។</b>
+ដើម្បីសាកល្បងច្រើនសារ សូមផ្ញើ Range ឬបញ្ជី ID (រហូតដល់ {TEST_FORWARD_MAX_SEND_IDS})៖ <code>1500-1510</code> ឬ <code>1500, 1502, 1510-1515</code>។
+បន្ថែមពាក្យ <code>dry</code> (ឧ. <code>1500-1600 dry</code>, រហូតដល់ {TEST_FORWARD_MAX_IDS}) ដើម្បីពិនិត្យតែថាសារមាន និងត្រូវនឹង Filter ដោយមិនផ្ញើទៅ Target។""",
         parse_mode=ParseMode.HTML
     )
     return BROADCAST_PROMPT_MESSAGE_ID 
 
 async def test_forward_execute(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Executes the test forward based on message ID using _send_message_content."""
+    """Executes the test forward based on message ID using _send_message_content; ranges / lists run as a batch test."""
     try:
-        message_id_to_forward = int(update.message.text.strip())
+        message_ids, dry_run = parse_message_ids(update.message.text)
         setting = context.user_data.get('test_forward_setting')
 
         if not setting:
             await update.message.reply_html("⚠️ មានបញ្ហា! ព័ត៌មាន Task មិនពេញលេញទេ។ សូមសាកល្បងម្តងទៀត។")
             return ConversationHandler.END
-        
-        # We need to temporarily update the 'current_message_id' in the setting dict for the helper function
-        setting['current_message_id'] = message_id_to_forward
+
+        if len(message_ids) > 1 or dry_run:
+            progress = await update.message.reply_html(f"⏳ កំពុងសាកល្បងសារ {len(message_ids)}... សូមរង់ចាំ។")
+            started_at = time.monotonic()
+            results = await run_batch_test(context, setting, message_ids, dry_run)
+            report = format_batch_report(setting, results, time.monotonic() - started_at, dry_run)
+            await progress.edit_text(report, parse_mode=ParseMode.HTML)
+            context.user_data.pop('test_forward_setting', None)
+            return ConversationHandler.END
+
+        message_id_to_forward = message_ids[0]
         
         await update.message.reply_html("⏳ កំពុងព្យាយាម Forward... សូមរង់ចាំ។")
 
-        success = await _send_message_content_by_id(context, setting)
+        success = await _send_message_content_by_id(context, setting.with_current_id(message_id_to_forward), lane=INTERACTIVE)
 
         if success == True:
             await update.message.reply_html(
                 f"✅ បាន Forward សារ ID <code>{message_id_to_forward}</code> ទៅកាន់ <code>{setting['target_channel_id']}</code> ដោយជោគជ័យ!"
             )
+        elif success == FILTERED:
+            await update.message.reply_html(
+                f"🔎 សារ ID <code>{message_id_to_forward}</code> មិនត្រូវនឹង Filter របស់ Task នេះទេ ដូច្នេះមិនត្រូវបាន Forward។"
+            )
+        elif success == DUPLICATE:
+            await update.message.reply_html(
+                f"♻️ សារ ID <code>{message_id_to_forward}</code> ត្រូវបានផ្ញើទៅ <code>{setting['target_channel_id']}</code> រួចហើយ "
+                f"(Task នេះបានបើកការការពារសារស្ទួន)។"
+            )
+        elif success == CIRCUIT_OPEN:
+            await update.message.reply_html(
+                f"⏸️ Target <code>{setting['target_channel_id']}</code> បរាជ័យច្រើនដងជាប់គ្នា ហើយត្រូវបានផ្អាកបណ្ដោះអាសន្ន។ "
+                f"សារមិនត្រូវបានផ្ញើទេ។ សូមពិនិត្យសិទ្ធិ Bot ហើយសាកល្បងម្តងទៀតបន្តិចក្រោយ។"
+            )
         elif success == 'not_found':
             await update.message.reply_html(
                 f"""<b>⚠️ រកមិនឃើញសារ/មិនអាច Forward បានទេ។</b>
@@ -102,7 +221,9 @@ async def test_forward_execute(update: Update, context: ContextTypes.DEFAULT_TYP
         return ConversationHandler.END
 
     except ValueError:
-        await update.message.reply_html("<b>⚠️ ID សារមិនត្រឹមត្រូវទេ។</b> សូមផ្ញើ ID សារដែលជាលេខ។")
+        await update.message.reply_html(
+            f"<b>⚠️ ID សារមិនត្រឹមត្រូវទេ។</b> សូមផ្ញើ ID សារដែលជាលេខ ឬ Range (ឧ. <code>1500-1510</code>, អតិបរមា {TEST_FORWARD_MAX_SEND_IDS} សារ ឬ {TEST_FORWARD_MAX_IDS} សារជាមួយ <code>dry</code>)។"
+        )
         return BROADCAST_PROMPT_MESSAGE_ID
 
 
@@ -113,6 +234,7 @@ def get_test_forward_conv_handler() -> ConversationHandler:
         states={
             TEST_FORWARD_PROMPT_ID: [
                 CallbackQueryHandler(test_forward, pattern=re.compile("^select_test_setting_")),
+                CallbackQueryHandler(test_forward_prompt_id, pattern="^test_page_"),
                 CallbackQueryHandler(back_to_main_menu, pattern="^back_to_main$"),
             ],
             BROADCAST_PROMPT_MESSAGE_ID: [
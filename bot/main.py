@@ -5,19 +5,30 @@ from telegram.ext import (
     CommandHandler,
     MessageHandler,
     filters,
-    CallbackQueryHandler
+    CallbackQueryHandler,
+    TypeHandler
 )
 
-from .core.config import BOT_TOKEN
+from .core.config import (
+    BOT_TOKEN, BOT_API_BASE_URL, STATS_FLUSH_INTERVAL, LOOP_LAG_INTERVAL, NOTIFY_DIGEST_INTERVAL, DEDUP_PURGE_INTERVAL, MESSAGE_MAP_PURGE_INTERVAL,
+    FORWARD_LOG_FLUSH_INTERVAL, FORWARD_LOG_MAINTENANCE_INTERVAL, COUNTERS_RECONCILE_INTERVAL,
+    BAN_SWEEP_INTERVAL
+)
 from .core.database import init_db
-from .jobs import schedule_all_tasks
+from .core.health import check_loop_lag
+from .core.rate_limiter import FairRateLimiter
+from .jobs import (
+    schedule_all_tasks, flush_task_stats, flush_failure_digests, purge_dedup_index_job, purge_message_map_job,
+    flush_forward_log_job, maintain_forward_log_job, reconcile_counters_job,
+    lift_expired_bans_job
+)
 
 # Import handlers
 from .handlers.start import start, show_profile, show_status, back_to_main_menu
 from .handlers.settings import get_settings_conv_handler
-from .handlers.admin import get_admin_conv_handler
+from .handlers.admin import get_admin_conv_handler, profiler_update_hook
 from .handlers.test_forward import get_test_forward_conv_handler
-from .handlers.forwarding import handle_new_post
+from .handlers.forwarding import dispatch_new_post, dispatch_edited_post
 
 logger = logging.getLogger(__name__)
 
@@ -33,7 +44,14 @@ def create_application() -> Application:
         raise
 
     # Create the Application
-    application = Application.builder().token(BOT_TOKEN).build()
+    # Outbound sends are queued fairly per task owner (see core/rate_limiter.py)
+    builder = Application.builder().token(BOT_TOKEN).rate_limiter(FairRateLimiter())
+    if BOT_API_BASE_URL:
+        builder = builder.base_url(BOT_API_BASE_URL)
+    application = builder.build()
+
+    # --- Profiler hook (runs before every other handler, no-op unless profiling) ---
+    application.add_handler(TypeHandler(Update, profiler_update_hook), group=-1)
 
     # --- Conversation Handlers ---
     settings_conv_handler = get_settings_conv_handler()
@@ -48,20 +66,96 @@ def create_application() -> Application:
     application.add_handler(CommandHandler("start", start))
     application.add_handler(MessageHandler(filters.Regex("^ព័ត៌មាន Profile 👤$"), show_profile))
     application.add_handler(MessageHandler(filters.Regex("^ស្ថានភាព Bot 📊$"), show_status))
+    application.add_handler(CallbackQueryHandler(show_status, pattern="^status_page_"))
 
     # --- Channel Post Handler (for 'new_messages' tasks) ---
     # This is the new, correct way to handle "new_messages" tasks
-    # block=False allows other handlers to run, just in case
+    # Blocking: app.py runs each update under asyncio.run(), which cancels tasks left behind,
+    # so a non-blocking handler would be cancelled before it ran. Updates of different
+    # sources still run in parallel (one request each); ordering per source channel is
+    # kept by the dispatcher lanes.
     application.add_handler(MessageHandler(
-        filters.ChatType.CHANNEL & ~filters.COMMAND, 
-        handle_new_post, 
-        block=False
+        filters.UpdateType.CHANNEL_POST & ~filters.COMMAND,
+        dispatch_new_post, 
+        block=True
+    ))
+    # Edits of forwarded posts are applied to the target messages (see message_map)
+    application.add_handler(MessageHandler(
+        filters.UpdateType.EDITED_CHANNEL_POST & ~filters.COMMAND,
+        dispatch_edited_post,
+        block=True
     ))
 
     # --- Schedule background jobs (for 'id_range' tasks) ---
     # This will run once when the application starts
     application.job_queue.run_once(schedule_all_tasks, 1)
 
+    # Flush in-memory delivery stats to the DB periodically (no per-message writes)
+    application.job_queue.run_repeating(
+        flush_task_stats,
+        interval=STATS_FLUSH_INTERVAL,
+        first=STATS_FLUSH_INTERVAL,
+        name="flush_task_stats"
+    )
+
+    # Failed-forward notifications are coalesced and sent as one digest per recipient
+    application.job_queue.run_repeating(
+        flush_failure_digests,
+        interval=NOTIFY_DIGEST_INTERVAL,
+        first=NOTIFY_DIGEST_INTERVAL,
+        name="flush_failure_digests"
+    )
+
+    # Expire old keys of the content dedup index
+    application.job_queue.run_repeating(
+        purge_dedup_index_job,
+        interval=DEDUP_PURGE_INTERVAL,
+        first=DEDUP_PURGE_INTERVAL,
+        name="purge_dedup_index"
+    )
+
+    # Expire old source -> target message mappings
+    application.job_queue.run_repeating(
+        purge_message_map_job,
+        interval=MESSAGE_MAP_PURGE_INTERVAL,
+        first=MESSAGE_MAP_PURGE_INTERVAL,
+        name="purge_message_map"
+    )
+
+    # Forward audit log: buffered entries are written with COPY; daily partitions are
+    # created ahead (first run right after start) and dropped after the retention period
+    application.job_queue.run_repeating(
+        flush_forward_log_job,
+        interval=FORWARD_LOG_FLUSH_INTERVAL,
+        first=FORWARD_LOG_FLUSH_INTERVAL,
+        name="flush_forward_log"
+    )
+    application.job_queue.run_repeating(
+        maintain_forward_log_job,
+        interval=FORWARD_LOG_MAINTENANCE_INTERVAL,
+        first=1,
+        name="maintain_forward_log"
+    )
+
+    # Admin counters are trigger-maintained and seeded by init_db(); this only repairs drift
+    application.job_queue.run_repeating(
+        reconcile_counters_job,
+        interval=COUNTERS_RECONCILE_INTERVAL,
+        first=COUNTERS_RECONCILE_INTERVAL,
+        name="reconcile_counters"
+    )
+
+    # Lift temporary bans whose banned_until has passed (first run right after start)
+    application.job_queue.run_repeating(
+        lift_expired_bans_job,
+        interval=BAN_SWEEP_INTERVAL,
+        first=3,
+        name="lift_expired_bans"
+    )
+
+    # Event loop lag monitor for the /healthz endpoint
+    application.job_queue.run_repeating(check_loop_lag, interval=LOOP_LAG_INTERVAL, first=LOOP_LAG_INTERVAL, name="loop_lag_monitor")
+
     logger.info("Bot application created and handlers registered.")
     
     return application